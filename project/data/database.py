@@ -1,66 +1,975 @@
+import calendar
+import os
 import sqlite3
-from typing import Any, List, Dict
+import threading
+from concurrent.futures import Future
+from dataclasses import replace
+from datetime import date, datetime
+from typing import Any, Callable, List, Dict, Iterable, Set, Tuple, Iterator, Optional
+from .journal import close_journals
+from .models import Photo, Tag
+from .migrations import SEARCH_DOCUMENT_SQL, ProgressCallback, migrate, schema_version
+from .photo_store import PhotoStore, store_root
+from .purge_worker import PURGE_BATCH_SIZE, PURGE_INTERVAL, UNDO_GRACE, PurgeWorker
+from .query_builder import RECORD_COLUMNS, RecordQuery, build_select, compile_query
+from .snapshot import get_snapshot
+from .tags import TagDictionary, clear_tag_dictionaries, split_tag_names, tag_dictionary_for
+from .write_queue import WriteBehindQueue
+from .text_index import char_text, highlight, match_expression, ngram_text
 
 DB_PATH = "db/app.db"
 
+# 按保留期限清理时每批删除后调用，参数为被删除的行 (格式同 fetchData 的行字典)
+DeletedCallback = Callable[[List[Dict[str, Any]]], None]
+
+# 月度报告 (ReportGenerator) 直接读取汇总表，只访问 O(分类数) 行
+MONTHLY_TOTALS_SQL = "SELECT type, category, total FROM monthly_totals WHERE month = ?"
+
+# 从原始记录重新聚合月度汇总，用于重建与一致性检查
+RAW_MONTHLY_TOTALS_SQL = (
+    "SELECT substr(date, 1, 7), type, category, SUM(amount), COUNT(*) FROM records "
+    "WHERE deleted_at IS NULL GROUP BY substr(date, 1, 7), type, category"
+)
+
+
+# 数据保留期限 (Req008)：选项 -> 保留的月数 (None 表示永久保存)
+RETENTION_PERIODS = {
+    "永久保存": None,
+    "保存一年": 12,
+    "保存半年": 6,
+}
+
+# 每个连接只在创建时设置一次的 PRAGMA
+# auto_vacuum 必须在切换 WAL 与建表之前设置，才能对新数据库生效
+CONNECTION_PRAGMAS = (
+    "PRAGMA auto_vacuum = INCREMENTAL",
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",     # 约 16MB 页缓存
+    "PRAGMA mmap_size = 268435456",   # 256MB 内存映射
+)
+
+
+# 预编译语句缓存容量 (默认 128)，容纳所有筛选条件组合生成的 SQL
+STATEMENT_CACHE_SIZE = 512
+
+
+class _ConnectionPool:
+    """
+    进程级的按线程连接池
+    同一线程访问同一数据库文件时复用同一个连接，
+    因此 RecordManager、QueryService 等各自创建的 LocalDatabase 也共享连接
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._conns: Dict[Tuple[int, str], sqlite3.Connection] = {}
+
+    def get(self, db_path: str) -> sqlite3.Connection:
+        key = (threading.get_ident(), os.path.abspath(db_path))
+        with self._lock:
+            conn = self._conns.get(key)
+        if conn is None:
+            # 连接仅由创建它的线程使用；关闭 check_same_thread 是为了允许 close_all 跨线程关闭
+            conn = sqlite3.connect(
+                db_path, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE
+            )
+            for pragma in CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            # 全文检索触发器使用的分词函数
+            conn.create_function("fts_grams", 1, ngram_text, deterministic=True)
+            conn.create_function("fts_chars", 1, char_text, deterministic=True)
+            with self._lock:
+                self._conns[key] = conn
+        return conn
+
+    def close_all(self, db_path: Any = None) -> None:
+        """ 关闭连接 (db_path 为空时关闭全部)，用于退出程序或测试清理 """
+        path = os.path.abspath(db_path) if db_path is not None else None
+        with self._lock:
+            for key in list(self._conns):
+                if path is None or key[1] == path:
+                    self._conns.pop(key).close()
+
+
+_POOL = _ConnectionPool()
+
+
+# 延迟写入队列，按数据库文件共享：同一文件只有一个写线程
+_WRITERS: Dict[str, WriteBehindQueue] = {}
+_WRITERS_LOCK = threading.Lock()
+
+
+# 墓碑记录的后台清理线程，按数据库文件共享
+_PURGERS: Dict[str, PurgeWorker] = {}
+_PURGERS_LOCK = threading.Lock()
+
+
+def _stop_purgers(path: Optional[str]) -> None:
+    with _PURGERS_LOCK:
+        purgers = [_PURGERS.pop(key) for key in list(_PURGERS) if path is None or key == path]
+    for purger in purgers:
+        purger.close()
+
+
+def close_all_connections(db_path: Any = None) -> None:
+    """ 关闭连接池中的连接 (先停止清理线程，提交并停止对应的延迟写入队列)，以及对应的变更日志 """
+    path = os.path.abspath(db_path) if db_path is not None else None
+    _stop_purgers(path)
+    with _WRITERS_LOCK:
+        writers = [key for key in _WRITERS if path is None or key == path]
+        for key in writers:
+            _WRITERS.pop(key).close()
+    _POOL.close_all(db_path)
+    close_journals(db_path)
+    clear_tag_dictionaries(db_path)
+
+
+def _record_params(data: Dict[str, Any]) -> Tuple[Any, ...]:
+    """ 将校验后的记录数据转换为 records 表的插入参数 (amount 为整数分) """
+    record_date = data["date"]
+    if isinstance(record_date, date):
+        record_date = record_date.isoformat()
+    return (
+        data["type"],
+        data["amount"],
+        record_date,
+        data.get("note") or "",
+        data.get("merchant") or "",
+        data.get("category") or "其他",
+    )
+
+
+def _with_existing_photos(data: Dict[str, Any]) -> Dict[str, Any]:
+    """ 去掉已不存在的图片文件 (恢复记录时，图片可能已被回收) """
+    photos = data.get("photos") or []
+    kept = [path for path in photos if os.path.exists(path)]
+    if len(kept) == len(photos):
+        return data
+    for path in photos:
+        if path not in kept:
+            print(f"[LocalDatabase] 图片文件已不存在，跳过: {path}")
+    return dict(data, photos=kept)
+
+
+def _timestamp(value: Optional[datetime] = None) -> str:
+    """ 墓碑时间 (deleted_at) 的文本格式，按字符串比较即按时间先后 """
+    return (value or datetime.now()).isoformat(sep=" ", timespec="seconds")
+
+
+def _months_before(day: date, months: int) -> date:
+    """ 返回 day 之前 months 个月的同一天 (月末自动截断) """
+    total = day.year * 12 + day.month - 1 - months
+    year, month = divmod(total, 12)
+    month += 1
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def _row_to_dict(row: Tuple[Any, ...]) -> Dict[str, Any]:
+    """ 将 query_builder.RECORD_COLUMNS 查询结果转换为字典 """
+    return {"id": str(row[0]), "type": row[1], "amount": row[2], "date": row[3], "note": row[4]}
+
+
 class LocalDatabase:
     """ 对应UML中的LocalDatabase类  """
-    
+
     def __init__(self, db_path: str=DB_PATH) ->None:
         self.db_path = db_path
 
     def _get_connection(self) ->Any:
         # 纯本地应用，无需登录 (Req021) [cite: 90]
-        return sqlite3.connect(self.db_path)
+        # 连接来自进程级连接池，调用方不要关闭
+        return _POOL.get(self.db_path)
+
+    def close(self) -> None:
+        """ 关闭本数据库文件在连接池中的所有连接 """
+        close_all_connections(self.db_path)
+
+    def tagDictionary(self) -> TagDictionary:
+        """ 本数据库文件的标签字典 (tag_id <-> 名称，进程内缓存) """
+        return tag_dictionary_for(self)
+
+    def _resolve_tags(self, query: Dict[str, Any]) -> Dict[str, Any]:
+        """ 把查询条件中的标签名换成 tag_id，SQL 中按整数比较 """
+        tag = query.get("tag")
+        if tag is None or isinstance(tag, int):
+            return query
+        return dict(query, tag=self.tagDictionary().tag_id(tag))
+
+    def photoStore(self) -> PhotoStore:
+        """ 本数据库文件的图片存储 (db/app.db -> db/app.photos) """
+        return PhotoStore(store_root(self.db_path))
+
+    def _writer(self) -> Optional[WriteBehindQueue]:
+        return _WRITERS.get(os.path.abspath(self.db_path))
 
-    def initialize_database(self) -> None:
-        """ 初始化数据库，创建表 """
+    def enableWriteBehind(self, flush_interval: float = 0.05, max_batch: int = 200) -> WriteBehindQueue:
+        """
+        开启延迟写入模式：saveData/deleteData 交给唯一的写线程按批提交
+        同一数据库文件的所有 LocalDatabase 实例共享同一个写线程；已开启时直接返回现有队列
+        saveMany 仍在调用线程中以单个事务写入
+        """
+        key = os.path.abspath(self.db_path)
+        with _WRITERS_LOCK:
+            writer = _WRITERS.get(key)
+            if writer is None:
+                writer = _WRITERS[key] = WriteBehindQueue(
+                    lambda: _POOL.get(self.db_path), flush_interval=flush_interval, max_batch=max_batch
+                )
+        return writer
+
+    def flush(self) -> None:
+        """ 持久化屏障：等待此前提交的延迟写入全部落盘 (未开启延迟写入时无操作) """
+        writer = self._writer()
+        if writer is not None:
+            writer.flush()
+
+    def startPurgeWorker(self, interval: float = PURGE_INTERVAL, grace: float = UNDO_GRACE,
+                         batch_size: int = PURGE_BATCH_SIZE) -> PurgeWorker:
+        """
+        启动墓碑记录的后台清理线程：每 interval 秒物理删除超过 grace 秒的墓碑记录
+        同一数据库文件只有一个清理线程；已启动时直接返回现有线程
+        """
+        key = os.path.abspath(self.db_path)
+        with _PURGERS_LOCK:
+            purger = _PURGERS.get(key)
+            if purger is None:
+                purger = _PURGERS[key] = PurgeWorker(self, interval=interval, grace=grace, batch_size=batch_size)
+        return purger
+
+    def purgeWorker(self) -> Optional[PurgeWorker]:
+        """ 本数据库文件正在运行的后台清理线程，未启动时返回 None """
+        with _PURGERS_LOCK:
+            return _PURGERS.get(os.path.abspath(self.db_path))
+
+    def stopPurgeWorker(self) -> None:
+        """ 停止本数据库文件的后台清理线程 (未启动时无操作) """
+        _stop_purgers(os.path.abspath(self.db_path))
+
+    def initialize_database(self, progress: Optional[ProgressCallback] = None) -> int:
+        """
+        初始化数据库：创建表，并把旧版本数据库升级到最新结构
+        progress(版本号, 步骤名, 已完成, 总数) 报告迁移进度，返回迁移后的结构版本
+        """
         print(f"正在初始化数据库... {self.db_path}")
-        # TODO: 在此创建 Record, Tag, Photo, Reminder 等表结构
-        pass
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        return migrate(self._get_connection(), progress=progress)
+
+    def schemaVersion(self) -> int:
+        """ 当前数据库的结构版本 (PRAGMA user_version) """
+        return schema_version(self._get_connection())
+
+    def explainQueryPlan(self, sql: str, params: List[Any]) -> List[str]:
+        """ 返回 EXPLAIN QUERY PLAN 的执行计划描述，用于检查索引命中 """
+        rows = self._get_connection().execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        return [row[3] for row in rows]
 
     def saveData(self, data: Any) ->str:
         """
-        保存数据 (对应UML方法) 
+        保存数据 (对应UML方法)
         (Req001, Req002, Req003, Req004, Req019) [cite: 14, 17, 20, 22, 81]
+        开启延迟写入时交给写线程合并提交，并等待其完成
+        """
+        if self._writer() is not None:
+            return self.saveDataAsync(data).result()
+        conn = self._get_connection()
+        with conn:
+            return self._insert_record(conn, data)
+
+    def saveDataAsync(self, data: Any) -> Future:
+        """
+        异步保存数据，返回新记录 ID 的 Future
+        未开启延迟写入时同步写入，返回已完成的 Future
+        """
+        writer = self._writer()
+        if writer is not None:
+            return writer.submit(lambda conn: self._insert_record(conn, data))
+        future: Future = Future()
+        future.set_result(self.saveData(data))
+        return future
+
+    def _insert_record(self, conn: Any, data: Any, record_id: Optional[int] = None) -> str:
+        """ 在调用方的事务中插入一条记录及其标签、图片 (record_id 为空时自动分配) """
+        cursor = conn.execute(
+            "INSERT INTO records (record_id, type, amount, date, note, merchant, category) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (record_id,) + _record_params(data),
+        )
+        record_id = cursor.lastrowid
+        for tag_name in split_tag_names(data.get("tags")):
+            self._link_tag(conn, record_id, tag_name)
+        self._link_photos(conn, [(record_id, photo_path) for photo_path in data.get("photos") or []])
+        if data.get("fingerprint"):
+            conn.execute(
+                "INSERT OR IGNORE INTO record_fingerprints (fingerprint, record_id) VALUES (?, ?)",
+                (data["fingerprint"], record_id),
+            )
+        return str(record_id)
+
+    def saveMany(self, rows: List[Dict[str, Any]], chunk_size: int = 500) -> List[str]:
         """
-        print(f"TODO: 保存数据 {data} 到数据库")
-        # TODO: 实现数据写入逻辑
-        return "new_record_id_123"
+        批量保存数据，所有行在同一个事务中写入
+        每 chunk_size 行调用一次 executemany，返回新记录的 ID (与 rows 顺序一致)
+        """
+        if chunk_size <= 0:
+            raise ValueError(f"chunk_size 必须是正数: {chunk_size}")
+        conn = self._get_connection()
+        with conn:
+            # 立即获取写锁，保证预分配的 record_id 不会与其他写入冲突
+            conn.execute("BEGIN IMMEDIATE")
+            next_id = conn.execute("SELECT COALESCE(MAX(record_id), 0) FROM records").fetchone()[0] + 1
+            ids = list(range(next_id, next_id + len(rows)))
+            self._insert_rows(conn, ids, rows, chunk_size)
+        return [str(record_id) for record_id in ids]
+
+    def saveDataUnique(self, data: Dict[str, Any]) -> Tuple[str, bool]:
+        """
+        按 data["fingerprint"] 去重后保存：返回 (record_id, 是否新建)
+        指纹的查找与插入在同一个写事务中完成，并发写入同一指纹时只有一条记录被插入
+        """
+        writer = self._writer()
+        if writer is not None:
+            return writer.submit(lambda conn: self._insert_unique(conn, data)).result()
+        conn = self._get_connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            return self._insert_unique(conn, data)
+
+    def _insert_unique(self, conn: Any, data: Dict[str, Any], record_id: Optional[int] = None) -> Tuple[str, bool]:
+        """ 在调用方的事务中插入一条记录；指纹已属于有效记录时不插入，返回 (已有记录ID, False) """
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        existing = self._claim_fingerprints(conn, [data.get("fingerprint")])
+        if existing:
+            return existing[0], False
+        return self._insert_record(conn, data, record_id), True
+
+    def saveManyUnique(self, rows: List[Dict[str, Any]], chunk_size: int = 500) -> Tuple[List[str], Dict[int, str]]:
+        """
+        按各行的 fingerprint 去重后批量保存，查找与插入在同一个写事务中
+        返回 (新记录ID列表，与未重复的行顺序一致；{行下标: 已有记录ID})
+        """
+        if chunk_size <= 0:
+            raise ValueError(f"chunk_size 必须是正数: {chunk_size}")
+        conn = self._get_connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            fresh, duplicates, repeats = self._unique_rows(conn, rows)
+            next_id = conn.execute("SELECT COALESCE(MAX(record_id), 0) FROM records").fetchone()[0] + 1
+            ids = list(range(next_id, next_id + len(fresh)))
+            self._insert_rows(conn, ids, [rows[index] for index in fresh], chunk_size)
+        new_id_of = dict(zip(fresh, ids))
+        for index, first in repeats.items():
+            duplicates[index] = str(new_id_of[first])
+        return [str(record_id) for record_id in ids], duplicates
+
+    def _unique_rows(self, conn: Any, rows: List[Dict[str, Any]]) -> Tuple[List[int], Dict[int, str], Dict[int, int]]:
+        """
+        在调用方的写事务中按指纹划分各行，返回：
+        需要插入的行下标、{行下标: 已有记录ID}、批内重复的行 {行下标: 批内第一次出现的行下标}
+        """
+        fingerprints = [row.get("fingerprint") for row in rows]
+        owners = self._claim_fingerprints(conn, fingerprints)
+        fresh: List[int] = []
+        duplicates: Dict[int, str] = {}
+        repeats: Dict[int, int] = {}
+        first: Dict[str, int] = {}
+        for index, fingerprint in enumerate(fingerprints):
+            if index in owners:
+                duplicates[index] = owners[index]
+            elif fingerprint and fingerprint in first:
+                repeats[index] = first[fingerprint]
+            else:
+                if fingerprint:
+                    first[fingerprint] = index
+                fresh.append(index)
+        return fresh, duplicates, repeats
+
+    def _claim_fingerprints(self, conn: Any, fingerprints: List[Optional[str]],
+                            chunk_size: int = 500) -> Dict[int, str]:
+        """
+        在调用方的写事务中查找指纹，返回已属于有效记录的 {下标: record_id}
+        属于墓碑记录的指纹被释放 (删除后重新录入视为新记录)，之后的插入不会与之冲突
+        """
+        wanted = sorted({fingerprint for fingerprint in fingerprints if fingerprint})
+        live: Dict[str, str] = {}
+        released: List[Tuple[str]] = []
+        for start in range(0, len(wanted), chunk_size):
+            chunk = wanted[start:start + chunk_size]
+            placeholders = ",".join("?" * len(chunk))
+            for fingerprint, record_id, deleted_at in conn.execute(
+                "SELECT f.fingerprint, f.record_id, r.deleted_at FROM record_fingerprints f "
+                f"JOIN records r ON r.record_id = f.record_id WHERE f.fingerprint IN ({placeholders})",
+                chunk,
+            ):
+                if deleted_at is None:
+                    live[fingerprint] = str(record_id)
+                else:
+                    released.append((fingerprint,))
+        if released:
+            conn.executemany("DELETE FROM record_fingerprints WHERE fingerprint = ?", released)
+        return {
+            index: live[fingerprint]
+            for index, fingerprint in enumerate(fingerprints) if fingerprint in live
+        }
+
+    def _insert_rows(self, conn: Any, ids: List[int], rows: List[Dict[str, Any]], chunk_size: int) -> None:
+        """ 在调用方的事务中按预分配的 ID 批量插入记录及其标签、图片 """
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            chunk_ids = ids[start:start + chunk_size]
+            conn.executemany(
+                "INSERT INTO records (record_id, type, amount, date, note, merchant, category) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(record_id,) + _record_params(data) for record_id, data in zip(chunk_ids, chunk)],
+            )
+            tag_links = [
+                (record_id, name)
+                for record_id, data in zip(chunk_ids, chunk)
+                for name in split_tag_names(data.get("tags"))
+            ]
+            if tag_links:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO tags (name) VALUES (?)",
+                    [(name,) for name in {name for _, name in tag_links}],
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO record_tags (record_id, tag_id) "
+                    "SELECT ?, tag_id FROM tags WHERE name = ?",
+                    tag_links,
+                )
+            photo_links = [
+                (record_id, photo_path)
+                for record_id, data in zip(chunk_ids, chunk)
+                for photo_path in data.get("photos") or []
+            ]
+            self._link_photos(conn, photo_links)
+            fingerprints = [
+                (data["fingerprint"], record_id)
+                for record_id, data in zip(chunk_ids, chunk)
+                if data.get("fingerprint")
+            ]
+            if fingerprints:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO record_fingerprints (fingerprint, record_id) VALUES (?, ?)",
+                    fingerprints,
+                )
+
+    def _link_tag(self, conn: Any, record_id: int, tag_name: str) -> None:
+        """ 为记录关联标签，标签不存在时自动创建 """
+        name = str(tag_name).strip()
+        if not name:
+            return
+        conn.execute("INSERT OR IGNORE INTO tags (name) VALUES (?)", (name,))
+        conn.execute(
+            "INSERT OR IGNORE INTO record_tags (record_id, tag_id) "
+            "SELECT ?, tag_id FROM tags WHERE name = ?",
+            (record_id, name),
+        )
+
+    def _link_photos(self, conn: Any, links: List[Tuple[int, str]]) -> List[str]:
+        """
+        在调用方的事务中把图片文件存入图片存储并关联到记录，返回存储后的路径
+        内容相同的图片只存一份，引用计数由 photos 表上的触发器维护
+        """
+        if not links:
+            return []
+        store = self.photoStore()
+        blobs: Dict[str, int] = {}
+        photos: List[Tuple[int, str, str]] = []
+        for record_id, photo_path in links:
+            sha256, size = store.put(photo_path)
+            blobs[sha256] = size
+            photos.append((record_id, store.path(sha256), sha256))
+        conn.executemany(
+            "INSERT OR IGNORE INTO photo_blobs (sha256, size) VALUES (?, ?)", list(blobs.items())
+        )
+        conn.executemany("INSERT INTO photos (record_id, file_path, sha256) VALUES (?, ?, ?)", photos)
+        return [path for _, path, _ in photos]
+
+    def collectPhotos(self) -> int:
+        """
+        回收引用数为 0 的图片文件，返回删除的文件数
+        在写事务中删除文件，期间不会有新的写入重新引用同一文件
+        """
+        conn = self._get_connection()
+        store = self.photoStore()
+        removed = 0
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for sha256, in conn.execute(
+                "SELECT sha256 FROM photo_blobs WHERE ref_count <= 0"
+            ).fetchall():
+                try:
+                    store.remove(sha256)
+                except OSError as e:
+                    print(f"[LocalDatabase] 删除图片失败 {store.path(sha256)}: {e}")
+                    continue
+                conn.execute("DELETE FROM photo_blobs WHERE sha256 = ?", (sha256,))
+                removed += 1
+        return removed
+
+    def addTag(self, record_id: str, tag_name: str) -> bool:
+        """ 为已有记录添加标签 (Req003)，记录不存在时返回 False """
+        conn = self._get_connection()
+        with conn:
+            if conn.execute(
+                "SELECT 1 FROM records WHERE record_id = ? AND deleted_at IS NULL", (record_id,)
+            ).fetchone() is None:
+                return False
+            self._link_tag(conn, int(record_id), tag_name)
+        return True
+
+    def addPhoto(self, record_id: str, photo_path: str) -> Optional[str]:
+        """
+        为已有记录添加图片 (Req004)，返回图片在图片存储中的路径；记录不存在时返回 None
+        图片文件不存在时抛出 FileNotFoundError
+        """
+        conn = self._get_connection()
+        with conn:
+            # 先获取写锁，存入文件与登记引用之间不会被 collectPhotos 回收
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute(
+                "SELECT 1 FROM records WHERE record_id = ? AND deleted_at IS NULL", (record_id,)
+            ).fetchone() is None:
+                return None
+            return self._link_photos(conn, [(int(record_id), photo_path)])[0]
+
+    def existingIds(self, record_ids: List[str], chunk_size: int = 500) -> Set[str]:
+        """ 返回 record_ids 中仍存在于数据库的 ID """
+        conn = self._get_connection()
+        found: Set[str] = set()
+        for start in range(0, len(record_ids), chunk_size):
+            chunk = [int(record_id) for record_id in record_ids[start:start + chunk_size]]
+            placeholders = ",".join("?" * len(chunk))
+            found.update(str(row[0]) for row in conn.execute(
+                f"SELECT record_id FROM records WHERE record_id IN ({placeholders})", chunk
+            ))
+        return found
+
+    def findFingerprints(self, fingerprints: List[str], chunk_size: int = 500) -> Dict[str, str]:
+        """ 返回已存在的记录指纹 {指纹: record_id}，按主键查找 (墓碑记录的指纹不算存在) """
+        conn = self._get_connection()
+        found: Dict[str, str] = {}
+        for start in range(0, len(fingerprints), chunk_size):
+            chunk = fingerprints[start:start + chunk_size]
+            placeholders = ",".join("?" * len(chunk))
+            found.update((fingerprint, str(record_id)) for fingerprint, record_id in conn.execute(
+                "SELECT f.fingerprint, f.record_id FROM record_fingerprints f "
+                "JOIN records r ON r.record_id = f.record_id "
+                f"WHERE f.fingerprint IN ({placeholders}) AND r.deleted_at IS NULL",
+                chunk,
+            ))
+        return found
+
+    def restoreRecords(self, records: Dict[str, Dict[str, Any]], chunk_size: int = 500) -> int:
+        """
+        按原 ID 写回记录 (用于从变更日志恢复)，已存在的 ID 跳过
+        返回写回的记录数
+        """
+        missing = sorted(set(records) - self.existingIds(list(records)), key=int)
+        if not missing:
+            return 0
+        rows = [_with_existing_photos(records[record_id]) for record_id in missing]
+        conn = self._get_connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._insert_rows(conn, [int(record_id) for record_id in missing], rows, chunk_size)
+        snapshot = get_snapshot(self)
+        if snapshot is not None:
+            snapshot.invalidate()
+        return len(missing)
 
     def fetchData(self, query: Dict[str,Any]) -> List[Any]:
         """
-        获取数据 (对应UML方法) 
+        获取数据 (对应UML方法)
         (Req009, Req010, Req013, Req014) [cite: 42, 45, 57, 59]
         """
-        print(f"TODO: 从数据库查询数据 {query}")
-        # TODO: 实现数据查询逻辑
-        # 返回模拟数据
-        return [
-            {"id": "1", "type": "支出", "amount": 50.0, "date": "2025-10-31", "note": "午餐"},
-            {"id": "2", "type": "收入", "amount": 1000.0, "date": "2025-10-30", "note": "工资"},
-        ]
+        sql, params = build_select(self._resolve_tags(query))
+        rows = self._get_connection().execute(sql, params).fetchall()
+        return [_row_to_dict(r) for r in rows]
+
+    def iterData(self, query: Dict[str, Any], batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """
+        以生成器方式逐批读取数据 (fetchmany)，内存占用与结果集大小无关
+        """
+        sql, params = build_select(self._resolve_tags(query))
+        cursor = self._get_connection().execute(sql, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for r in rows:
+                    yield _row_to_dict(r)
+        finally:
+            cursor.close()
+
+    def iterSnapshotRows(self, batch_size: int = 2000) -> Iterator[Tuple[int, str, int, str, str]]:
+        """ 逐批读取构建内存快照所需的列 (record_id, date, amount, type, category) """
+        cursor = self._get_connection().execute(
+            "SELECT record_id, date, amount, type, category FROM records "
+            "WHERE deleted_at IS NULL ORDER BY date, record_id"
+        )
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()
+
+    def tagRecordIds(self, tag_name: str) -> Set[int]:
+        """ 带有指定标签的 record_id 集合 (按 tag_id 读取 record_tags 索引，不比较字符串) """
+        tag = self.tagDictionary().lookup(tag_name)
+        if tag is None:
+            return set()
+        return {row[0] for row in self._get_connection().execute(
+            "SELECT rt.record_id FROM record_tags rt JOIN records r ON r.record_id = rt.record_id "
+            "WHERE rt.tag_id = ? AND r.deleted_at IS NULL", (tag.tag_id,)
+        )}
+
+    def fetchByIds(self, record_ids: Iterable[Any], chunk_size: int = 500) -> List[Dict[str, Any]]:
+        """ 按 record_id 读取记录，按 (date, record_id) 倒序返回 """
+        ids = sorted({int(record_id) for record_id in record_ids})
+        conn = self._get_connection()
+        rows: List[Tuple[Any, ...]] = []
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            placeholders = ",".join("?" * len(chunk))
+            rows.extend(conn.execute(
+                f"SELECT {RECORD_COLUMNS} FROM records WHERE record_id IN ({placeholders}) "
+                "AND deleted_at IS NULL", chunk
+            ))
+        rows.sort(key=lambda r: (r[3], r[0]), reverse=True)
+        return [_row_to_dict(r) for r in rows]
+
+    def fetchTags(self, record_ids: List[str], chunk_size: int = 500) -> Dict[str, List[Tag]]:
+        """
+        批量读取记录的标签 {record_id: [Tag]}，每 chunk_size 个 ID 一条 IN 查询
+        Tag 对象来自标签字典，同一标签共享一个对象
+        """
+        tags = self.tagDictionary()
+        result: Dict[str, List[Tag]] = {}
+        for record_id, tag_id, name in self._fetch_related(
+            "SELECT rt.record_id, t.tag_id, t.name FROM record_tags rt JOIN tags t ON t.tag_id = rt.tag_id "
+            "WHERE rt.record_id IN ({}) ORDER BY rt.record_id, t.name", record_ids, chunk_size
+        ):
+            result.setdefault(str(record_id), []).append(tags.intern(tag_id, name))
+        return result
+
+    def fetchPhotos(self, record_ids: List[str], chunk_size: int = 500) -> Dict[str, List[Photo]]:
+        """ 批量读取记录的图片 {record_id: [Photo]}，每 chunk_size 个 ID 一条 IN 查询 """
+        result: Dict[str, List[Photo]] = {}
+        for record_id, photo_id, file_path in self._fetch_related(
+            "SELECT record_id, photo_id, file_path FROM photos "
+            "WHERE record_id IN ({}) ORDER BY record_id, photo_id", record_ids, chunk_size
+        ):
+            result.setdefault(str(record_id), []).append(Photo(photo_id=str(photo_id), file_path=file_path))
+        return result
+
+    def _fetch_related(self, sql: str, record_ids: List[str], chunk_size: int) -> Iterator[Tuple[Any, ...]]:
+        ids = [int(record_id) for record_id in record_ids]
+        conn = self._get_connection()
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            yield from conn.execute(sql.format(",".join("?" * len(chunk))), chunk)
+
+    def sumAmount(self, query: Dict[str, Any]) -> int:
+        """ 满足查询条件的金额合计 (分) """
+        sql, params = build_select(self._resolve_tags(query), columns="COALESCE(SUM(amount), 0)")
+        return self._get_connection().execute(sql, params).fetchone()[0]
+
+    def fetchPage(self, query: Dict[str, Any], after: Optional[Tuple[str, int]] = None,
+                  limit: int = 200) -> Tuple[List[Dict[str, Any]], Optional[Tuple[str, int]]]:
+        """
+        键集分页：返回 after 游标之后的 limit 条记录，以及下一页的游标
+        游标为 (date, record_id)，没有更多数据时下一页游标为 None
+        """
+        if limit <= 0:
+            raise ValueError(f"limit 必须是正数: {limit}")
+        sql, params = build_select(self._resolve_tags(query), after=after, limit=limit)
+        rows = self._get_connection().execute(sql, params).fetchall()
+        next_cursor = (rows[-1][3], rows[-1][0]) if len(rows) == limit else None
+        return [_row_to_dict(r) for r in rows], next_cursor
+
+    def fetchQuery(self, query: RecordQuery) -> List[Dict[str, Any]]:
+        """
+        执行组合查询 (query_builder.RecordQuery)：全部条件、排序与条数限制编译为一条 SQL
+        标签名先经标签字典换成 tag_id
+        """
+        tags = self.tagDictionary()
+        resolved = [tag if isinstance(tag, int) else tags.tag_id(tag) for tag in query.tags]
+        sql, params = compile_query(replace(query, tags=tuple(resolved)))
+        rows = self._get_connection().execute(sql, params).fetchall()
+        return [_row_to_dict(r) for r in rows]
+
+    def fetchMonthlyTotals(self, month: str) -> List[Tuple[str, str, int]]:
+        """
+        读取某月 ("YYYY-MM") 按类型、分类汇总的金额 (分)
+        (Req015, Req016, Req017) [cite: 64, 68, 72]
+        """
+        return self._get_connection().execute(MONTHLY_TOTALS_SQL, (month,)).fetchall()
+
+    def rebuildMonthlyTotals(self) -> None:
+        """ 从原始记录重建月度汇总表 """
+        conn = self._get_connection()
+        with conn:
+            conn.execute("DELETE FROM monthly_totals")
+            conn.execute(
+                "INSERT INTO monthly_totals (month, type, category, total, record_count) "
+                + RAW_MONTHLY_TOTALS_SQL
+            )
+
+    def checkMonthlyTotals(self) -> List[Tuple[str, str, str]]:
+        """
+        核对月度汇总表与原始记录
+        返回不一致的 (month, type, category) 列表，为空表示一致
+        """
+        conn = self._get_connection()
+        expected = {
+            (month, record_type, category): (total, count)
+            for month, record_type, category, total, count in conn.execute(RAW_MONTHLY_TOTALS_SQL)
+        }
+        actual = {
+            (month, record_type, category): (total, count)
+            for month, record_type, category, total, count in conn.execute(
+                "SELECT month, type, category, total, record_count FROM monthly_totals"
+            )
+        }
+        mismatches = []
+        for key in sorted(set(expected) | set(actual)):
+            exp_total, exp_count = expected.get(key, (0, 0))
+            act_total, act_count = actual.get(key, (0, 0))
+            if exp_count != act_count or exp_total != act_total:
+                mismatches.append(key)
+        return mismatches
+
+    def rebuildSearchIndex(self) -> None:
+        """ 从原始记录重建全文检索索引 """
+        conn = self._get_connection()
+        with conn:
+            conn.execute("DELETE FROM records_fts")
+            conn.execute(
+                "INSERT INTO records_fts (rowid, grams, chars) "
+                "SELECT record_id, fts_grams(doc), fts_chars(doc) FROM ("
+                f"SELECT record_id, {SEARCH_DOCUMENT_SQL} AS doc FROM records r)"
+            )
+
+    def searchText(self, term: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        关键词全文检索 (Req014) [cite: 59]
+        按 bm25 相关度排序，每条结果附带 "snippet" 高亮摘要 (关键词用【】标出)
+        """
+        rows = self._get_connection().execute(
+            "SELECT r.record_id, r.type, r.amount, r.date, r.note, "
+            f"{SEARCH_DOCUMENT_SQL} AS doc "
+            "FROM records_fts JOIN records r ON r.record_id = records_fts.rowid "
+            "WHERE records_fts MATCH ? AND r.deleted_at IS NULL ORDER BY bm25(records_fts) LIMIT ?",
+            (match_expression(term), int(limit)),
+        ).fetchall()
+        results = []
+        for row in rows:
+            item = _row_to_dict(row)
+            item["snippet"] = highlight(row[5], term)
+            results.append(item)
+        return results
 
     def deleteData(self, record_id: str) -> bool:
         """
-        删除数据 (对应UML方法) 
+        删除数据 (对应UML方法)
         (Req007) [cite: 35]
+        只写入墓碑 (deleted_at)，记录立即对所有查询不可见；物理删除由 purgeDeleted 完成
         """
-        print(f"TODO: 从数据库删除数据 {record_id}")
-        # TODO: 实现数据删除逻辑
-        return True
-    def vulnerable_query(self, user_input):
-        """B608: Test for SQL string building and to test for a custom B608."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        # 假设 user_input 包含用户希望查询的 note
-        # Bandit 会检测到这行代码，因为使用了 f-string 拼接查询
-        sql_query = f"SELECT * FROM records WHERE note = '{user_input}'"
-        cursor.execute(sql_query)
-        conn.close()
-        return cursor.fetchall()
-    def run_cleanup_job(self, retention_period: str) -> None:
-        """ (Req008) 数据保留期限设置 [cite: 38] """
-        print(f"TODO: 清理 {retention_period} 之前的数据")
-        # TODO: 实现数据自动清理逻辑
-        pass
\ No newline at end of file
+        writer = self._writer()
+        if writer is not None:
+            return writer.submit(lambda conn: self._delete_record(conn, record_id)).result()
+        conn = self._get_connection()
+        with conn:
+            return self._delete_record(conn, record_id)
+
+    def _delete_record(self, conn: Any, record_id: str) -> bool:
+        """ 在调用方的事务中为一条记录写入墓碑 """
+        cursor = conn.execute(
+            "UPDATE records SET deleted_at = ? WHERE record_id = ? AND deleted_at IS NULL",
+            (_timestamp(), record_id),
+        )
+        return cursor.rowcount > 0
+
+    def deleteMany(self, record_ids: List[str], chunk_size: int = 500) -> List[str]:
+        """ 批量删除 (写入墓碑)，在一个事务中完成；返回实际删除的 ID (不存在或已删除的跳过) """
+        return self._set_tombstones(record_ids, _timestamp(), chunk_size)
+
+    def undeleteMany(self, record_ids: List[str], chunk_size: int = 500) -> List[str]:
+        """ 撤销删除：清除墓碑；返回恢复的 ID (已被物理删除的无法恢复) """
+        return self._set_tombstones(record_ids, None, chunk_size)
+
+    def _set_tombstones(self, record_ids: List[str], deleted_at: Optional[str], chunk_size: int) -> List[str]:
+        """ 为 record_ids 中的活动记录写入墓碑 (deleted_at 不为空)，或清除墓碑记录的墓碑 """
+        ids = sorted({int(record_id) for record_id in record_ids})
+        state = "deleted_at IS NULL" if deleted_at is not None else "deleted_at IS NOT NULL"
+        changed: List[str] = []
+        conn = self._get_connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for start in range(0, len(ids), chunk_size):
+                chunk = ids[start:start + chunk_size]
+                placeholders = ",".join("?" * len(chunk))
+                found = [row[0] for row in conn.execute(
+                    f"SELECT record_id FROM records WHERE record_id IN ({placeholders}) AND {state}", chunk
+                )]
+                if not found:
+                    continue
+                placeholders = ",".join("?" * len(found))
+                conn.execute(
+                    f"UPDATE records SET deleted_at = ? WHERE record_id IN ({placeholders})",
+                    [deleted_at] + found,
+                )
+                changed.extend(str(record_id) for record_id in found)
+        return changed
+
+    def fetchRecordData(self, record_ids: List[str], chunk_size: int = 500) -> Dict[str, Dict[str, Any]]:
+        """
+        读取记录的完整数据 {record_id: 记录}，包括商户、分类、标签名、图片路径与指纹
+        (格式同 journal.record_payload，用于撤销删除后更新快照与变更日志)
+        """
+        result: Dict[str, Dict[str, Any]] = {}
+        for row in self._fetch_related(
+            "SELECT r.record_id, r.type, r.amount, r.date, r.note, r.merchant, r.category, "
+            "(SELECT f.fingerprint FROM record_fingerprints f WHERE f.record_id = r.record_id) "
+            "FROM records r WHERE r.record_id IN ({}) AND r.deleted_at IS NULL", record_ids, chunk_size
+        ):
+            result[str(row[0])] = {
+                "type": row[1], "amount": row[2], "date": row[3], "note": row[4],
+                "merchant": row[5], "category": row[6], "tags": [], "photos": [], "fingerprint": row[7],
+            }
+        for record_id, tags in self.fetchTags(list(result), chunk_size).items():
+            result[record_id]["tags"] = [tag.name for tag in tags]
+        for record_id, photos in self.fetchPhotos(list(result), chunk_size).items():
+            result[record_id]["photos"] = [photo.file_path for photo in photos]
+        return result
+
+    def purgeDeleted(self, before: Optional[datetime] = None, batch_size: int = 500) -> int:
+        """
+        物理删除墓碑记录 (before 不为空时只删除在此之前删除的记录)
+        每批一个短事务；标签关联、图片引用、全文检索与指纹随记录级联删除，
+        之后回收无引用的图片文件。返回删除的记录数
+        """
+        if batch_size <= 0:
+            raise ValueError(f"batch_size 必须是正数: {batch_size}")
+        sql = "SELECT record_id FROM records WHERE deleted_at IS NOT NULL"
+        params: List[Any] = []
+        if before is not None:
+            sql += " AND deleted_at < ?"
+            params.append(_timestamp(before))
+        sql += " LIMIT ?"
+        conn = self._get_connection()
+        purged = 0
+        while True:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                ids = [row[0] for row in conn.execute(sql, params + [batch_size])]
+                if ids:
+                    placeholders = ",".join("?" * len(ids))
+                    conn.execute(
+                        "INSERT INTO pending_photo_deletes (file_path) "
+                        f"SELECT file_path FROM photos WHERE sha256 IS NULL AND record_id IN ({placeholders})",
+                        ids,
+                    )
+                    conn.execute(f"DELETE FROM records WHERE record_id IN ({placeholders})", ids)
+            if not ids:
+                break
+            purged += len(ids)
+        if purged:
+            self._purge_pending_photos(conn)
+            self.collectPhotos()
+            conn.execute("PRAGMA incremental_vacuum")
+            print(f"[LocalDatabase] 已物理删除 {purged} 条墓碑记录")
+        return purged
+
+    def fetchByNote(self, note: str) -> List[Dict[str, Any]]:
+        """ 按备注精确查询 (参数化查询，取代原先拼接字符串的 vulnerable_query) """
+        rows = self._get_connection().execute(
+            f"SELECT {RECORD_COLUMNS} FROM records WHERE note = ? AND deleted_at IS NULL "
+            "ORDER BY date DESC, record_id DESC",
+            (note,),
+        ).fetchall()
+        return [_row_to_dict(r) for r in rows]
+
+    def run_cleanup_job(self, retention_period: str, batch_size: int = 500, today: Optional[date] = None,
+                        on_deleted: Optional[DeletedCallback] = None) -> int:
+        """
+        (Req008) 数据保留期限设置 [cite: 38]
+        分批删除保留期限之前的记录，每批一个短事务，避免长时间锁库
+        图片存储中的文件按引用计数回收；升级前按原路径保存的图片先写入 pending_photo_deletes，再删除文件；
+        中途中断后再次运行会先处理遗留的待删文件，再继续删除剩余记录
+        每批提交后以被删除的行 (含墓碑) 调用 on_deleted，供 RecordManager 写入变更日志并发布事件
+        返回本次删除的记录数
+        """
+        if retention_period not in RETENTION_PERIODS:
+            raise ValueError(f"无效的数据保留期限: {retention_period}")
+        if batch_size <= 0:
+            raise ValueError(f"batch_size 必须是正数: {batch_size}")
+        months = RETENTION_PERIODS[retention_period]
+        conn = self._get_connection()
+        self._purge_pending_photos(conn)
+        self.collectPhotos()
+        if months is None:
+            return 0
+
+        cutoff = _months_before(today or date.today(), months).isoformat()
+        print(f"[LocalDatabase] 正在清理 {cutoff} 之前的数据...")
+        deleted = 0
+        while True:
+            with conn:
+                rows = conn.execute(
+                    f"SELECT {RECORD_COLUMNS} FROM records WHERE date < ? LIMIT ?", (cutoff, batch_size)
+                ).fetchall()
+                if not rows:
+                    break
+                ids = [row[0] for row in rows]
+                placeholders = ",".join("?" * len(ids))
+                conn.execute(
+                    "INSERT INTO pending_photo_deletes (file_path) "
+                    f"SELECT file_path FROM photos WHERE sha256 IS NULL AND record_id IN ({placeholders})",
+                    ids,
+                )
+                conn.execute(f"DELETE FROM records WHERE record_id IN ({placeholders})", ids)
+            deleted += len(ids)
+            if on_deleted is not None:
+                on_deleted([_row_to_dict(row) for row in rows])
+            self._purge_pending_photos(conn)
+            self.collectPhotos()
+
+        with conn:
+            conn.execute(
+                "DELETE FROM tags WHERE NOT EXISTS "
+                "(SELECT 1 FROM record_tags rt WHERE rt.tag_id = tags.tag_id)"
+            )
+        # 删除的 tag_id 可能被新标签复用
+        self.tagDictionary().clear()
+        conn.execute("PRAGMA incremental_vacuum")
+        snapshot = get_snapshot(self)
+        if deleted and snapshot is not None:
+            snapshot.invalidate()
+        print(f"[LocalDatabase] 已清理 {deleted} 条记录")
+        return deleted
+
+    def _purge_pending_photos(self, conn: Any) -> None:
+        """ 删除待删列表中的图片文件 (文件不存在视为已删除) """
+        pending = conn.execute("SELECT rowid, file_path FROM pending_photo_deletes").fetchall()
+        for rowid, file_path in pending:
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"[LocalDatabase] 删除图片失败 {file_path}: {e}")
+                continue
+            with conn:
+                conn.execute("DELETE FROM pending_photo_deletes WHERE rowid = ?", (rowid,))
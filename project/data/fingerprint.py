@@ -0,0 +1,31 @@
+import hashlib
+from datetime import date
+from typing import Any, Dict, Optional
+
+# 记录指纹：规范化后的 (类型, 金额分, 日期, 商户/备注) 加上来源 (账单文件行、图片摘要) 的 sha256
+# 保存在 record_fingerprints 表 (主键)，重复导入时按主键 O(1) 判断是否已存在
+
+# 字段分隔符，避免 "a|b" + "c" 与 "a" + "b|c" 拼出相同文本
+SEPARATOR = "\x1f"
+
+
+def _normalize_text(value: Any) -> str:
+    """ 去掉首尾空白、合并连续空白并忽略大小写 """
+    return " ".join(str(value or "").split()).casefold()
+
+
+def record_fingerprint(data: Dict[str, Any], source: Optional[str] = None) -> str:
+    """
+    计算校验后记录数据 (金额为整数分) 的指纹
+    source 为来源标识，如 "账单文件摘要:行号" 或图片的 sha256；同一来源的同一行总是得到相同指纹
+    """
+    record_date = data["date"]
+    parts = (
+        str(data["type"]),
+        str(int(data["amount"])),
+        record_date.isoformat() if isinstance(record_date, date) else str(record_date),
+        _normalize_text(data.get("merchant")),
+        _normalize_text(data.get("note")),
+        source or "",
+    )
+    return hashlib.sha256(SEPARATOR.join(parts).encode("utf-8")).hexdigest()
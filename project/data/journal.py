@@ -0,0 +1,317 @@
+import json
+import os
+import threading
+import time
+from datetime import date
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# 变更日志：记录的创建、删除、添加标签、添加图片事件，按行追加写入 JSON (JSON Lines)
+# 日志定期压缩为快照文件 (压缩时刻仍存在的记录)，之后日志从空文件重新开始，
+# 因此日志大小与进程内存不随使用时长增长；快照 + 日志可用于审计与恢复数据库中丢失的记录
+# 压缩在后台线程中进行：写入线程只把当前日志改名为待压缩日志，不在写路径上重放整个账本
+# 快照为 JSON Lines：首行 {"seq": N}，之后每条记录一行 {"id", "record"}；压缩时逐行合并快照与
+# 待压缩日志，内存只与待压缩的事件数 (约 compact_every 条) 成正比，不随账本大小增长
+
+JOURNAL_SUFFIX = ".journal"
+SNAPSHOT_SUFFIX = ".snapshot"
+COMPACTING_SUFFIX = ".compacting"
+
+# 日志累计多少条事件后压缩一次
+COMPACT_EVERY = 10000
+
+# 事件类型
+EVENT_CREATE = "create"
+EVENT_DELETE = "delete"
+EVENT_TAG = "tag"
+EVENT_PHOTO = "photo"
+
+
+def record_payload(data: Dict[str, Any]) -> Dict[str, Any]:
+    """ 将校验后的记录数据转换为可写入日志的字典 (金额为分；有去重指纹时一并记录) """
+    record_date = data["date"]
+    payload = {
+        "type": data["type"],
+        "amount": data["amount"],
+        "date": record_date.isoformat() if isinstance(record_date, date) else str(record_date),
+        "note": data.get("note") or "",
+        "merchant": data.get("merchant") or "",
+        "category": data.get("category") or "其他",
+        "tags": [str(name).strip() for name in data.get("tags") or [] if str(name).strip()],
+        "photos": list(data.get("photos") or []),
+    }
+    if data.get("fingerprint"):
+        payload["fingerprint"] = data["fingerprint"]
+    return payload
+
+
+def apply_event(records: Dict[str, Dict[str, Any]], event: Dict[str, Any]) -> None:
+    """ 将一条事件应用到 {record_id: 记录} 状态上 """
+    op, record_id = event["op"], event["id"]
+    if op == EVENT_CREATE:
+        records[record_id] = dict(event["record"])
+    elif op == EVENT_DELETE:
+        records.pop(record_id, None)
+    elif op == EVENT_TAG:
+        record = records.get(record_id)
+        if record is not None and event["tag"] not in record["tags"]:
+            record["tags"] = record["tags"] + [event["tag"]]
+    elif op == EVENT_PHOTO:
+        record = records.get(record_id)
+        if record is not None:
+            record["photos"] = record["photos"] + [event["path"]]
+
+
+class EventJournal:
+    """
+    追加写入的变更日志
+    每条事件一行 JSON，带单调递增的序号 seq；写入后立即 flush (fsync=True 时同时刷盘)。
+    累计 compact_every 条事件后压缩：当前日志改名为待压缩日志 (.compacting)，新事件写入新的空日志；
+    后台线程逐行合并 快照 + 待压缩日志 写成新快照，再删除待压缩日志。
+    进程崩溃留下的不完整末行在打开时截掉；遗留的待压缩日志在打开时继续压缩。
+    """
+
+    def __init__(self, path: str, compact_every: int = COMPACT_EVERY, fsync: bool = False) -> None:
+        if compact_every <= 0:
+            raise ValueError(f"compact_every 必须是正数: {compact_every}")
+        self.path = path
+        self.snapshot_path = path + SNAPSHOT_SUFFIX
+        self.compacting_path = path + COMPACTING_SUFFIX
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        # 替换快照与删除待压缩日志时持有，保证重放时看到一致的 快照 + 待压缩日志
+        self._swap_lock = threading.Lock()
+        self._compactor: Optional[threading.Thread] = None
+        self._repair_tail()
+        self._seq = self._snapshot_seq()
+        for event in self._read_events(self.compacting_path):
+            self._seq = max(self._seq, event["seq"])
+        self._pending = 0
+        for event in self._read_events(self.path):
+            self._seq = max(self._seq, event["seq"])
+            self._pending += 1
+        self._file = open(self.path, "a", encoding="utf-8")
+        if os.path.exists(self.compacting_path):
+            with self._lock:
+                self._start_compaction()
+
+    def _repair_tail(self) -> None:
+        """ 截掉崩溃时写了一半的最后一行 """
+        try:
+            with open(self.path, "rb+") as f:
+                data = f.read()
+                if data and not data.endswith(b"\n"):
+                    f.truncate(data.rfind(b"\n") + 1)
+        except FileNotFoundError:
+            pass
+
+    def _snapshot_seq(self) -> int:
+        """ 快照包含的最后一条事件的序号 (只读首行) """
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                header = f.readline()
+        except FileNotFoundError:
+            return 0
+        return json.loads(header)["seq"] if header.strip() else 0
+
+    def _snapshot_records(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """ 逐条读取快照中的 (record_id, 记录) """
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                header = f.readline()
+                if not header.strip():
+                    return
+                snapshot = json.loads(header)
+                if "records" in snapshot:
+                    # 旧格式：整个快照是一个 JSON 对象，下次压缩时改写为逐行格式
+                    yield from snapshot["records"].items()
+                    return
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        yield entry["id"], entry["record"]
+        except FileNotFoundError:
+            return
+
+    def _load_snapshot(self) -> Tuple[int, Dict[str, Dict[str, Any]]]:
+        return self._snapshot_seq(), dict(self._snapshot_records())
+
+    def _read_events(self, path: str) -> Iterator[Dict[str, Any]]:
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        except FileNotFoundError:
+            return
+
+    @property
+    def seq(self) -> int:
+        """ 最后一条事件的序号 """
+        return self._seq
+
+    def append(self, op: str, record_id: Any, **fields: Any) -> int:
+        """ 追加一条事件，返回其序号 """
+        return self.extend([(op, record_id, fields)])
+
+    def extend(self, events: Iterable[Tuple[str, Any, Dict[str, Any]]]) -> int:
+        """ 追加多条 (op, record_id, 字段) 事件，只 flush 一次；返回最后一条的序号 """
+        with self._lock:
+            now = time.time()
+            lines: List[str] = []
+            for op, record_id, fields in events:
+                self._seq += 1
+                event = {"seq": self._seq, "ts": now, "op": op, "id": str(record_id)}
+                event.update(fields)
+                lines.append(json.dumps(event, ensure_ascii=False) + "\n")
+            self._file.write("".join(lines))
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._pending += len(lines)
+            if self._pending >= self.compact_every:
+                self._start_compaction()
+            return self._seq
+
+    def events(self, after_seq: int = 0) -> Iterator[Dict[str, Any]]:
+        """ 逐条读取日志中序号大于 after_seq 的事件 (不含已压缩进快照的事件) """
+        # 持有写入锁读取两个文件，避免读取期间日志被改名为待压缩日志
+        with self._lock:
+            self._file.flush()
+            with self._swap_lock:
+                pending = list(self._read_events(self.compacting_path)) + list(self._read_events(self.path))
+        for event in pending:
+            if event["seq"] > after_seq:
+                yield event
+
+    def state(self) -> Dict[str, Dict[str, Any]]:
+        """ 重放 快照 + 日志，返回当前存在的记录 {record_id: 记录} """
+        with self._lock:
+            self._file.flush()
+            return self._replay()[1]
+
+    def _replay(self, paths: Optional[List[str]] = None) -> Tuple[int, Dict[str, Dict[str, Any]]]:
+        """ 重放 快照 + 待压缩日志 + 日志 (paths 为空时) """
+        with self._swap_lock:
+            seq, records = self._load_snapshot()
+            for path in paths or [self.compacting_path, self.path]:
+                for event in self._read_events(path):
+                    # 替换快照后、删除待压缩日志前崩溃时，会残留已进入快照的事件
+                    if event["seq"] > seq:
+                        apply_event(records, event)
+                        seq = event["seq"]
+        return seq, records
+
+    def compact(self) -> None:
+        """ 立即压缩并等待完成 (遗留的待压缩日志先压缩，再压缩当前日志) """
+        for _ in range(2):
+            self.wait_compaction()
+            with self._lock:
+                self._file.flush()
+                rotated = not os.path.exists(self.compacting_path)
+                self._start_compaction()
+            self.wait_compaction()
+            if rotated:
+                return
+
+    def wait_compaction(self) -> None:
+        """ 等待正在进行的后台压缩完成 """
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+
+    def _start_compaction(self) -> None:
+        """ 启动后台压缩 (调用方持有 _lock)；已有压缩在进行时跳过，下次写入再检查 """
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        if not os.path.exists(self.compacting_path):
+            # 当前日志改名为待压缩日志，之后的事件写入新的空日志
+            self._file.close()
+            os.replace(self.path, self.compacting_path)
+            self._file = open(self.path, "a", encoding="utf-8")
+            self._pending = 0
+        self._compactor = threading.Thread(target=self._compact, name="journal-compactor", daemon=True)
+        self._compactor.start()
+
+    def _compact(self) -> None:
+        """
+        后台线程：把 快照 + 待压缩日志 写成新快照，再删除待压缩日志
+        待压缩日志的事件按 record_id 分组，快照逐行读出、应用该记录的事件后逐行写出，
+        只在日志中出现的记录最后写出；不把整个账本读入内存
+        """
+        try:
+            seq = self._snapshot_seq()
+            changes: Dict[str, List[Dict[str, Any]]] = {}
+            for event in self._read_events(self.compacting_path):
+                # 替换快照后、删除待压缩日志前崩溃时，会残留已进入快照的事件
+                if event["seq"] > seq:
+                    changes.setdefault(event["id"], []).append(event)
+                    seq = event["seq"]
+            count = 0
+            tmp_path = self.snapshot_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+
+                def write(record_id: str, state: Dict[str, Dict[str, Any]]) -> None:
+                    nonlocal count
+                    for event in changes.pop(record_id, ()):
+                        apply_event(state, event)
+                    if record_id in state:
+                        f.write(json.dumps({"id": record_id, "record": state[record_id]}, ensure_ascii=False) + "\n")
+                        count += 1
+
+                f.write(json.dumps({"seq": seq}) + "\n")
+                for record_id, record in self._snapshot_records():
+                    write(record_id, {record_id: record})
+                for record_id in list(changes):
+                    write(record_id, {})
+                f.flush()
+                os.fsync(f.fileno())
+            with self._swap_lock:
+                os.replace(tmp_path, self.snapshot_path)
+                os.remove(self.compacting_path)
+        except (OSError, ValueError) as e:
+            # 待压缩日志保留，下次压缩时重试；重放时仍会读取它
+            print(f"[EventJournal] 压缩日志失败: {e}")
+            return
+        print(f"[EventJournal] 已压缩日志到序号 {seq} ({count} 条记录)")
+
+    def close(self) -> None:
+        self.wait_compaction()
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+_JOURNALS: Dict[str, EventJournal] = {}
+_JOURNALS_LOCK = threading.Lock()
+
+
+def journal_path(db_path: str) -> str:
+    """ 数据库文件对应的日志路径: db/app.db -> db/app.journal """
+    return os.path.splitext(db_path)[0] + JOURNAL_SUFFIX
+
+
+def journal_for(db: Any) -> Optional[EventJournal]:
+    """
+    返回数据库文件的变更日志 (同一文件共享一个，首次使用时打开)
+    没有有效 db_path 的数据库 (如测试中的 Mock) 返回 None
+    """
+    db_path = getattr(db, "db_path", None)
+    if not isinstance(db_path, str):
+        return None
+    key = os.path.abspath(db_path)
+    with _JOURNALS_LOCK:
+        journal = _JOURNALS.get(key)
+        if journal is None:
+            db_dir = os.path.dirname(key)
+            os.makedirs(db_dir, exist_ok=True)
+            journal = _JOURNALS[key] = EventJournal(journal_path(key))
+    return journal
+
+
+def close_journals(db_path: Any = None) -> None:
+    """ 关闭变更日志 (db_path 为空时关闭全部) """
+    path = os.path.abspath(db_path) if db_path is not None else None
+    with _JOURNALS_LOCK:
+        for key in [k for k in _JOURNALS if path is None or k == path]:
+            _JOURNALS.pop(key).close()
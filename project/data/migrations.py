@@ -0,0 +1,611 @@
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional, Sequence, Tuple
+
+# 数据库结构版本管理
+# 当前结构版本记录在 PRAGMA user_version 中，启动时按版本号依次执行尚未应用的迁移。
+# 每个迁移由若干步骤组成：
+#   SqlScript      建表、触发器等只修改结构的语句，瞬间完成
+#   CreateIndex    每个索引单独一个事务，不与其他步骤共享写锁
+#   Function       自定义的短事务步骤 (如替换重建后的表)
+#   Backfill       按块回填大表，每块一个短事务，块之间让出写锁，
+#                  进度 (游标) 与该块的数据在同一事务中提交，中断后从上次的位置继续
+# 只有全部步骤完成后才更新 user_version。
+
+# 进度回调: (版本号, 步骤名, 已完成数量, 总数量)
+ProgressCallback = Callable[[int, str, int, int], None]
+
+# 回填时每个事务处理的行数
+BACKFILL_CHUNK_SIZE = 2000
+
+MIGRATION_PROGRESS_SQL = """
+CREATE TABLE IF NOT EXISTS migration_progress (
+    version INTEGER NOT NULL,
+    step TEXT NOT NULL,
+    cursor TEXT,
+    done INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (version, step)
+)
+"""
+
+# 全文检索文档：备注 + 商户 + 标签名 (r 为 records 表别名)
+SEARCH_DOCUMENT_SQL = (
+    "r.note || ' ' || r.merchant || ' ' || COALESCE(("
+    "SELECT group_concat(t.name, ' ') FROM record_tags rt "
+    "JOIN tags t ON t.tag_id = rt.tag_id WHERE rt.record_id = r.record_id), '')"
+)
+
+# 版本 1：表结构 (Record, Tag, Photo, Reminder)、月度汇总与全文检索
+SCHEMA_V1_SQL = """
+CREATE TABLE IF NOT EXISTS records (
+    record_id INTEGER PRIMARY KEY,
+    type TEXT NOT NULL,
+    amount REAL NOT NULL,
+    date TEXT NOT NULL,
+    note TEXT NOT NULL DEFAULT '',
+    merchant TEXT NOT NULL DEFAULT '',
+    category TEXT NOT NULL DEFAULT '其他'
+);
+
+CREATE TABLE IF NOT EXISTS tags (
+    tag_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS record_tags (
+    record_id INTEGER NOT NULL REFERENCES records(record_id) ON DELETE CASCADE,
+    tag_id INTEGER NOT NULL REFERENCES tags(tag_id) ON DELETE CASCADE,
+    PRIMARY KEY (record_id, tag_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS photos (
+    photo_id INTEGER PRIMARY KEY,
+    record_id INTEGER NOT NULL REFERENCES records(record_id) ON DELETE CASCADE,
+    file_path TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS reminders (
+    reminder_id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    reminder_time TEXT NOT NULL,
+    is_completed INTEGER NOT NULL DEFAULT 0,
+    related_expense TEXT
+);
+
+-- 数据清理 (Req008) 已删除记录、尚未删除的图片文件
+CREATE TABLE IF NOT EXISTS pending_photo_deletes (
+    file_path TEXT NOT NULL
+);
+
+-- 月度汇总 (Req015, Req016, Req017)：按 月份/类型/分类 维护的物化汇总表，
+-- 由下面的触发器在写入、删除、修改 records 时同步更新
+CREATE TABLE IF NOT EXISTS monthly_totals (
+    month TEXT NOT NULL,
+    type TEXT NOT NULL,
+    category TEXT NOT NULL,
+    total REAL NOT NULL,
+    record_count INTEGER NOT NULL,
+    PRIMARY KEY (month, type, category)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS trg_records_rollup_insert AFTER INSERT ON records
+BEGIN
+    INSERT INTO monthly_totals (month, type, category, total, record_count)
+    VALUES (substr(NEW.date, 1, 7), NEW.type, NEW.category, NEW.amount, 1)
+    ON CONFLICT (month, type, category) DO UPDATE
+    SET total = total + excluded.total, record_count = record_count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_records_rollup_delete AFTER DELETE ON records
+BEGIN
+    UPDATE monthly_totals
+    SET total = total - OLD.amount, record_count = record_count - 1
+    WHERE month = substr(OLD.date, 1, 7) AND type = OLD.type AND category = OLD.category;
+    DELETE FROM monthly_totals
+    WHERE month = substr(OLD.date, 1, 7) AND type = OLD.type AND category = OLD.category
+      AND record_count <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_records_rollup_update
+AFTER UPDATE OF type, amount, date, category ON records
+BEGIN
+    UPDATE monthly_totals
+    SET total = total - OLD.amount, record_count = record_count - 1
+    WHERE month = substr(OLD.date, 1, 7) AND type = OLD.type AND category = OLD.category;
+    DELETE FROM monthly_totals
+    WHERE month = substr(OLD.date, 1, 7) AND type = OLD.type AND category = OLD.category
+      AND record_count <= 0;
+    INSERT INTO monthly_totals (month, type, category, total, record_count)
+    VALUES (substr(NEW.date, 1, 7), NEW.type, NEW.category, NEW.amount, 1)
+    ON CONFLICT (month, type, category) DO UPDATE
+    SET total = total + excluded.total, record_count = record_count + 1;
+END;
+
+-- 全文检索 (Req014)：rowid = record_id，内容为备注、商户与标签文本
+-- grams/chars 由连接上注册的 fts_grams/fts_chars 函数生成 (见 data/text_index.py)
+CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5(grams, chars, tokenize = 'unicode61');
+
+CREATE TRIGGER IF NOT EXISTS trg_records_fts_insert AFTER INSERT ON records
+BEGIN
+    INSERT INTO records_fts (rowid, grams, chars) VALUES (
+        NEW.record_id,
+        fts_grams(NEW.note || ' ' || NEW.merchant),
+        fts_chars(NEW.note || ' ' || NEW.merchant)
+    );
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_records_fts_update AFTER UPDATE OF note, merchant ON records
+BEGIN
+    DELETE FROM records_fts WHERE rowid = OLD.record_id;
+    INSERT INTO records_fts (rowid, grams, chars)
+    SELECT record_id, fts_grams(doc), fts_chars(doc) FROM (
+        SELECT record_id, {doc} AS doc FROM records r WHERE record_id = NEW.record_id
+    );
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_records_fts_delete AFTER DELETE ON records
+BEGIN
+    DELETE FROM records_fts WHERE rowid = OLD.record_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_record_tags_fts_insert AFTER INSERT ON record_tags
+BEGIN
+    DELETE FROM records_fts WHERE rowid = NEW.record_id;
+    INSERT INTO records_fts (rowid, grams, chars)
+    SELECT record_id, fts_grams(doc), fts_chars(doc) FROM (
+        SELECT record_id, {doc} AS doc FROM records r WHERE record_id = NEW.record_id
+    );
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_record_tags_fts_delete AFTER DELETE ON record_tags
+BEGIN
+    DELETE FROM records_fts WHERE rowid = OLD.record_id;
+    INSERT INTO records_fts (rowid, grams, chars)
+    SELECT record_id, fts_grams(doc), fts_chars(doc) FROM (
+        SELECT record_id, {doc} AS doc FROM records r WHERE record_id = OLD.record_id
+    );
+END;
+""".replace("{doc}", SEARCH_DOCUMENT_SQL)
+
+# 版本 1 的索引，每个索引单独建立
+SCHEMA_V1_INDEXES = (
+    # 列表筛选 (Req010): WHERE type = ? ORDER BY date, record_id
+    ("idx_records_type_date", "CREATE INDEX IF NOT EXISTS idx_records_type_date ON records(type, date)"),
+    # 全部记录列表与 (date, record_id) 键集分页
+    ("idx_records_date", "CREATE INDEX IF NOT EXISTS idx_records_date ON records(date)"),
+    # 日期范围查询与月度报告 (Req015, Req016) 的覆盖索引
+    ("idx_records_date_type_category", "CREATE INDEX IF NOT EXISTS idx_records_date_type_category ON records(date, type, category, amount)"),
+    # 标签筛选 (Req013): tag_id -> record_id
+    ("idx_record_tags_tag", "CREATE INDEX IF NOT EXISTS idx_record_tags_tag ON record_tags(tag_id, record_id)"),
+    ("idx_photos_record", "CREATE INDEX IF NOT EXISTS idx_photos_record ON photos(record_id)"),
+    ("idx_reminders_pending", "CREATE INDEX IF NOT EXISTS idx_reminders_pending ON reminders(is_completed, reminder_time)"),
+)
+
+
+# 版本 2：金额改为整数分 (records.amount、monthly_totals.total 由 REAL 改为 INTEGER)
+# SQLite 不能修改列类型，按 新建表 -> 分块复制 -> 替换 的方式重建 records
+RECORDS_V2_SQL = """
+CREATE TABLE IF NOT EXISTS records_v2 (
+    record_id INTEGER PRIMARY KEY,
+    type TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    note TEXT NOT NULL DEFAULT '',
+    merchant TEXT NOT NULL DEFAULT '',
+    category TEXT NOT NULL DEFAULT '其他'
+)
+"""
+
+MONTHLY_TOTALS_V2_SQL = """
+CREATE TABLE monthly_totals (
+    month TEXT NOT NULL,
+    type TEXT NOT NULL,
+    category TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    record_count INTEGER NOT NULL,
+    PRIMARY KEY (month, type, category)
+) WITHOUT ROWID
+"""
+
+
+class Step:
+    """ 迁移步骤基类 """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def run(self, conn: sqlite3.Connection, version: int, progress: ProgressCallback,
+            chunk_size: int, pause: float) -> None:
+        raise NotImplementedError
+
+
+class SqlScript(Step):
+    """ 只修改结构的 SQL 脚本 (语句需可重复执行，如 IF NOT EXISTS) """
+
+    def __init__(self, name: str, sql: str) -> None:
+        super().__init__(name)
+        self.sql = sql
+
+    def run(self, conn: sqlite3.Connection, version: int, progress: ProgressCallback,
+            chunk_size: int, pause: float) -> None:
+        conn.executescript(self.sql)
+        progress(version, self.name, 1, 1)
+
+
+class CreateIndex(Step):
+    """ 创建一个索引，单独占用一个事务 (WAL 模式下建索引期间读操作不受影响) """
+
+    def __init__(self, name: str, sql: str) -> None:
+        super().__init__(name)
+        self.sql = sql
+
+    def run(self, conn: sqlite3.Connection, version: int, progress: ProgressCallback,
+            chunk_size: int, pause: float) -> None:
+        with conn:
+            conn.execute(self.sql)
+        progress(version, self.name, 1, 1)
+
+
+class Function(Step):
+    """ 自定义步骤：fn(conn) 自行管理事务，必须可重复执行 """
+
+    def __init__(self, name: str, fn: Callable[[sqlite3.Connection], None]) -> None:
+        super().__init__(name)
+        self.fn = fn
+
+    def run(self, conn: sqlite3.Connection, version: int, progress: ProgressCallback,
+            chunk_size: int, pause: float) -> None:
+        self.fn(conn)
+        progress(version, self.name, 1, 1)
+
+
+# 回填函数: (连接, 游标, 块大小) -> (新游标, 本块行数)；没有剩余数据时返回 None
+ChunkFunction = Callable[[sqlite3.Connection, Optional[str], int], Optional[Tuple[str, int]]]
+
+
+class Backfill(Step):
+    """
+    分块回填
+    chunk 在调用方开启的事务中处理游标之后的一块数据，必须可重复执行
+    (先删除该块范围内的旧结果再写入)，这样与并发写入的触发器结果不会重复
+    """
+
+    def __init__(self, name: str, total_sql: str, chunk: ChunkFunction) -> None:
+        super().__init__(name)
+        self.total_sql = total_sql
+        self.chunk = chunk
+
+    def run(self, conn: sqlite3.Connection, version: int, progress: ProgressCallback,
+            chunk_size: int, pause: float) -> None:
+        total = conn.execute(self.total_sql).fetchone()[0]
+        row = conn.execute(
+            "SELECT cursor FROM migration_progress WHERE version = ? AND step = ?",
+            (version, self.name),
+        ).fetchone()
+        cursor = row[0] if row else None
+        done = 0
+        progress(version, self.name, done, total)
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = self.chunk(conn, cursor, chunk_size)
+                if result is not None:
+                    cursor, count = result
+                    conn.execute(
+                        "INSERT OR REPLACE INTO migration_progress (version, step, cursor) "
+                        "VALUES (?, ?, ?)",
+                        (version, self.name, cursor),
+                    )
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+            if result is None:
+                break
+            done = min(total, done + count)
+            progress(version, self.name, done, total)
+            if pause:
+                time.sleep(pause)
+        progress(version, self.name, total, total)
+
+
+@dataclass(frozen=True)
+class Migration:
+    """ 一个结构版本：version 从 1 开始连续编号 """
+    version: int
+    description: str
+    steps: Tuple[Step, ...]
+
+
+def _backfill_monthly_totals(conn: sqlite3.Connection, cursor: Optional[str],
+                             chunk_size: int) -> Optional[Tuple[str, int]]:
+    """ 按月重新聚合 monthly_totals，每块一个月 (游标为已完成的 "YYYY-MM") """
+    # "YYYY-MM-99" 大于该月的所有日期，用于走 date 索引定位下一个月
+    month = conn.execute(
+        "SELECT substr(MIN(date), 1, 7) FROM records WHERE date > ?",
+        (cursor + "-99" if cursor else "",),
+    ).fetchone()[0]
+    if month is None:
+        return None
+    start, end = month + "-01", month + "-99"
+    conn.execute("DELETE FROM monthly_totals WHERE month = ?", (month,))
+    conn.execute(
+        "INSERT INTO monthly_totals (month, type, category, total, record_count) "
+        "SELECT ?, type, category, SUM(amount), COUNT(*) FROM records "
+        "WHERE date >= ? AND date <= ? GROUP BY type, category",
+        (month, start, end),
+    )
+    count = conn.execute(
+        "SELECT COUNT(*) FROM records WHERE date >= ? AND date <= ?", (start, end)
+    ).fetchone()[0]
+    return month, count
+
+
+def _backfill_search_index(conn: sqlite3.Connection, cursor: Optional[str],
+                           chunk_size: int) -> Optional[Tuple[str, int]]:
+    """ 按 record_id 区间重建 records_fts (游标为已完成的最大 record_id) """
+    lo = int(cursor or 0)
+    hi, count = conn.execute(
+        "SELECT MAX(record_id), COUNT(*) FROM ("
+        "SELECT record_id FROM records WHERE record_id > ? ORDER BY record_id LIMIT ?)",
+        (lo, chunk_size),
+    ).fetchone()
+    if hi is None:
+        return None
+    conn.execute("DELETE FROM records_fts WHERE rowid > ? AND rowid <= ?", (lo, hi))
+    conn.execute(
+        "INSERT INTO records_fts (rowid, grams, chars) "
+        "SELECT record_id, fts_grams(doc), fts_chars(doc) FROM ("
+        f"SELECT record_id, {SEARCH_DOCUMENT_SQL} AS doc FROM records r "
+        "WHERE record_id > ? AND record_id <= ?)",
+        (lo, hi),
+    )
+    return str(hi), count
+
+
+def _copy_records_to_cents(conn: sqlite3.Connection, cursor: Optional[str],
+                           chunk_size: int) -> Optional[Tuple[str, int]]:
+    """ 按 record_id 区间把 records 复制到 records_v2，金额转换为分 """
+    lo = int(cursor or 0)
+    hi, count = conn.execute(
+        "SELECT MAX(record_id), COUNT(*) FROM ("
+        "SELECT record_id FROM records WHERE record_id > ? ORDER BY record_id LIMIT ?)",
+        (lo, chunk_size),
+    ).fetchone()
+    if hi is None:
+        return None
+    conn.execute(
+        "INSERT OR REPLACE INTO records_v2 (record_id, type, amount, date, note, merchant, category) "
+        "SELECT record_id, type, CAST(ROUND(amount * 100) AS INTEGER), date, note, merchant, category "
+        "FROM records WHERE record_id > ? AND record_id <= ?",
+        (lo, hi),
+    )
+    return str(hi), count
+
+
+def _swap_records_table(conn: sqlite3.Connection) -> None:
+    """
+    用 records_v2 替换 records，并以整数分重建 monthly_totals
+    records_v2 不存在说明已经替换过 (中断后重跑)，直接返回
+    """
+    if conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'records_v2'"
+    ).fetchone() is None:
+        return
+    # 删除旧表时不能触发外键级联 (会删掉 record_tags、photos)，外键检查只能在事务外关闭
+    conn.execute("PRAGMA foreign_keys = OFF")
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # record_tags 上的触发器引用 records，改名前先删除，之后与其他触发器一起重建
+            conn.execute("DROP TRIGGER IF EXISTS trg_record_tags_fts_insert")
+            conn.execute("DROP TRIGGER IF EXISTS trg_record_tags_fts_delete")
+            conn.execute("DROP TABLE records")
+            conn.execute("ALTER TABLE records_v2 RENAME TO records")
+            conn.execute("DROP TABLE monthly_totals")
+            conn.execute(MONTHLY_TOTALS_V2_SQL)
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+    finally:
+        conn.execute("PRAGMA foreign_keys = ON")
+    # 重建随旧表删除的触发器 (其余 IF NOT EXISTS 语句不受影响)
+    conn.executescript(SCHEMA_V1_SQL)
+
+
+# 版本 3：图片内容寻址存储 (photo_store)
+# photos.sha256 指向 photo_blobs 中的文件，photo_blobs.ref_count 由触发器随 photos 的增删维护，
+# 引用数为 0 的文件由 LocalDatabase 回收；升级前的图片 sha256 为空，仍按原路径处理
+PHOTO_BLOBS_SQL = """
+CREATE TABLE IF NOT EXISTS photo_blobs (
+    sha256 TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    ref_count INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+-- 待回收 (无引用) 的文件
+CREATE INDEX IF NOT EXISTS idx_photo_blobs_unreferenced ON photo_blobs(sha256) WHERE ref_count <= 0;
+
+CREATE TRIGGER IF NOT EXISTS trg_photos_blob_insert AFTER INSERT ON photos
+WHEN NEW.sha256 IS NOT NULL BEGIN
+    UPDATE photo_blobs SET ref_count = ref_count + 1 WHERE sha256 = NEW.sha256;
+END;
+
+-- 删除记录时外键级联删除 photos 也会触发
+CREATE TRIGGER IF NOT EXISTS trg_photos_blob_delete AFTER DELETE ON photos
+WHEN OLD.sha256 IS NOT NULL BEGIN
+    UPDATE photo_blobs SET ref_count = ref_count - 1 WHERE sha256 = OLD.sha256;
+END;
+"""
+
+
+def _add_photo_sha256(conn: sqlite3.Connection) -> None:
+    """ 为 photos 增加 sha256 列 (已存在时跳过，中断后可重跑) """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(photos)")}
+    if "sha256" not in columns:
+        with conn:
+            conn.execute("ALTER TABLE photos ADD COLUMN sha256 TEXT")
+
+
+# 版本 4：记录指纹 (data.fingerprint)，用于重复导入时去重；删除记录时级联删除指纹
+RECORD_FINGERPRINTS_SQL = """
+CREATE TABLE IF NOT EXISTS record_fingerprints (
+    fingerprint TEXT PRIMARY KEY,
+    record_id INTEGER NOT NULL REFERENCES records(record_id) ON DELETE CASCADE
+) WITHOUT ROWID
+"""
+
+
+# 版本 5：软删除
+# 删除记录时只写入 deleted_at (墓碑)，所有查询排除墓碑记录，由后台清理线程 (data.purge_worker) 分批物理删除；
+# 月度汇总在写入墓碑时立即扣除、撤销删除时加回，物理删除墓碑记录时不再重复扣除
+TOMBSTONE_TRIGGERS_SQL = """
+DROP TRIGGER IF EXISTS trg_records_rollup_insert;
+DROP TRIGGER IF EXISTS trg_records_rollup_delete;
+DROP TRIGGER IF EXISTS trg_records_rollup_update;
+
+CREATE TRIGGER trg_records_rollup_insert AFTER INSERT ON records
+WHEN NEW.deleted_at IS NULL BEGIN
+    INSERT INTO monthly_totals (month, type, category, total, record_count)
+    VALUES (substr(NEW.date, 1, 7), NEW.type, NEW.category, NEW.amount, 1)
+    ON CONFLICT (month, type, category) DO UPDATE
+    SET total = total + excluded.total, record_count = record_count + 1;
+END;
+
+CREATE TRIGGER trg_records_rollup_delete AFTER DELETE ON records
+WHEN OLD.deleted_at IS NULL BEGIN
+    UPDATE monthly_totals
+    SET total = total - OLD.amount, record_count = record_count - 1
+    WHERE month = substr(OLD.date, 1, 7) AND type = OLD.type AND category = OLD.category;
+    DELETE FROM monthly_totals
+    WHERE month = substr(OLD.date, 1, 7) AND type = OLD.type AND category = OLD.category
+      AND record_count <= 0;
+END;
+
+CREATE TRIGGER trg_records_rollup_update
+AFTER UPDATE OF type, amount, date, category ON records
+WHEN OLD.deleted_at IS NULL AND NEW.deleted_at IS NULL BEGIN
+    UPDATE monthly_totals
+    SET total = total - OLD.amount, record_count = record_count - 1
+    WHERE month = substr(OLD.date, 1, 7) AND type = OLD.type AND category = OLD.category;
+    DELETE FROM monthly_totals
+    WHERE month = substr(OLD.date, 1, 7) AND type = OLD.type AND category = OLD.category
+      AND record_count <= 0;
+    INSERT INTO monthly_totals (month, type, category, total, record_count)
+    VALUES (substr(NEW.date, 1, 7), NEW.type, NEW.category, NEW.amount, 1)
+    ON CONFLICT (month, type, category) DO UPDATE
+    SET total = total + excluded.total, record_count = record_count + 1;
+END;
+
+-- 写入墓碑：从月度汇总中扣除
+CREATE TRIGGER IF NOT EXISTS trg_records_rollup_tombstone AFTER UPDATE OF deleted_at ON records
+WHEN OLD.deleted_at IS NULL AND NEW.deleted_at IS NOT NULL BEGIN
+    UPDATE monthly_totals
+    SET total = total - OLD.amount, record_count = record_count - 1
+    WHERE month = substr(OLD.date, 1, 7) AND type = OLD.type AND category = OLD.category;
+    DELETE FROM monthly_totals
+    WHERE month = substr(OLD.date, 1, 7) AND type = OLD.type AND category = OLD.category
+      AND record_count <= 0;
+END;
+
+-- 撤销删除：加回月度汇总
+CREATE TRIGGER IF NOT EXISTS trg_records_rollup_undelete AFTER UPDATE OF deleted_at ON records
+WHEN OLD.deleted_at IS NOT NULL AND NEW.deleted_at IS NULL BEGIN
+    INSERT INTO monthly_totals (month, type, category, total, record_count)
+    VALUES (substr(NEW.date, 1, 7), NEW.type, NEW.category, NEW.amount, 1)
+    ON CONFLICT (month, type, category) DO UPDATE
+    SET total = total + excluded.total, record_count = record_count + 1;
+END;
+"""
+
+
+def _add_records_deleted_at(conn: sqlite3.Connection) -> None:
+    """ 为 records 增加 deleted_at 列 (已存在时跳过，中断后可重跑) """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(records)")}
+    if "deleted_at" not in columns:
+        with conn:
+            conn.execute("ALTER TABLE records ADD COLUMN deleted_at TEXT")
+
+
+MIGRATIONS: Tuple[Migration, ...] = (
+    Migration(1, "基础表结构、月度汇总与全文检索", (
+        SqlScript("创建表与触发器", SCHEMA_V1_SQL),
+        *(CreateIndex(name, sql) for name, sql in SCHEMA_V1_INDEXES),
+        Backfill("回填月度汇总", "SELECT COUNT(*) FROM records", _backfill_monthly_totals),
+        Backfill("回填全文检索", "SELECT COUNT(*) FROM records", _backfill_search_index),
+    )),
+    Migration(2, "金额改为整数分", (
+        SqlScript("创建 records_v2", RECORDS_V2_SQL),
+        Backfill("复制记录", "SELECT COUNT(*) FROM records", _copy_records_to_cents),
+        Function("替换 records 表", _swap_records_table),
+        *(CreateIndex(name, sql) for name, sql in SCHEMA_V1_INDEXES if "ON records(" in sql),
+        Backfill("回填月度汇总", "SELECT COUNT(*) FROM records", _backfill_monthly_totals),
+    )),
+    Migration(3, "图片内容寻址存储", (
+        Function("photos 增加 sha256 列", _add_photo_sha256),
+        SqlScript("创建 photo_blobs 与引用计数触发器", PHOTO_BLOBS_SQL),
+    )),
+    Migration(4, "记录指纹去重", (
+        SqlScript("创建 record_fingerprints", RECORD_FINGERPRINTS_SQL),
+        # 删除记录时按 record_id 级联删除指纹
+        CreateIndex("idx_record_fingerprints_record",
+                    "CREATE INDEX IF NOT EXISTS idx_record_fingerprints_record ON record_fingerprints(record_id)"),
+    )),
+    Migration(5, "软删除", (
+        Function("records 增加 deleted_at 列", _add_records_deleted_at),
+        SqlScript("月度汇总触发器跳过墓碑记录", TOMBSTONE_TRIGGERS_SQL),
+        # 后台清理线程按删除时间查找墓碑记录 (部分索引，只包含墓碑)
+        CreateIndex("idx_records_tombstones",
+                    "CREATE INDEX IF NOT EXISTS idx_records_tombstones ON records(deleted_at) "
+                    "WHERE deleted_at IS NOT NULL"),
+    )),
+)
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    """ 当前数据库的结构版本 """
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _no_progress(version: int, step: str, done: int, total: int) -> None:
+    pass
+
+
+def migrate(conn: sqlite3.Connection, migrations: Sequence[Migration] = MIGRATIONS,
+            progress: Optional[ProgressCallback] = None,
+            chunk_size: int = BACKFILL_CHUNK_SIZE, pause: float = 0.0) -> int:
+    """
+    依次执行版本号大于 user_version 的迁移，返回迁移后的版本号
+    pause 为回填块之间的等待秒数，后台迁移时可调大以给其他写入让路
+    """
+    report = progress or _no_progress
+    current = schema_version(conn)
+    pending = [m for m in sorted(migrations, key=lambda m: m.version) if m.version > current]
+    if pending:
+        conn.execute(MIGRATION_PROGRESS_SQL)
+    for migration in pending:
+        print(f"[Migration] 升级数据库结构到版本 {migration.version}: {migration.description}")
+        finished = {
+            step for step, in conn.execute(
+                "SELECT step FROM migration_progress WHERE version = ? AND done = 1",
+                (migration.version,),
+            )
+        }
+        for step in migration.steps:
+            if step.name in finished:
+                continue
+            step.run(conn, migration.version, report, chunk_size, pause)
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO migration_progress (version, step, cursor, done) "
+                    "VALUES (?, ?, NULL, 1)",
+                    (migration.version, step.name),
+                )
+        # user_version 写在数据库文件头，与清理进度在同一事务中提交
+        with conn:
+            conn.execute("DELETE FROM migration_progress WHERE version = ?", (migration.version,))
+            conn.execute(f"PRAGMA user_version = {int(migration.version)}")
+        current = migration.version
+    return current
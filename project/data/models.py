@@ -1,40 +1,215 @@
+from array import array
 from dataclasses import dataclass, field
-from typing import List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 from datetime import date, datetime
 
+# Record 的 __init__ 参数名 date 遮蔽了类型名，参数注解使用此别名
+_Date = date
+
+# 模型使用 __slots__，实例不带 __dict__；大批量查询结果用 RecordBatch 列式保存
+
 # 定义 RecordType 枚举 (Req001) [cite: 14]
 class RecordType:
     INCOME = "收入"
     EXPENSE = "支出"
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Tag:
-    """ 对应UML中的Tag类  """
-    tag_id: str
+    """ 对应UML中的Tag类，不可变；同一标签在进程内共享一个对象 (见 data.tags.TagDictionary) """
+    tag_id: int
     name: str
 
-@dataclass
+@dataclass(slots=True)
 class Photo:
     """ 对应UML中的Photo类  """
     photo_id: str
     file_path: str # 
 
-@dataclass
+@dataclass(slots=True, init=False)
 class Record:
-    """ 对应UML中的Record类  """
+    """
+    对应UML中的Record类
+    标签 [cite: 20] 与图片 [cite: 22] 可以在构造时给出；由 Record.lazy 创建的记录在首次访问
+    tags/photos 时经数据库 (LocalDatabase) 读取关联，RecordManager.getRecords(prefetch=...) 可为整页记录一次性填充
+    """
     record_id: str
     type: str # RecordType.INCOME 或 RecordType.EXPENSE [cite: 14]
-    amount: float # 
+    amount: int # 金额 (分)，界面上再格式化为元
     date: date # [cite: 17]
     note: Optional[str] = "" # [cite: 17]
-    tags: List[Tag] = field(default_factory=list) # [cite: 20]
-    photos: List[Photo] = field(default_factory=list) # [cite: 22]
+    _tags: Optional[List[Tag]] = field(default=None, repr=False, compare=False)
+    _photos: Optional[List[Photo]] = field(default=None, repr=False, compare=False)
+    _loader: Any = field(default=None, repr=False, compare=False)
+
+    def __init__(self, record_id: str, type: str, amount: int, date: _Date, note: Optional[str] = "",
+                 tags: Optional[Iterable[Tag]] = None, photos: Optional[Iterable[Photo]] = None) -> None:
+        self.record_id = record_id
+        self.type = type
+        self.amount = amount
+        self.date = date
+        self.note = note
+        self._tags = list(tags) if tags is not None else None
+        self._photos = list(photos) if photos is not None else None
+        self._loader = None
+
+    @classmethod
+    def lazy(cls, loader: Any, record_id: str, type: str, amount: int, date: _Date,
+             note: Optional[str] = "") -> "Record":
+        """ 创建标签与图片延迟加载的记录：首次访问时调用 loader.fetchTags / loader.fetchPhotos """
+        record = cls(record_id=record_id, type=type, amount=amount, date=date, note=note)
+        record._loader = loader
+        return record
+
+    @property
+    def tags(self) -> List[Tag]:
+        if self._tags is None:
+            self._tags = self._load("fetchTags")
+        return self._tags
+
+    @tags.setter
+    def tags(self, tags: List[Tag]) -> None:
+        self._tags = list(tags)
+
+    @property
+    def photos(self) -> List[Photo]:
+        if self._photos is None:
+            self._photos = self._load("fetchPhotos")
+        return self._photos
+
+    @photos.setter
+    def photos(self, photos: List[Photo]) -> None:
+        self._photos = list(photos)
+
+    def _load(self, method: str) -> List[Any]:
+        if self._loader is None:
+            return []
+        return getattr(self._loader, method)([self.record_id]).get(self.record_id, [])
 
-@dataclass
+@dataclass(slots=True)
 class Reminder:
     """ 对应UML中的Reminder类  """
     reminder_id: str
     title: str # 
     reminder_time: datetime # 
     is_completed: bool = False # 
-    related_expense: Optional[str] = None # 关联的预支出项目 (Req019)
\ No newline at end of file
+    related_expense: Optional[str] = None # 关联的预支出项目 (Req019)
+
+
+class RecordBatch:
+    """
+    查询结果的列式容器
+    各列保存在并行的 array 中：record_id 与金额 (分) 为 int64，日期为 date.toordinal()，
+    类型为整数编码；只有备注是字符串列表。按下标取出时返回轻量的 RecordRow 视图，
+    不为每一行创建 Record 对象。loader 为读出这些行的数据库，行的标签与图片经它按需读取。
+    """
+
+    __slots__ = ("ids", "amounts", "days", "types", "notes", "type_names", "_type_codes", "loader")
+
+    def __init__(self, loader: Any = None) -> None:
+        self.loader = loader
+        self.ids = array("q")
+        self.amounts = array("q")
+        self.days = array("l")
+        self.types = array("B")
+        self.notes: List[str] = []
+        self.type_names: List[str] = []
+        self._type_codes: Dict[str, int] = {}
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]], loader: Any = None) -> "RecordBatch":
+        """ 由 LocalDatabase.fetchData/iterData 的行字典构建，loader 为读出这些行的数据库 """
+        batch = cls(loader)
+        for r in rows:
+            batch.append(r["id"], r["type"], r["amount"], r["date"], r["note"])
+        return batch
+
+    def append(self, record_id: Any, record_type: str, amount: int, record_date: Any, note: Optional[str]) -> None:
+        code = self._type_codes.get(record_type)
+        if code is None:
+            code = self._type_codes[record_type] = len(self.type_names)
+            self.type_names.append(record_type)
+        if not isinstance(record_date, date):
+            record_date = date.fromisoformat(str(record_date))
+        self.ids.append(int(record_id))
+        self.amounts.append(int(amount))
+        self.days.append(record_date.toordinal())
+        self.types.append(code)
+        self.notes.append(note or "")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, index: int) -> "RecordRow":
+        if index < 0:
+            index += len(self.ids)
+        if not 0 <= index < len(self.ids):
+            raise IndexError("RecordBatch 下标越界")
+        return RecordRow(self, index)
+
+    def __iter__(self) -> Iterator["RecordRow"]:
+        for index in range(len(self.ids)):
+            yield RecordRow(self, index)
+
+    def to_records(self) -> List[Record]:
+        """ 转换为 Record 列表 (只在确实需要完整对象时使用) """
+        return [row.to_record() for row in self]
+
+
+class RecordRow:
+    """
+    RecordBatch 中一行的只读视图，属性与 Record 相同
+    只保存批次与下标，访问属性时才从列中取值
+    """
+
+    __slots__ = ("_batch", "_index")
+
+    def __init__(self, batch: RecordBatch, index: int) -> None:
+        self._batch = batch
+        self._index = index
+
+    @property
+    def record_id(self) -> str:
+        return str(self._batch.ids[self._index])
+
+    @property
+    def type(self) -> str:
+        return self._batch.type_names[self._batch.types[self._index]]
+
+    @property
+    def amount(self) -> int:
+        return self._batch.amounts[self._index]
+
+    @property
+    def date(self) -> date:
+        return date.fromordinal(self._batch.days[self._index])
+
+    @property
+    def note(self) -> str:
+        return self._batch.notes[self._index]
+
+    @property
+    def tags(self) -> Tuple[Tag, ...]:
+        """ 该行的标签 (每次访问查询一次；大量行请用 RecordManager.getRecords(prefetch=...)) """
+        return tuple(self._load("fetchTags"))
+
+    @property
+    def photos(self) -> Tuple[Photo, ...]:
+        return tuple(self._load("fetchPhotos"))
+
+    def _load(self, method: str) -> List[Any]:
+        loader = self._batch.loader
+        if loader is None:
+            raise RuntimeError("RecordBatch 没有关联数据库，无法读取标签与图片")
+        record_id = self.record_id
+        return getattr(loader, method)([record_id]).get(record_id, [])
+
+    def to_record(self) -> Record:
+        if self._batch.loader is None:
+            return Record(record_id=self.record_id, type=self.type, amount=self.amount,
+                          date=self.date, note=self.note)
+        return Record.lazy(self._batch.loader, record_id=self.record_id, type=self.type, amount=self.amount,
+                           date=self.date, note=self.note)
+
+    def __repr__(self) -> str:
+        return (f"RecordRow(record_id={self.record_id!r}, type={self.type!r}, amount={self.amount!r}, "
+                f"date={self.date!r}, note={self.note!r})")
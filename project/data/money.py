@@ -0,0 +1,31 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Any
+
+# 金额一律以整数分 (int64) 存储、传递与汇总，只在界面上格式化为元
+
+# SQLite INTEGER 与快照 array('q') 能表示的最大值
+MAX_CENTS = 2 ** 63 - 1
+
+
+def to_cents(amount: Any) -> int:
+    """
+    将以元为单位的金额 (数字或字符串，如 12.5、"12.50") 精确转换为整数分
+    按十进制四舍五入到分，不经过二进制浮点运算；无法转换时抛出 ValueError
+    """
+    if isinstance(amount, bool):
+        raise ValueError(f"金额必须是数字: {amount}")
+    try:
+        value = Decimal(str(amount).strip())
+        cents = int((value * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"金额必须是数字: {amount}")
+    if abs(cents) > MAX_CENTS:
+        raise ValueError(f"金额超出范围: {amount}")
+    return cents
+
+
+def format_cents(cents: int) -> str:
+    """ 将整数分格式化为元，保留两位小数 (如 1250 -> "12.50") """
+    sign = "-" if cents < 0 else ""
+    yuan, fen = divmod(abs(int(cents)), 100)
+    return f"{sign}{yuan}.{fen:02d}"
@@ -0,0 +1,453 @@
+import os
+import re
+import shutil
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .database import DB_PATH, RETENTION_PERIODS, DeletedCallback, LocalDatabase, _months_before, _row_to_dict
+from .migrations import ProgressCallback
+from .models import Photo, Tag
+from .photo_store import store_root
+from .query_builder import RECORD_COLUMNS, RecordQuery, date_bounds, sort_rows
+from .snapshot import get_snapshot
+
+# 全局 record_id 序列，保存在主库中，保证各年份分区的 ID 不重复
+# 存储模式：环境变量 ACCOUNTING_STORAGE=partitioned 时记录按年分区存储，否则保存在单个数据库文件中
+STORAGE_ENV = "ACCOUNTING_STORAGE"
+PARTITIONED_STORAGE = "partitioned"
+
+RECORD_SEQUENCE_SQL = """
+CREATE TABLE IF NOT EXISTS record_sequence (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    next_id INTEGER NOT NULL
+)
+"""
+
+
+def _year_of(value: Any) -> int:
+    if isinstance(value, date):
+        return value.year
+    return int(str(value)[:4])
+
+
+class PartitionedDatabase(LocalDatabase):
+    """
+    按年分区存储
+    每年的记录保存在独立的数据库文件中 (db/app.db -> db/app.2025.db)，
+    各分区使用与主库相同的表结构，月度汇总与全文检索在分区内维护。
+    查询按日期条件只打开相关年份的分区，保留期限清理对整年过期的分区直接删除文件。
+    主库保存 record_id 序列，以及跨年份的数据 (提醒、待删图片等)。
+    """
+
+    def __init__(self, db_path: str = DB_PATH) -> None:
+        super().__init__(db_path)
+        root, self._ext = os.path.splitext(db_path)
+        self._dir = os.path.dirname(root)
+        self._pattern = re.compile(
+            re.escape(os.path.basename(root)) + r"\.(\d{4})" + re.escape(self._ext) + "$"
+        )
+        self._root = root
+        self._partitions: Dict[int, LocalDatabase] = {}
+
+    def initialize_database(self, progress: Optional[ProgressCallback] = None) -> int:
+        version = super().initialize_database(progress)
+        conn = self._get_connection()
+        with conn:
+            conn.execute(RECORD_SEQUENCE_SQL)
+            conn.execute("INSERT OR IGNORE INTO record_sequence (id, next_id) VALUES (1, 1)")
+        for year in self.partitionYears():
+            self.partitionForWrite(year, progress)
+        return version
+
+    def close(self) -> None:
+        # 清理线程会访问各分区，先于分区连接停止
+        self.stopPurgeWorker()
+        for partition in self._partitions.values():
+            partition.close()
+        self._partitions.clear()
+        super().close()
+
+    def enableWriteBehind(self, flush_interval: float = 0.05, max_batch: int = 200) -> Any:
+        raise ValueError("按年分区存储不支持延迟写入")
+
+    def partitionPath(self, year: int) -> str:
+        """ 某年分区的文件路径 """
+        return f"{self._root}.{int(year)}{self._ext}"
+
+    def partitionYears(self) -> List[int]:
+        """ 已存在的分区年份，从新到旧 """
+        try:
+            names = os.listdir(self._dir or ".")
+        except FileNotFoundError:
+            return []
+        years = [int(m.group(1)) for m in map(self._pattern.match, names) if m]
+        return sorted(years, reverse=True)
+
+    def partition(self, year: int) -> Optional[LocalDatabase]:
+        """ 返回某年的分区 (按需打开)，分区文件不存在时返回 None """
+        if not os.path.exists(self.partitionPath(year)):
+            self._partitions.pop(year, None)
+            return None
+        return self.partitionForWrite(year)
+
+    def partitionForWrite(self, year: int, progress: Optional[ProgressCallback] = None) -> LocalDatabase:
+        """ 返回某年的分区，首次打开时建表并升级结构 (progress 报告迁移进度)，分区文件不存在时创建 """
+        path = self.partitionPath(year)
+        if not os.path.exists(path):
+            self._partitions.pop(year, None)
+        partition = self._partitions.get(year)
+        if partition is None:
+            partition = self._partitions[year] = LocalDatabase(path)
+            partition.initialize_database(progress)
+        return partition
+
+    def _routed_years(self, query: Optional[Dict[str, Any]] = None) -> List[int]:
+        """ 查询涉及的分区年份，从新到旧；有日期条件时只包含区间覆盖的年份 """
+        years = self.partitionYears()
+        if query and "date" in query:
+            start, end = date_bounds(query["date"])
+            first = int(start[:4])
+            # end 为开区间：YYYY-01-01 不包含该年
+            last = int(end[:4]) if end[5:10] > "01-01" else int(end[:4]) - 1
+            years = [year for year in years if first <= year <= last]
+        return years
+
+    def _routed(self, query: Optional[Dict[str, Any]] = None) -> List[LocalDatabase]:
+        """ 查询涉及的分区，从新到旧 """
+        partitions = (self.partition(year) for year in self._routed_years(query))
+        return [p for p in partitions if p is not None]
+
+    def _allocate_ids(self, count: int) -> int:
+        """ 从主库序列中分配 count 个连续的 record_id，返回第一个 """
+        conn = self._get_connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            first = conn.execute("SELECT next_id FROM record_sequence WHERE id = 1").fetchone()[0]
+            conn.execute("UPDATE record_sequence SET next_id = ? WHERE id = 1", (first + count,))
+        return first
+
+    def saveData(self, data: Any) -> str:
+        """ 保存数据，写入记录日期所在年份的分区 """
+        record_id = self._allocate_ids(1)
+        partition = self.partitionForWrite(_year_of(data["date"]))
+        conn = partition._get_connection()
+        with conn:
+            return partition._insert_record(conn, data, record_id)
+
+    def saveMany(self, rows: List[Dict[str, Any]], chunk_size: int = 500) -> List[str]:
+        """
+        批量保存数据，按年份分组写入各分区
+        每个分区一个事务；跨年份的批次不保证整体原子性
+        """
+        if chunk_size <= 0:
+            raise ValueError(f"chunk_size 必须是正数: {chunk_size}")
+        if not rows:
+            return []
+        first = self._allocate_ids(len(rows))
+        ids = list(range(first, first + len(rows)))
+        by_year: Dict[int, List[int]] = {}
+        for index, data in enumerate(rows):
+            by_year.setdefault(_year_of(data["date"]), []).append(index)
+        for year, indices in by_year.items():
+            partition = self.partitionForWrite(year)
+            conn = partition._get_connection()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                partition._insert_rows(conn, [ids[i] for i in indices], [rows[i] for i in indices], chunk_size)
+        return [str(record_id) for record_id in ids]
+
+    def saveDataUnique(self, data: Dict[str, Any]) -> Tuple[str, bool]:
+        # 指纹包含日期，同一指纹的记录总在同一年份的分区中
+        record_id = self._allocate_ids(1)
+        partition = self.partitionForWrite(_year_of(data["date"]))
+        conn = partition._get_connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            return partition._insert_unique(conn, data, record_id)
+
+    def saveManyUnique(self, rows: List[Dict[str, Any]], chunk_size: int = 500) -> Tuple[List[str], Dict[int, str]]:
+        if chunk_size <= 0:
+            raise ValueError(f"chunk_size 必须是正数: {chunk_size}")
+        if not rows:
+            return [], {}
+        # 按行数预分配 ID，重复的行留下的空号不影响唯一性
+        first = self._allocate_ids(len(rows))
+        by_year: Dict[int, List[int]] = {}
+        for index, data in enumerate(rows):
+            by_year.setdefault(_year_of(data["date"]), []).append(index)
+        inserted: List[int] = []
+        duplicates: Dict[int, str] = {}
+        for year, indices in by_year.items():
+            partition = self.partitionForWrite(year)
+            conn = partition._get_connection()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                fresh, found, repeats = partition._unique_rows(conn, [rows[i] for i in indices])
+                partition._insert_rows(conn, [first + indices[i] for i in fresh],
+                                       [rows[indices[i]] for i in fresh], chunk_size)
+            inserted.extend(indices[i] for i in fresh)
+            duplicates.update((indices[i], record_id) for i, record_id in found.items())
+            duplicates.update((indices[i], str(first + indices[j])) for i, j in repeats.items())
+        inserted.sort()
+        return [str(first + index) for index in inserted], duplicates
+
+    def addTag(self, record_id: str, tag_name: str) -> bool:
+        return any(partition.addTag(record_id, tag_name) for partition in self._routed())
+
+    def addPhoto(self, record_id: str, photo_path: str) -> Optional[str]:
+        # 每个分区有自己的图片存储，引用计数不跨分区
+        for partition in self._routed():
+            stored = partition.addPhoto(record_id, photo_path)
+            if stored is not None:
+                return stored
+        return None
+
+    def collectPhotos(self) -> int:
+        return sum(partition.collectPhotos() for partition in self._routed())
+
+    def existingIds(self, record_ids: List[str], chunk_size: int = 500) -> Set[str]:
+        found: Set[str] = set()
+        for partition in self._routed():
+            found.update(partition.existingIds(record_ids, chunk_size))
+        return found
+
+    def findFingerprints(self, fingerprints: List[str], chunk_size: int = 500) -> Dict[str, str]:
+        # 指纹包含日期，写入时随记录进入对应年份的分区
+        found: Dict[str, str] = {}
+        for partition in self._routed():
+            found.update(partition.findFingerprints(fingerprints, chunk_size))
+        return found
+
+    def restoreRecords(self, records: Dict[str, Dict[str, Any]], chunk_size: int = 500) -> int:
+        """ 按原 ID 写回记录到各自年份的分区，并把 ID 序列推进到已用的最大 ID 之后 """
+        missing = sorted(set(records) - self.existingIds(list(records)), key=int)
+        if not missing:
+            return 0
+        by_year: Dict[int, List[str]] = {}
+        for record_id in missing:
+            by_year.setdefault(_year_of(records[record_id]["date"]), []).append(record_id)
+        for year, ids in by_year.items():
+            partition = self.partitionForWrite(year)
+            conn = partition._get_connection()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                partition._insert_rows(conn, [int(i) for i in ids], [records[i] for i in ids], chunk_size)
+        conn = self._get_connection()
+        with conn:
+            conn.execute(
+                "UPDATE record_sequence SET next_id = MAX(next_id, ?) WHERE id = 1",
+                (int(missing[-1]) + 1,),
+            )
+        snapshot = get_snapshot(self)
+        if snapshot is not None:
+            snapshot.invalidate()
+        return len(missing)
+
+    def fetchData(self, query: Dict[str, Any]) -> List[Any]:
+        # 分区按年份从新到旧排列，依次拼接即保持 (date, record_id) 倒序
+        results: List[Any] = []
+        for partition in self._routed(query):
+            results.extend(partition.fetchData(query))
+        return results
+
+    def iterData(self, query: Dict[str, Any], batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        for partition in self._routed(query):
+            yield from partition.iterData(query, batch_size)
+
+    def iterSnapshotRows(self, batch_size: int = 2000) -> Iterator[Tuple[int, str, int, str, str]]:
+        for partition in reversed(self._routed()):
+            yield from partition.iterSnapshotRows(batch_size)
+
+    def tagRecordIds(self, tag_name: str) -> Set[int]:
+        # 每个分区有自己的 tags 表 (tag_id 不通用)，record_id 全局唯一，可以直接合并
+        found: Set[int] = set()
+        for partition in self._routed():
+            found.update(partition.tagRecordIds(tag_name))
+        return found
+
+    def fetchByIds(self, record_ids: Iterable[Any], chunk_size: int = 500) -> List[Dict[str, Any]]:
+        ids = list(record_ids)
+        results: List[Dict[str, Any]] = []
+        for partition in self._routed():
+            results.extend(partition.fetchByIds(ids, chunk_size))
+        return results
+
+    def fetchTags(self, record_ids: List[str], chunk_size: int = 500) -> Dict[str, List[Tag]]:
+        # 各分区的 Tag 来自各自的标签字典
+        result: Dict[str, List[Tag]] = {}
+        for partition in self._routed():
+            result.update(partition.fetchTags(record_ids, chunk_size))
+        return result
+
+    def fetchPhotos(self, record_ids: List[str], chunk_size: int = 500) -> Dict[str, List[Photo]]:
+        result: Dict[str, List[Photo]] = {}
+        for partition in self._routed():
+            result.update(partition.fetchPhotos(record_ids, chunk_size))
+        return result
+
+    def sumAmount(self, query: Dict[str, Any]) -> int:
+        return sum(partition.sumAmount(query) for partition in self._routed(query))
+
+    def fetchPage(self, query: Dict[str, Any], after: Optional[Tuple[str, int]] = None,
+                  limit: int = 200) -> Tuple[List[Dict[str, Any]], Optional[Tuple[str, int]]]:
+        if limit <= 0:
+            raise ValueError(f"limit 必须是正数: {limit}")
+        after_year = int(after[0][:4]) if after is not None else None
+        rows: List[Dict[str, Any]] = []
+        for year in self._routed_years(query):
+            if len(rows) == limit:
+                break
+            if after_year is not None and year > after_year:
+                continue
+            partition = self.partition(year)
+            if partition is None:
+                continue
+            page, _ = partition.fetchPage(query, after if year == after_year else None, limit - len(rows))
+            rows.extend(page)
+        next_cursor = (rows[-1]["date"], int(rows[-1]["id"])) if len(rows) == limit else None
+        return rows, next_cursor
+
+    def fetchQuery(self, query: RecordQuery) -> List[Dict[str, Any]]:
+        # 按日期区间只查询涉及的分区；标签名由各分区自己的标签字典解析，因此标签条件应使用名称
+        routing = {}
+        if query.start is not None or query.end is not None:
+            routing["date"] = (query.start or "0001-01-01", query.end or "9999-12-31")
+        rows: List[Dict[str, Any]] = []
+        for partition in self._routed(routing):
+            rows.extend(partition.fetchQuery(query))
+        rows = sort_rows(rows, query.order)
+        return rows[:query.limit] if query.limit is not None else rows
+
+    def fetchMonthlyTotals(self, month: str) -> List[Tuple[str, str, int]]:
+        partition = self.partition(_year_of(month))
+        return partition.fetchMonthlyTotals(month) if partition is not None else []
+
+    def rebuildMonthlyTotals(self) -> None:
+        for partition in self._routed():
+            partition.rebuildMonthlyTotals()
+
+    def checkMonthlyTotals(self) -> List[Tuple[str, str, str]]:
+        mismatches: List[Tuple[str, str, str]] = []
+        for partition in self._routed():
+            mismatches.extend(partition.checkMonthlyTotals())
+        return sorted(mismatches)
+
+    def rebuildSearchIndex(self) -> None:
+        for partition in self._routed():
+            partition.rebuildSearchIndex()
+
+    def searchText(self, term: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """ 全文检索：各分区内按相关度排序，分区之间新年份在前 """
+        results: List[Dict[str, Any]] = []
+        for partition in self._routed():
+            if len(results) >= limit:
+                break
+            results.extend(partition.searchText(term, limit - len(results)))
+        return results
+
+    def fetchByNote(self, note: str) -> List[Dict[str, Any]]:
+        results: List[Dict[str, Any]] = []
+        for partition in self._routed():
+            results.extend(partition.fetchByNote(note))
+        return results
+
+    def deleteData(self, record_id: str) -> bool:
+        # 按主键在各分区中查找，新年份优先
+        return any(partition.deleteData(record_id) for partition in self._routed())
+
+    def deleteMany(self, record_ids: List[str], chunk_size: int = 500) -> List[str]:
+        deleted: List[str] = []
+        for partition in self._routed():
+            deleted.extend(partition.deleteMany(record_ids, chunk_size))
+        return deleted
+
+    def undeleteMany(self, record_ids: List[str], chunk_size: int = 500) -> List[str]:
+        restored: List[str] = []
+        for partition in self._routed():
+            restored.extend(partition.undeleteMany(record_ids, chunk_size))
+        return restored
+
+    def fetchRecordData(self, record_ids: List[str], chunk_size: int = 500) -> Dict[str, Dict[str, Any]]:
+        found: Dict[str, Dict[str, Any]] = {}
+        for partition in self._routed():
+            found.update(partition.fetchRecordData(record_ids, chunk_size))
+        return found
+
+    def purgeDeleted(self, before: Optional[datetime] = None, batch_size: int = 500) -> int:
+        return sum(partition.purgeDeleted(before, batch_size) for partition in self._routed())
+
+    def run_cleanup_job(self, retention_period: str, batch_size: int = 500, today: Optional[date] = None,
+                        on_deleted: Optional[DeletedCallback] = None) -> int:
+        """
+        (Req008) 数据保留期限设置 [cite: 38]
+        整年早于保留期限的分区直接删除文件；期限所在年份的分区按记录分批清理
+        被删除的行 (含整个分区的行) 同样交给 on_deleted
+        返回本次删除的记录数
+        """
+        if retention_period not in RETENTION_PERIODS:
+            raise ValueError(f"无效的数据保留期限: {retention_period}")
+        if batch_size <= 0:
+            raise ValueError(f"batch_size 必须是正数: {batch_size}")
+        months = RETENTION_PERIODS[retention_period]
+        conn = self._get_connection()
+        self._purge_pending_photos(conn)
+        if months is None:
+            return 0
+
+        cutoff = _months_before(today or date.today(), months)
+        deleted = 0
+        for year in self.partitionYears():
+            if year < cutoff.year:
+                deleted += self._drop_partition(year, on_deleted)
+            elif year == cutoff.year:
+                deleted += self.partitionForWrite(year).run_cleanup_job(
+                    retention_period, batch_size, today, on_deleted
+                )
+        self._purge_pending_photos(conn)
+        snapshot = get_snapshot(self)
+        if deleted and snapshot is not None:
+            snapshot.invalidate()
+        return deleted
+
+    def _drop_partition(self, year: int, on_deleted: Optional[DeletedCallback] = None) -> int:
+        """
+        删除整个分区文件，图片路径先登记到主库的待删列表；返回删除的记录数
+        分区中的全部行 (含墓碑) 在删除文件前读出，删除后交给 on_deleted
+        """
+        partition = self.partition(year)
+        if partition is None:
+            return 0
+        pconn = partition._get_connection()
+        rows = pconn.execute(f"SELECT {RECORD_COLUMNS}, deleted_at IS NULL FROM records").fetchall()
+        count = sum(1 for row in rows if row[-1])
+        # 图片存储中的文件随分区的存储目录一起删除，只登记升级前按原路径保存的图片
+        photos = pconn.execute(
+            "SELECT file_path FROM photos WHERE sha256 IS NULL "
+            "UNION ALL SELECT file_path FROM pending_photo_deletes"
+        ).fetchall()
+        conn = self._get_connection()
+        with conn:
+            conn.executemany("INSERT INTO pending_photo_deletes (file_path) VALUES (?)", photos)
+        partition.close()
+        self._partitions.pop(year, None)
+        path = self.partitionPath(year)
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(path + suffix)
+            except FileNotFoundError:
+                pass
+        shutil.rmtree(store_root(path), ignore_errors=True)
+        print(f"[PartitionedDatabase] 已删除 {year} 年分区 ({count} 条记录)")
+        if on_deleted is not None and rows:
+            on_deleted([_row_to_dict(row[:-1]) for row in rows])
+        return count
+
+
+def open_database(db_path: str = DB_PATH, partitioned: Optional[bool] = None) -> LocalDatabase:
+    """
+    按存储模式打开记账数据库：partitioned 为 None 时由环境变量 ACCOUNTING_STORAGE 决定
+    存储模式需在账本创建时选定，已有的单文件账本切换为分区存储后，主库中的记录不会迁移到分区
+    """
+    if partitioned is None:
+        partitioned = os.environ.get(STORAGE_ENV) == PARTITIONED_STORAGE
+    return PartitionedDatabase(db_path) if partitioned else LocalDatabase(db_path)
@@ -0,0 +1,79 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from typing import Tuple
+
+# 图片内容寻址存储：按文件内容的 sha256 存放，同一张小票只存一份
+# 目录按摘要前两级分散 (ab/cd/abcd...)，避免单个目录下文件过多；
+# 由摘要直接得到路径，查找图片无需扫描目录
+
+STORE_SUFFIX = ".photos"
+
+# 计算摘要与复制文件时每次读取的字节数
+READ_SIZE = 1 << 20
+
+
+def store_root(db_path: str) -> str:
+    """ 数据库文件对应的图片存储目录: db/app.db -> db/app.photos """
+    return os.path.splitext(db_path)[0] + STORE_SUFFIX
+
+
+def file_sha256(path: str) -> Tuple[str, int]:
+    """ 分块读取文件，返回 (sha256 十六进制摘要, 字节数) """
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(READ_SIZE), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+class PhotoStore:
+    """
+    内容寻址的图片文件存储
+    只负责文件：引用计数由数据库的 photo_blobs 表维护，无引用的文件由数据库回收时删除
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+
+    def path(self, sha256: str) -> str:
+        """ 摘要对应的文件路径 (O(1)，不访问磁盘) """
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    def exists(self, sha256: str) -> bool:
+        return os.path.exists(self.path(sha256))
+
+    def put(self, src_path: str) -> Tuple[str, int]:
+        """
+        将图片文件存入仓库，返回 (sha256, 字节数)
+        内容相同的文件已存在时不再复制；先写临时文件再改名，中断不会留下不完整的文件
+        源文件不存在时抛出 FileNotFoundError
+        """
+        sha256, size = file_sha256(src_path)
+        target = self.path(sha256)
+        if os.path.exists(target):
+            return sha256, size
+        target_dir = os.path.dirname(target)
+        os.makedirs(target_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=target_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as dst, open(src_path, "rb") as src:
+                shutil.copyfileobj(src, dst, READ_SIZE)
+            os.replace(tmp_path, target)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        return sha256, size
+
+    def remove(self, sha256: str) -> None:
+        """ 删除摘要对应的文件 (文件不存在视为已删除) """
+        try:
+            os.remove(self.path(sha256))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,63 @@
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Any
+
+# 两次清理之间的间隔 (秒)
+PURGE_INTERVAL = 60.0
+
+# 墓碑保留时间 (秒)：在此期间删除可以撤销，之后才会被物理删除
+UNDO_GRACE = 10 * 60.0
+
+# 每个事务物理删除的记录数
+PURGE_BATCH_SIZE = 500
+
+
+class PurgeWorker:
+    """
+    墓碑记录的后台清理线程
+    每隔 interval 秒调用一次 db.purgeDeleted，物理删除超过 grace 秒的墓碑记录
+    (连同其标签关联、图片、全文检索与指纹)，每批一个短事务，不阻塞界面线程的读写。
+    """
+
+    def __init__(self, db: Any, interval: float = PURGE_INTERVAL, grace: float = UNDO_GRACE,
+                 batch_size: int = PURGE_BATCH_SIZE) -> None:
+        if interval <= 0:
+            raise ValueError(f"interval 必须是正数: {interval}")
+        if batch_size <= 0:
+            raise ValueError(f"batch_size 必须是正数: {batch_size}")
+        self.db = db
+        self.interval = interval
+        self.grace = grace
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="db-purger", daemon=True)
+        self._thread.start()
+
+    def wake(self) -> None:
+        """ 立即进行一次清理 (不等待下一个周期) """
+        self._wake.set()
+
+    def purge_once(self) -> int:
+        """ 物理删除超过保留时间的墓碑记录，返回删除的记录数 """
+        before = datetime.now() - timedelta(seconds=self.grace)
+        return self.db.purgeDeleted(before=before, batch_size=self.batch_size)
+
+    def close(self) -> None:
+        """ 停止清理线程 (正在进行的一批完成后退出) """
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.purge_once()
+            except sqlite3.Error as e:
+                # 数据库忙或已关闭时跳过本轮，下个周期重试
+                print(f"[PurgeWorker] 清理失败: {e}")
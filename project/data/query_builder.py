@@ -0,0 +1,264 @@
+from dataclasses import dataclass, replace
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+from .models import RecordType
+from .text_index import match_expression
+
+RECORD_COLUMNS = "record_id, type, amount, date, note"
+
+# 已删除 (墓碑) 的记录对所有查询不可见，等待后台清理线程物理删除
+LIVE_CLAUSE = "deleted_at IS NULL"
+
+# 每种筛选条件对应的 SQL 片段，按固定顺序拼接
+# 同一组条件无论字典顺序如何都生成完全相同的 SQL 文本，从而命中 sqlite3 的语句缓存
+FILTER_CLAUSES = (
+    ("type", "type = ?"),
+    ("date", "date >= ? AND date < ?"),
+    ("amount", "amount = ?"),
+    ("keyword", "record_id IN (SELECT rowid FROM records_fts WHERE records_fts MATCH ?)"),
+    # 标签条件为 tag_id (LocalDatabase 先经标签字典把名称换成 tag_id)，只读 record_tags 索引
+    ("tag", "record_id IN (SELECT record_id FROM record_tags WHERE tag_id = ?)"),
+)
+FILTER_KEYS = tuple(key for key, _ in FILTER_CLAUSES)
+
+
+def date_bounds(value: Any) -> Tuple[str, str]:
+    """
+    将日期条件转换为 [start, end) 区间
+    支持 date 对象、"YYYY-MM-DD"、"YYYY-MM"、"YYYY"，以及 (start, end) 日期元组
+    """
+    if isinstance(value, tuple) and len(value) == 2:
+        start, end = value
+        return (start.isoformat() if isinstance(start, date) else str(start),
+                end.isoformat() if isinstance(end, date) else str(end))
+    if isinstance(value, date):
+        return value.isoformat(), (value + timedelta(days=1)).isoformat()
+    text = str(value).strip()
+    parts = text.split("-")
+    try:
+        if len(parts) == 3:
+            day = date(int(parts[0]), int(parts[1]), int(parts[2]))
+            return day.isoformat(), (day + timedelta(days=1)).isoformat()
+        if len(parts) == 2:
+            year, month = int(parts[0]), int(parts[1])
+            start = date(year, month, 1)
+            end = date(year + month // 12, month % 12 + 1, 1)
+            return start.isoformat(), end.isoformat()
+        if len(parts) == 1:
+            year = int(parts[0])
+            return date(year, 1, 1).isoformat(), date(year + 1, 1, 1).isoformat()
+    except ValueError:
+        pass
+    raise ValueError(f"日期条件无效: {value}")
+
+
+def _filter_params(key: str, value: Any) -> List[Any]:
+    """ 将单个条件的值转换为绑定参数 """
+    if key == "date":
+        return list(date_bounds(value))
+    if key in ("amount", "tag"):
+        return [int(value)]
+    if key == "keyword":
+        return [match_expression(str(value))]
+    return [value]
+
+
+@lru_cache(maxsize=None)
+def _select_sql(keys: FrozenSet[str], columns: str, paged: bool, limited: bool) -> str:
+    """ 按条件组合生成 SQL 文本 (结果被缓存，条件组合有限) """
+    clauses = [LIVE_CLAUSE] + [clause for key, clause in FILTER_CLAUSES if key in keys]
+    if paged:
+        clauses.append("(date, record_id) < (?, ?)")
+    sql = f"SELECT {columns} FROM records WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY date DESC, record_id DESC"
+    if limited:
+        sql += " LIMIT ?"
+    return sql
+
+
+def build_select(query: Dict[str, Any], columns: str = RECORD_COLUMNS,
+                 after: Optional[Tuple[str, int]] = None,
+                 limit: Optional[int] = None) -> Tuple[str, List[Any]]:
+    """
+    将查询条件字典编译为参数化 SQL
+    支持的条件: type, date, amount (分), keyword (备注/商户/标签全文检索), tag (tag_id)
+    after 为 (date, record_id) 游标，返回排在其后的记录 (键集分页)
+    """
+    unknown = set(query) - set(FILTER_KEYS)
+    if unknown:
+        raise ValueError(f"不支持的查询条件: {', '.join(sorted(unknown))}")
+    params: List[Any] = []
+    for key in FILTER_KEYS:
+        if key in query:
+            params.extend(_filter_params(key, query[key]))
+    if after is not None:
+        params.extend([after[0], int(after[1])])
+    if limit is not None:
+        params.append(int(limit))
+    sql = _select_sql(frozenset(query), columns, after is not None, limit is not None)
+    return sql, params
+
+
+# RecordQuery 的排序方式 -> ORDER BY 子句 (同金额、同日期的记录再按日期、ID 倒序，结果顺序确定)
+QUERY_ORDERS = {
+    "date_desc": "date DESC, record_id DESC",
+    "date_asc": "date ASC, record_id ASC",
+    "amount_desc": "amount DESC, date DESC, record_id DESC",
+    "amount_asc": "amount ASC, date DESC, record_id DESC",
+}
+
+TAG_CLAUSE = FILTER_CLAUSES[FILTER_KEYS.index("tag")][1]
+KEYWORD_CLAUSE = FILTER_CLAUSES[FILTER_KEYS.index("keyword")][1]
+
+
+def _iso(value: Any) -> str:
+    """ 日期条件统一为 "YYYY-MM-DD" 文本 (与 records.date 的存储格式一致) """
+    if isinstance(value, date):
+        return value.isoformat()
+    try:
+        return date.fromisoformat(str(value).strip()).isoformat()
+    except ValueError:
+        raise ValueError(f"日期条件无效: {value}")
+
+
+@dataclass(frozen=True)
+class RecordQuery:
+    """
+    可组合的记录查询
+    每个方法返回增加了条件的新查询，原查询不变，例如：
+        RecordQuery().of_type("支出").during("2025-03").amount_between(1000, None).with_tags(["餐饮"]).take(20)
+    日期区间为 [start, end)，金额区间 (分) 为闭区间；多次调用 between/amount_between 取交集。
+    LocalDatabase.fetchQuery 把整个查询编译为一条参数化 SQL，
+    只含类型、日期、金额条件的查询也可以在内存快照上求值 (RecordManager.getRecordsByQuery)。
+    """
+    record_type: Optional[str] = None
+    start: Optional[str] = None
+    end: Optional[str] = None
+    min_amount: Optional[int] = None
+    max_amount: Optional[int] = None
+    tags: Tuple[Any, ...] = ()
+    match_all_tags: bool = True
+    keyword: Optional[str] = None
+    order: str = "date_desc"
+    limit: Optional[int] = None
+
+    def of_type(self, record_type: str) -> "RecordQuery":
+        if record_type not in (RecordType.INCOME, RecordType.EXPENSE):
+            raise ValueError(f"无效的记录类型: {record_type}")
+        return replace(self, record_type=record_type)
+
+    def between(self, start: Any = None, end: Any = None) -> "RecordQuery":
+        """ 日期区间 [start, end)，start/end 为 date 或 "YYYY-MM-DD"，为空表示不限 """
+        new_start = _iso(start) if start is not None else None
+        new_end = _iso(end) if end is not None else None
+        if self.start is not None and (new_start is None or self.start > new_start):
+            new_start = self.start
+        if self.end is not None and (new_end is None or self.end < new_end):
+            new_end = self.end
+        return replace(self, start=new_start, end=new_end)
+
+    def during(self, period: Any) -> "RecordQuery":
+        """ 某天、某月 ("YYYY-MM") 或某年 ("YYYY")，格式同 date_bounds """
+        return self.between(*date_bounds(period))
+
+    def amount_between(self, low: Optional[int] = None, high: Optional[int] = None) -> "RecordQuery":
+        """ 金额区间 [low, high] (分)，为空表示不限 """
+        if low is not None and self.min_amount is not None:
+            low = max(int(low), self.min_amount)
+        if high is not None and self.max_amount is not None:
+            high = min(int(high), self.max_amount)
+        return replace(
+            self,
+            min_amount=int(low) if low is not None else self.min_amount,
+            max_amount=int(high) if high is not None else self.max_amount,
+        )
+
+    def with_tags(self, tags: Iterable[Any], match_all: bool = True) -> "RecordQuery":
+        """ 标签条件 (名称或 tag_id)：match_all 为 True 时要求带有全部标签，否则带有任一标签即可 """
+        merged = list(self.tags)
+        for tag in tags:
+            if tag not in merged:
+                merged.append(tag)
+        return replace(self, tags=tuple(merged), match_all_tags=match_all)
+
+    def matching(self, keyword: str) -> "RecordQuery":
+        """ 备注、商户、标签的全文检索关键词 """
+        keyword = str(keyword).strip()
+        if not keyword:
+            raise ValueError("关键词不能为空")
+        return replace(self, keyword=keyword)
+
+    def order_by(self, order: str) -> "RecordQuery":
+        if order not in QUERY_ORDERS:
+            raise ValueError(f"不支持的排序方式: {order}，可选: {', '.join(QUERY_ORDERS)}")
+        return replace(self, order=order)
+
+    def take(self, limit: int) -> "RecordQuery":
+        if int(limit) <= 0:
+            raise ValueError(f"limit 必须是正数: {limit}")
+        return replace(self, limit=int(limit))
+
+    @property
+    def snapshot_compatible(self) -> bool:
+        """ 只有类型、日期、金额条件 (内存快照中有这些列) """
+        return not self.tags and self.keyword is None
+
+
+@lru_cache(maxsize=None)
+def _query_sql(columns: str, shape: Tuple[Any, ...]) -> str:
+    """ 按查询的形状 (哪些条件存在、标签个数、排序、是否限制条数) 生成 SQL 文本 (结果被缓存) """
+    has_type, has_start, has_end, has_min, has_max, tag_count, match_all, has_keyword, order, limited = shape
+    clauses = [LIVE_CLAUSE]
+    if has_type:
+        clauses.append("type = ?")
+    if has_start:
+        clauses.append("date >= ?")
+    if has_end:
+        clauses.append("date < ?")
+    if has_min:
+        clauses.append("amount >= ?")
+    if has_max:
+        clauses.append("amount <= ?")
+    if has_keyword:
+        clauses.append(KEYWORD_CLAUSE)
+    if tag_count and match_all:
+        # 每个标签一个子查询，各自走 idx_record_tags_tag
+        clauses.extend([TAG_CLAUSE] * tag_count)
+    elif tag_count:
+        placeholders = ",".join("?" * tag_count)
+        clauses.append(f"record_id IN (SELECT record_id FROM record_tags WHERE tag_id IN ({placeholders}))")
+    sql = f"SELECT {columns} FROM records WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY " + QUERY_ORDERS[order]
+    if limited:
+        sql += " LIMIT ?"
+    return sql
+
+
+def compile_query(query: RecordQuery, columns: str = RECORD_COLUMNS) -> Tuple[str, List[Any]]:
+    """ 将 RecordQuery 编译为一条参数化 SQL (标签必须已换成 tag_id) """
+    shape = (
+        query.record_type is not None, query.start is not None, query.end is not None,
+        query.min_amount is not None, query.max_amount is not None,
+        len(query.tags), query.match_all_tags, query.keyword is not None,
+        query.order, query.limit is not None,
+    )
+    params: List[Any] = []
+    for value in (query.record_type, query.start, query.end, query.min_amount, query.max_amount):
+        if value is not None:
+            params.append(value)
+    if query.keyword is not None:
+        params.append(match_expression(query.keyword))
+    params.extend(int(tag) for tag in query.tags)
+    if query.limit is not None:
+        params.append(query.limit)
+    return _query_sql(columns, shape), params
+
+
+def sort_rows(rows: List[Dict[str, Any]], order: str) -> List[Dict[str, Any]]:
+    """ 按 RecordQuery 的排序方式排列行字典 (用于合并多个分区的结果) """
+    rows = sorted(rows, key=lambda r: (r["date"], int(r["id"])), reverse=order != "date_asc")
+    if order in ("amount_desc", "amount_asc"):
+        # 稳定排序：同金额的行保持日期、ID 倒序
+        rows.sort(key=lambda r: r["amount"], reverse=order == "amount_desc")
+    return rows
@@ -0,0 +1,213 @@
+import os
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+from itertools import compress
+from typing import Any, Dict, List, Optional, Tuple
+
+from .models import RecordType
+
+# 类型位掩码：筛选时用按位与判断，mask=ALL_TYPES 表示不限类型
+TYPE_BITS = {RecordType.INCOME: 1, RecordType.EXPENSE: 2}
+ALL_TYPES = 3
+
+
+def _ordinal(value: Any) -> int:
+    if isinstance(value, date):
+        return value.toordinal()
+    return date.fromisoformat(str(value)).toordinal()
+
+
+class LedgerSnapshot:
+    """
+    records 表的内存列式快照
+    各列保存在按 (日期, record_id) 排序的 array 中：
+    日期为 date.toordinal()，金额为整数分，类型为位掩码，分类为整数编码。
+    日期区间用二分查找定位切片，筛选与汇总只遍历切片内的连续内存。
+    首次使用时加载，之后由 RecordManager 的写操作增量更新。
+    """
+
+    def __init__(self, db: Any) -> None:
+        self.db = db
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._reset()
+
+    def _reset(self) -> None:
+        self.ids = array("q")
+        self.days = array("l")
+        self.cents = array("q")
+        self.types = array("B")
+        self.categories = array("H")
+        self.category_names: List[str] = []
+        self._category_codes: Dict[str, int] = {}
+        self._day_of: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        self.ensure_loaded()
+        return len(self.ids)
+
+    def _category_code(self, category: str) -> int:
+        code = self._category_codes.get(category)
+        if code is None:
+            code = self._category_codes[category] = len(self.category_names)
+            self.category_names.append(category)
+        return code
+
+    def ensure_loaded(self) -> None:
+        """ 首次使用时从数据库流式加载 """
+        with self._lock:
+            if self._loaded:
+                return
+            self._reset()
+            for record_id, record_date, amount, record_type, category in self.db.iterSnapshotRows():
+                day = _ordinal(record_date)
+                self.ids.append(int(record_id))
+                self.days.append(day)
+                self.cents.append(int(amount))
+                self.types.append(TYPE_BITS.get(record_type, 0))
+                self.categories.append(self._category_code(category))
+                self._day_of[int(record_id)] = day
+            self._loaded = True
+
+    def invalidate(self) -> None:
+        """ 丢弃快照，下次使用时重新加载 (用于绕过 RecordManager 的批量修改) """
+        with self._lock:
+            self._loaded = False
+            self._reset()
+
+    def _position(self, day: int, record_id: int) -> int:
+        """ (day, record_id) 在排序数组中的插入位置 """
+        lo = bisect_left(self.days, day)
+        hi = bisect_right(self.days, day, lo)
+        return bisect_left(self.ids, record_id, lo, hi)
+
+    def add(self, record_id: Any, record_date: Any, amount: int, record_type: str,
+            category: str = "其他") -> None:
+        """ 新增记录 (金额为分) 后增量更新 (快照尚未加载时忽略，加载时会读到该记录) """
+        with self._lock:
+            if not self._loaded:
+                return
+            record_id = int(record_id)
+            if record_id in self._day_of:
+                self.remove(record_id)
+            day = _ordinal(record_date)
+            pos = self._position(day, record_id)
+            self.ids.insert(pos, record_id)
+            self.days.insert(pos, day)
+            self.cents.insert(pos, int(amount))
+            self.types.insert(pos, TYPE_BITS.get(record_type, 0))
+            self.categories.insert(pos, self._category_code(category or "其他"))
+            self._day_of[record_id] = day
+
+    def remove(self, record_id: Any) -> None:
+        """ 删除记录后增量更新 """
+        with self._lock:
+            if not self._loaded:
+                return
+            record_id = int(record_id)
+            day = self._day_of.pop(record_id, None)
+            if day is None:
+                return
+            pos = self._position(day, record_id)
+            for column in (self.ids, self.days, self.cents, self.types, self.categories):
+                column.pop(pos)
+
+    def _range(self, start: Optional[date], end: Optional[date]) -> Tuple[int, int]:
+        """ [start, end) 日期区间对应的数组切片位置 """
+        lo = bisect_left(self.days, start.toordinal()) if start is not None else 0
+        hi = bisect_left(self.days, end.toordinal()) if end is not None else len(self.days)
+        return lo, max(lo, hi)
+
+    def _mask(self, lo: int, hi: int, record_type: Optional[str]) -> Any:
+        mask = TYPE_BITS[record_type] if record_type is not None else ALL_TYPES
+        return [t & mask for t in self.types[lo:hi]]
+
+    def select_ids(self, record_type: Optional[str] = None, start: Optional[date] = None,
+                   end: Optional[date] = None) -> List[int]:
+        """ 返回满足条件的 record_id，按 (日期, ID) 倒序，与列表页排序一致 """
+        self.ensure_loaded()
+        with self._lock:
+            lo, hi = self._range(start, end)
+            ids = list(compress(self.ids[lo:hi], self._mask(lo, hi, record_type)))
+        ids.reverse()
+        return ids
+
+    def select_rows(self, record_type: Optional[str] = None, start: Optional[date] = None,
+                    end: Optional[date] = None, min_cents: Optional[int] = None,
+                    max_cents: Optional[int] = None) -> List[Tuple[int, int]]:
+        """ 返回满足条件 (含金额闭区间) 的 (record_id, 金额分)，按 (日期, ID) 倒序 """
+        self.ensure_loaded()
+        low = min_cents if min_cents is not None else -(1 << 63)
+        high = max_cents if max_cents is not None else (1 << 63) - 1
+        with self._lock:
+            lo, hi = self._range(start, end)
+            rows = [
+                (record_id, cents)
+                for record_id, cents, selected in zip(
+                    self.ids[lo:hi], self.cents[lo:hi], self._mask(lo, hi, record_type)
+                )
+                if selected and low <= cents <= high
+            ]
+        rows.reverse()
+        return rows
+
+    def total_cents(self, record_type: Optional[str] = None, start: Optional[date] = None,
+                    end: Optional[date] = None) -> int:
+        """ 满足条件的金额合计 (分) """
+        self.ensure_loaded()
+        with self._lock:
+            lo, hi = self._range(start, end)
+            return sum(compress(self.cents[lo:hi], self._mask(lo, hi, record_type)))
+
+    def totals_by_category(self, start: Optional[date] = None,
+                           end: Optional[date] = None) -> Dict[Tuple[str, str], int]:
+        """ 按 (类型, 分类) 汇总金额 (分) """
+        self.ensure_loaded()
+        type_names = {bit: name for name, bit in TYPE_BITS.items()}
+        with self._lock:
+            lo, hi = self._range(start, end)
+            sums: Dict[Tuple[int, int], int] = {}
+            for t, c, cents in zip(self.types[lo:hi], self.categories[lo:hi], self.cents[lo:hi]):
+                sums[(t, c)] = sums.get((t, c), 0) + cents
+            return {
+                (type_names[t], self.category_names[c]): total
+                for (t, c), total in sums.items() if t in type_names
+            }
+
+
+_SNAPSHOTS: Dict[str, LedgerSnapshot] = {}
+_SNAPSHOTS_LOCK = threading.Lock()
+
+
+def _key(db: Any) -> Optional[str]:
+    db_path = getattr(db, "db_path", None)
+    return os.path.abspath(db_path) if isinstance(db_path, str) else None
+
+
+def enable_snapshot(db: Any) -> LedgerSnapshot:
+    """ 为数据库开启内存快照 (同一数据库文件共享一个快照，首次使用时才加载) """
+    key = _key(db)
+    if key is None:
+        raise ValueError("数据库没有有效的 db_path，无法创建快照")
+    with _SNAPSHOTS_LOCK:
+        snapshot = _SNAPSHOTS.get(key)
+        if snapshot is None:
+            snapshot = _SNAPSHOTS[key] = LedgerSnapshot(db)
+    return snapshot
+
+
+def get_snapshot(db: Any) -> Optional[LedgerSnapshot]:
+    """ 返回已开启的快照，未开启时返回 None """
+    key = _key(db)
+    return _SNAPSHOTS.get(key) if key is not None else None
+
+
+def disable_snapshot(db: Any) -> None:
+    """ 关闭并丢弃数据库的内存快照 """
+    key = _key(db)
+    if key is None:
+        return
+    with _SNAPSHOTS_LOCK:
+        _SNAPSHOTS.pop(key, None)
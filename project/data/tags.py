@@ -0,0 +1,117 @@
+import os
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from .models import Tag
+
+# 标签字典：tags 表 (tag_id, name) 的进程内缓存
+# 每个不同的标签只有一个共享的 Tag 对象 (享元)，筛选时按整数 tag_id 比较，不再比较字符串
+
+# 标签输入的分隔符 (半角、全角逗号)
+TAG_SEPARATORS = re.compile(r"[,，]")
+
+# 不存在的标签使用的 tag_id，按它筛选不会匹配任何记录
+UNKNOWN_TAG_ID = -1
+
+
+def split_tag_names(value: Union[str, Iterable[Any], None]) -> List[str]:
+    """
+    将 "餐饮, 工作" 形式的字符串或名称列表整理为标签名列表
+    去掉首尾空白与空名称，重复的名称只保留第一次出现
+    """
+    if value is None:
+        return []
+    names = TAG_SEPARATORS.split(value) if isinstance(value, str) else value
+    result: List[str] = []
+    seen = set()
+    for name in names:
+        name = str(name).strip()
+        if name and name not in seen:
+            seen.add(name)
+            result.append(name)
+    return result
+
+
+class TagDictionary:
+    """
+    一个数据库文件的标签字典
+    按名称或 tag_id 查找标签，结果缓存在进程内；同名标签总是返回同一个 Tag 对象。
+    只缓存已提交的标签，不负责写入 (写入仍由 LocalDatabase 在记录的事务中完成)；
+    删除标签的操作 (数据清理、还原备份) 之后调用 clear() 丢弃缓存。
+    """
+
+    def __init__(self, db: Any) -> None:
+        self.db = db
+        self._lock = threading.Lock()
+        self._by_name: Dict[str, Tag] = {}
+        self._by_id: Dict[int, Tag] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def intern(self, tag_id: int, name: str) -> Tag:
+        """ 返回 (tag_id, name) 对应的共享 Tag 对象 (用于已从数据库读出的标签) """
+        with self._lock:
+            tag = self._by_id.get(tag_id)
+            if tag is None:
+                tag = self._by_id[tag_id] = self._by_name[name] = Tag(tag_id=tag_id, name=name)
+            return tag
+
+    def lookup(self, name: str) -> Optional[Tag]:
+        """ 按名称查找标签，不存在时返回 None """
+        name = str(name).strip()
+        tag = self._by_name.get(name)
+        if tag is not None:
+            return tag
+        row = self.db._get_connection().execute(
+            "SELECT tag_id FROM tags WHERE name = ?", (name,)
+        ).fetchone()
+        return self.intern(row[0], name) if row else None
+
+    def get(self, tag_id: int) -> Optional[Tag]:
+        """ 按 tag_id 查找标签，不存在时返回 None """
+        tag = self._by_id.get(tag_id)
+        if tag is not None:
+            return tag
+        row = self.db._get_connection().execute(
+            "SELECT name FROM tags WHERE tag_id = ?", (tag_id,)
+        ).fetchone()
+        return self.intern(tag_id, row[0]) if row else None
+
+    def tag_id(self, name: str) -> int:
+        """ 标签名对应的 tag_id，不存在时返回 UNKNOWN_TAG_ID """
+        tag = self.lookup(name)
+        return tag.tag_id if tag is not None else UNKNOWN_TAG_ID
+
+    def load_all(self) -> List[Tag]:
+        """ 一次读入全部标签 (按名称排序)，用于标签选择列表 """
+        rows = self.db._get_connection().execute("SELECT tag_id, name FROM tags ORDER BY name").fetchall()
+        return [self.intern(tag_id, name) for tag_id, name in rows]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._by_name.clear()
+            self._by_id.clear()
+
+
+_DICTIONARIES: Dict[str, TagDictionary] = {}
+_DICTIONARIES_LOCK = threading.Lock()
+
+
+def tag_dictionary_for(db: Any) -> TagDictionary:
+    """ 返回数据库文件的标签字典 (同一文件共享一个) """
+    key = os.path.abspath(db.db_path)
+    with _DICTIONARIES_LOCK:
+        dictionary = _DICTIONARIES.get(key)
+        if dictionary is None:
+            dictionary = _DICTIONARIES[key] = TagDictionary(db)
+    return dictionary
+
+
+def clear_tag_dictionaries(db_path: Any = None) -> None:
+    """ 丢弃标签字典缓存 (db_path 为空时丢弃全部) """
+    path = os.path.abspath(db_path) if db_path is not None else None
+    with _DICTIONARIES_LOCK:
+        for key in [k for k in _DICTIONARIES if path is None or k == path]:
+            _DICTIONARIES.pop(key)
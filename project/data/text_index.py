@@ -0,0 +1,91 @@
+import re
+from typing import List, Optional
+
+# 全文检索 (Req014) 的中文分词：
+# SQLite 自带的 unicode61 分词器会把连续的汉字当成一个词，无法检索词中的片段，
+# 因此写入 FTS5 表前先把汉字切成二元组 (bigram)，单字另存一列用于单字检索
+
+CJK_CHARS = "\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+CJK_RUN = re.compile(f"[{CJK_CHARS}]+")
+TOKEN = re.compile(f"[{CJK_CHARS}]+|[^\\W{CJK_CHARS}]+")
+
+HIGHLIGHT_START = "【"
+HIGHLIGHT_END = "】"
+
+
+def _bigrams(run: str) -> List[str]:
+    if len(run) == 1:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)]
+
+
+def ngram_text(text: Optional[str]) -> str:
+    """ 将文本转换为 grams 列内容：汉字二元组 + 其他文字的原词 """
+    tokens: List[str] = []
+    for token in TOKEN.findall(text or ""):
+        if CJK_RUN.fullmatch(token):
+            tokens.extend(_bigrams(token))
+        else:
+            tokens.append(token.lower())
+    return " ".join(tokens)
+
+
+def char_text(text: Optional[str]) -> str:
+    """ 将文本转换为 chars 列内容：所有汉字单字 """
+    return " ".join("".join(CJK_RUN.findall(text or "")))
+
+
+def _quote(token: str) -> str:
+    return '"' + token.replace('"', '""') + '"'
+
+
+def match_expression(term: str) -> str:
+    """
+    将用户输入的关键词转换为 FTS5 MATCH 表达式
+    汉字串按二元组短语匹配，单个汉字匹配 chars 列，其他词按前缀匹配
+    """
+    parts: List[str] = []
+    for token in TOKEN.findall(term or ""):
+        if CJK_RUN.fullmatch(token):
+            if len(token) == 1:
+                parts.append(f"chars : {_quote(token)}")
+            else:
+                parts.append(f"grams : {_quote(' '.join(_bigrams(token)))}")
+        else:
+            parts.append(f"grams : {_quote(token.lower())}*")
+    if not parts:
+        raise ValueError(f"关键词无效: {term!r}")
+    return " AND ".join(parts)
+
+
+def highlight(text: Optional[str], term: str, width: int = 20) -> str:
+    """
+    生成高亮摘要：用【】标出关键词各片段的第一次出现，并截取其前后 width 个字符
+    """
+    text = text or ""
+    lowered = text.lower()
+    spans = []
+    for token in TOKEN.findall(term or ""):
+        pos = lowered.find(token.lower())
+        if pos >= 0:
+            spans.append((pos, pos + len(token)))
+    if not spans:
+        return text[:width * 2]
+    spans.sort()
+    merged = [spans[0]]
+    for start, end in spans[1:]:
+        if start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((start, end))
+    begin = max(0, merged[0][0] - width)
+    finish = min(len(text), merged[-1][1] + width)
+    pieces = ["..." if begin > 0 else ""]
+    cursor = begin
+    for start, end in merged:
+        pieces.append(text[cursor:start])
+        pieces.append(HIGHLIGHT_START + text[start:end] + HIGHLIGHT_END)
+        cursor = end
+    pieces.append(text[cursor:finish])
+    pieces.append("..." if finish < len(text) else "")
+    return "".join(pieces)
@@ -0,0 +1,105 @@
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+# 写操作：接收写线程的连接，在调用方开启的事务中执行，返回值作为 Future 的结果
+WriteOp = Callable[[sqlite3.Connection], Any]
+
+_BARRIER = object()
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """
+    延迟写入队列
+    所有写操作进入队列，由唯一的写线程取出后合并为一个事务提交：
+    达到 max_batch 条或距离第一条写入超过 flush_interval 秒时提交一次。
+    调用方立即拿到 Future；flush() 等待此前提交的写入全部落盘。
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection],
+                 flush_interval: float = 0.05, max_batch: int = 200) -> None:
+        if max_batch <= 0:
+            raise ValueError(f"max_batch 必须是正数: {max_batch}")
+        self._connect = connect
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Tuple[Any, Future]]" = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, op: WriteOp) -> Future:
+        """ 提交一个写操作，返回其结果的 Future """
+        if self._closed:
+            raise RuntimeError("写入队列已关闭")
+        future: Future = Future()
+        self._queue.put((op, future))
+        return future
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """ 持久化屏障：阻塞直到此前提交的写入全部提交 """
+        barrier: Future = Future()
+        self._queue.put((_BARRIER, barrier))
+        barrier.result(timeout)
+
+    def close(self) -> None:
+        """ 提交剩余写入并停止写线程 """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put((_STOP, Future()))
+        self._thread.join()
+
+    def _run(self) -> None:
+        conn = self._connect()
+        while True:
+            batch: List[Tuple[WriteOp, Future]] = []
+            barriers: List[Future] = []
+            stop = False
+            item, future = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stop = True
+                elif item is _BARRIER:
+                    barriers.append(future)
+                else:
+                    batch.append((item, future))
+                if stop or barriers or len(batch) >= self.max_batch:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item, future = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            self._commit(conn, batch)
+            for barrier in barriers:
+                barrier.set_result(None)
+            if stop:
+                return
+
+    def _commit(self, conn: sqlite3.Connection, batch: List[Tuple[WriteOp, Future]]) -> None:
+        """ 在一个事务中执行整批写入；失败时逐条重试，只让出错的写入失败 """
+        if not batch:
+            return
+        try:
+            with conn:
+                results = [op(conn) for op, _ in batch]
+        except Exception:
+            for op, future in batch:
+                try:
+                    with conn:
+                        result = op(conn)
+                except Exception as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
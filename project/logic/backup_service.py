@@ -0,0 +1,209 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from data.database import LocalDatabase, close_all_connections
+from data.snapshot import get_snapshot
+from .query_cache import clear_query_caches
+from .record_events import RECORDS_CREATED, RECORDS_DELETED, event_bus_for
+
+BACKUP_DIR = "db/backups"
+
+# 每一步复制的页数与步间等待秒数：每步只短暂持有源库的读锁，写入可以在步间继续
+BACKUP_PAGES = 256
+BACKUP_SLEEP = 0.01
+
+# 默认保留的备份数量
+BACKUP_KEEP = 7
+
+# 备份进度回调: (剩余页数, 总页数)
+BackupProgress = Callable[[int, int], None]
+
+
+class BackupService:
+    """
+    数据库在线备份
+    使用 sqlite3 的 Connection.backup 分步复制：每步 pages 页，步间 sleep 秒，
+    备份期间应用可以照常读写 (WAL 模式下读写都不会被长时间阻塞)。
+    支持定时备份、按数量轮换旧备份，以及校验后还原。
+    """
+
+    def __init__(self, backup_dir: str = BACKUP_DIR, keep: int = BACKUP_KEEP,
+                 pages: int = BACKUP_PAGES, sleep: float = BACKUP_SLEEP) -> None:
+        if keep <= 0:
+            raise ValueError(f"keep 必须是正数: {keep}")
+        if pages <= 0:
+            raise ValueError(f"pages 必须是正数: {pages}")
+        self.db = LocalDatabase()
+        self.backup_dir = backup_dir
+        self.keep = keep
+        self.pages = pages
+        self.sleep = sleep
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _prefix(self) -> str:
+        return os.path.splitext(os.path.basename(self.db.db_path))[0] + "-"
+
+    def backup(self, progress: Optional[BackupProgress] = None) -> str:
+        """
+        备份当前数据库，返回备份文件路径
+        先写入临时文件，完成后再改名，中断的备份不会出现在备份列表中
+        """
+        os.makedirs(self.backup_dir, exist_ok=True)
+        # 延迟写入队列中尚未提交的写入先落盘
+        self.db.flush()
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        path = os.path.join(self.backup_dir, f"{self._prefix()}{stamp}.db")
+        tmp_path = path + ".tmp"
+        print(f"[BackupService] 正在备份 {self.db.db_path} -> {path}")
+        target = sqlite3.connect(tmp_path)
+        try:
+            self.db._get_connection().backup(
+                target, pages=self.pages, sleep=self.sleep,
+                progress=(lambda status, remaining, total: progress(remaining, total)) if progress else None,
+            )
+        finally:
+            target.close()
+        os.replace(tmp_path, path)
+        return path
+
+    def list_backups(self) -> List[str]:
+        """ 已有的备份文件，从新到旧 """
+        try:
+            names = os.listdir(self.backup_dir)
+        except FileNotFoundError:
+            return []
+        prefix = self._prefix()
+        backups = [n for n in names if n.startswith(prefix) and n.endswith(".db")]
+        return [os.path.join(self.backup_dir, n) for n in sorted(backups, reverse=True)]
+
+    def rotate(self) -> List[str]:
+        """ 只保留最新的 keep 个备份，返回被删除的文件 """
+        removed = self.list_backups()[self.keep:]
+        for path in removed:
+            os.remove(path)
+        if removed:
+            print(f"[BackupService] 已删除 {len(removed)} 个旧备份")
+        return removed
+
+    def run_once(self) -> str:
+        """ 备份一次并轮换旧备份 """
+        path = self.backup()
+        self.rotate()
+        return path
+
+    def start(self, interval: float) -> None:
+        """
+        在后台线程中每隔 interval 秒备份一次
+        间隔从最新的备份算起：最新备份已超过 interval 秒 (或还没有备份) 时立即备份，
+        因此每次运行时间都不到 interval 的会话也能得到备份
+        """
+        if interval <= 0:
+            raise ValueError(f"interval 必须是正数: {interval}")
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="db-backup", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """ 停止定时备份 (正在进行的备份会完成) """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, interval: float) -> None:
+        wait = self._first_wait(interval)
+        while not self._stop.wait(wait):
+            try:
+                self.run_once()
+            except (sqlite3.Error, OSError) as e:
+                print(f"[BackupService] 定时备份失败: {e}")
+            wait = interval
+
+    def _first_wait(self, interval: float) -> float:
+        """ 距离下一次备份的秒数：最新备份的时间加 interval """
+        backups = self.list_backups()
+        if not backups:
+            return 0
+        try:
+            age = time.time() - os.path.getmtime(backups[0])
+        except OSError:
+            return 0
+        return max(0.0, interval - age)
+
+    def verify(self, path: str) -> List[str]:
+        """
+        校验数据库文件，返回发现的问题，为空表示通过
+        检查 integrity_check、外键一致性，以及 records 表是否存在
+        """
+        if not os.path.exists(path):
+            return [f"文件不存在: {path}"]
+        problems: List[str] = []
+        conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+        try:
+            results = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+            if results != ["ok"]:
+                problems.extend(results)
+            for table, rowid, parent, _ in conn.execute("PRAGMA foreign_key_check"):
+                problems.append(f"{table} 第 {rowid} 行引用的 {parent} 不存在")
+            if conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'records'"
+            ).fetchone() is None:
+                problems.append("缺少 records 表")
+        except sqlite3.DatabaseError as e:
+            problems.append(str(e))
+        finally:
+            conn.close()
+        return problems
+
+    def restore(self, path: str) -> None:
+        """
+        从备份还原：先校验备份，再用 backup API 覆盖当前数据库，最后校验还原结果
+        还原后按需升级结构版本，并丢弃内存快照；还原前在运行的墓碑清理线程与延迟写入队列按原参数重新启动；
+        校验失败时抛出 ValueError
+        有订阅者时比较还原前后的记录，对消失或改变的行发布删除事件、对新出现或改变的行发布新建事件
+        """
+        problems = self.verify(path)
+        if problems:
+            raise ValueError(f"备份校验失败 {path}: {'; '.join(problems)}")
+        print(f"[BackupService] 正在从 {path} 还原...")
+        bus = event_bus_for(self.db)
+        notify = bus is not None and (bus.has_listeners(RECORDS_DELETED) or bus.has_listeners(RECORDS_CREATED))
+        before = self._live_rows() if notify else {}
+        # 关闭连接会停止清理线程与延迟写入队列，还原后按原参数重新启动
+        purger = self.db.purgeWorker()
+        writer = self.db._writer()
+        close_all_connections(self.db.db_path)
+        try:
+            source = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+            try:
+                source.backup(self.db._get_connection(), pages=self.pages, sleep=self.sleep)
+            finally:
+                source.close()
+            problems = self.verify(self.db.db_path)
+            if problems:
+                raise ValueError(f"还原后的数据库校验失败: {'; '.join(problems)}")
+            self.db.initialize_database()
+        finally:
+            if writer is not None:
+                self.db.enableWriteBehind(writer.flush_interval, writer.max_batch)
+            if purger is not None:
+                self.db.startPurgeWorker(purger.interval, purger.grace, purger.batch_size)
+        snapshot = get_snapshot(self.db)
+        if snapshot is not None:
+            snapshot.invalidate()
+        clear_query_caches(self.db)
+        if bus is not None and notify:
+            after = self._live_rows()
+            bus.publish(RECORDS_DELETED, [row for record_id, row in before.items() if after.get(record_id) != row])
+            bus.publish(RECORDS_CREATED, [row for record_id, row in after.items() if before.get(record_id) != row])
+        print("[BackupService] 还原完成")
+
+    def _live_rows(self) -> Dict[str, Dict[str, Any]]:
+        """ 当前数据库中的全部记录 {record_id: 行字典} """
+        return {row["id"]: row for row in self.db.iterData({})}
@@ -0,0 +1,247 @@
+import csv
+import io
+import os
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from data.models import RecordType
+from data.photo_store import file_sha256
+from .ocr_service import OCRService
+from .record_manager import RecordManager
+
+# 每批写入的行数：内存中最多保留一批待写入的行
+IMPORT_BATCH_SIZE = 1000
+
+# 在文件开头多少行内查找表头 (支付宝、微信账单的表头前有说明文字)
+HEADER_SEARCH_LINES = 50
+
+# 导入进度回调: (已处理行数, 已读取字节数, 文件总字节数)
+ImportProgress = Callable[[int, int, int], None]
+
+
+@dataclass(frozen=True)
+class StatementFormat:
+    """
+    账单文件格式：各字段可能的列名 (按顺序取第一个存在的列)
+    required 为识别该格式必须出现的列；没有收/支列的格式按金额正负区分收入与支出
+    """
+    name: str
+    required: Tuple[str, ...]
+    date: Tuple[str, ...]
+    amount: Tuple[str, ...]
+    direction: Tuple[str, ...] = ()
+    merchant: Tuple[str, ...] = ()
+    note: Tuple[str, ...] = ()
+
+
+# 按顺序匹配，列名更具体的格式在前
+STATEMENT_FORMATS = (
+    StatementFormat(
+        name="微信支付",
+        required=("交易时间", "交易类型", "交易对方", "收/支"),
+        date=("交易时间",), amount=("金额(元)", "金额（元）"),
+        direction=("收/支",), merchant=("交易对方",), note=("商品",),
+    ),
+    StatementFormat(
+        name="支付宝",
+        required=("交易对方", "收/支"),
+        date=("交易创建时间", "交易时间", "付款时间"), amount=("金额（元）", "金额(元)", "金额"),
+        direction=("收/支",), merchant=("交易对方",), note=("商品名称", "商品说明"),
+    ),
+    StatementFormat(
+        name="银行",
+        required=(),
+        date=("交易日期", "记账日期", "交易时间"), amount=("交易金额", "发生额", "金额"),
+        merchant=("对方户名", "对方名称", "对方账户名"), note=("摘要", "交易摘要", "用途", "附言"),
+    ),
+)
+
+# 收/支列中表示收入、支出的取值；其他取值 (如 "不计收支"、"/") 的行跳过
+DIRECTIONS = {"收入": RecordType.INCOME, "支出": RecordType.EXPENSE}
+
+
+@lru_cache(maxsize=4096)
+def parse_statement_date(text: str) -> date:
+    """
+    解析账单中的日期 (可带时间)：2025-03-01、2025/3/1、20250301、2025-03-01 12:30:00 等
+    同一天的交易很多，结果按原文缓存
+    """
+    value = text.strip().split(" ")[0].split("T")[0]
+    for fmt in ("%Y-%m-%d", "%Y/%m/%d", "%Y%m%d", "%Y.%m.%d"):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"日期格式无效: {text}")
+
+
+def _detect_encoding(path: str) -> str:
+    """ 微信、多数银行导出为 UTF-8 (可能带 BOM)，支付宝导出为 GBK """
+    with open(path, "rb") as f:
+        sample = f.read(64 * 1024)
+    # 截到最后一个换行，避免截断的多字节字符影响判断
+    if b"\n" in sample:
+        sample = sample[:sample.rfind(b"\n")]
+    try:
+        sample.decode("utf-8")
+        return "utf-8-sig"
+    except UnicodeDecodeError:
+        return "gb18030"
+
+
+def _column(header: List[str], names: Tuple[str, ...]) -> Optional[int]:
+    for name in names:
+        if name in header:
+            return header.index(name)
+    return None
+
+
+@dataclass
+class ImportReport:
+    """ 导入结果：导入、跳过、已导入过 (重复) 的行数与逐行错误 [(文件行号, 错误信息)] """
+    format_name: str = ""
+    imported: int = 0
+    skipped: int = 0
+    duplicates: int = 0
+    errors: List[Tuple[int, str]] = field(default_factory=list)
+
+    def write_errors(self, path: str) -> None:
+        """ 把错误报告写成 CSV (行号, 错误)，方便对照原文件修改后重新导入 """
+        with open(path, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["行号", "错误"])
+            writer.writerows(self.errors)
+
+
+class ImportService:
+    """
+    银行/支付宝/微信账单 CSV 的流式导入
+    逐行读取文件，映射为 RecordManager 的记录数据 (金额为元，由校验转换为分)，
+    经 OCRService.autoCategorize 自动分类，每 batch_size 行调用一次 createRecords 批量写入。
+    内存占用只与 batch_size 有关，与文件大小无关。
+    每行以 "文件 sha256:行号" 为来源按指纹去重，重复导入同一文件不会产生重复记录。
+    """
+
+    def __init__(self, batch_size: int = IMPORT_BATCH_SIZE) -> None:
+        if batch_size <= 0:
+            raise ValueError(f"batch_size 必须是正数: {batch_size}")
+        self.manager = RecordManager()
+        self.ocr = OCRService()
+        self.batch_size = batch_size
+        # 同一商户反复出现，分类结果按文本缓存
+        self._categorize = lru_cache(maxsize=4096)(self.ocr.autoCategorize)
+
+    def import_file(self, path: str, encoding: Optional[str] = None,
+                    progress: Optional[ImportProgress] = None) -> ImportReport:
+        """
+        导入一个账单文件，返回导入报告
+        无法识别表头时抛出 ValueError；单行数据的错误记录在报告中，不中断导入
+        """
+        total_bytes = os.path.getsize(path)
+        digest, _ = file_sha256(path)
+        report = ImportReport()
+        with open(path, "rb") as raw, \
+                io.TextIOWrapper(raw, encoding=encoding or _detect_encoding(path), newline="") as f:
+            rows = self._numbered_rows(csv.reader(f))
+            statement, columns = self._find_header(rows)
+            report.format_name = statement.name
+            print(f"[ImportService] 正在导入 {path} ({statement.name} 账单)")
+
+            batch: List[Dict[str, Any]] = []
+            lines: List[int] = []
+            processed = 0
+            for line_no, row in rows:
+                processed += 1
+                if sum(1 for cell in row if cell) <= 1:
+                    # 账单末尾的分隔线、"共 N 笔记录" 等说明行
+                    report.skipped += 1
+                    continue
+                try:
+                    data = self._map_row(columns, row)
+                except ValueError as e:
+                    report.errors.append((line_no, str(e)))
+                    continue
+                if data is None:
+                    report.skipped += 1
+                    continue
+                batch.append(data)
+                lines.append(line_no)
+                if len(batch) >= self.batch_size:
+                    self._flush(batch, lines, digest, report)
+                    batch, lines = [], []
+                    if progress is not None:
+                        progress(processed, raw.tell(), total_bytes)
+            if batch:
+                self._flush(batch, lines, digest, report)
+            if progress is not None:
+                progress(processed, total_bytes, total_bytes)
+        report.errors.sort()
+        print(f"[ImportService] 已导入 {report.imported} 条，跳过 {report.skipped} 行，"
+              f"重复 {report.duplicates} 行，错误 {len(report.errors)} 行")
+        return report
+
+    def _numbered_rows(self, reader: Any) -> Iterator[Tuple[int, List[str]]]:
+        """ 产出 (文件行号, 去掉首尾空白的单元格)，跳过空行 """
+        for row in reader:
+            cells = [cell.strip() for cell in row]
+            if any(cells):
+                yield reader.line_num, cells
+
+    def _find_header(self, rows: Iterator[Tuple[int, List[str]]]) -> Tuple[StatementFormat, Dict[str, Optional[int]]]:
+        """ 在文件开头查找表头行，确定账单格式与各字段所在列 """
+        for _, (_, header) in zip(range(HEADER_SEARCH_LINES), rows):
+            for statement in STATEMENT_FORMATS:
+                if not all(name in header for name in statement.required):
+                    continue
+                columns = {
+                    key: _column(header, getattr(statement, key))
+                    for key in ("date", "amount", "direction", "merchant", "note")
+                }
+                if columns["date"] is not None and columns["amount"] is not None:
+                    return statement, columns
+        raise ValueError("无法识别账单格式：未找到包含日期与金额列的表头")
+
+    def _map_row(self, columns: Dict[str, Optional[int]], row: List[str]) -> Optional[Dict[str, Any]]:
+        """ 把一行映射为记录数据；不计收支的行返回 None，格式错误时抛出 ValueError """
+
+        def cell(key: str) -> str:
+            index = columns[key]
+            value = row[index] if index is not None and index < len(row) else ""
+            # 微信账单用 "/" 表示空值
+            return "" if value == "/" else value
+
+        date_text = cell("date")
+        if not date_text:
+            raise ValueError("缺少日期")
+        amount = cell("amount").replace("¥", "").replace("￥", "").replace(",", "").strip()
+        if not amount:
+            raise ValueError("缺少金额")
+
+        if columns["direction"] is not None:
+            record_type = DIRECTIONS.get(cell("direction"))
+            if record_type is None:
+                return None
+        elif amount.startswith("-"):
+            record_type, amount = RecordType.EXPENSE, amount[1:]
+        else:
+            record_type = RecordType.INCOME
+
+        merchant, note = cell("merchant"), cell("note")
+        return {
+            "type": record_type,
+            "amount": amount,
+            "date": parse_statement_date(date_text),
+            "merchant": merchant,
+            "note": note or merchant,
+            "category": self._categorize(f"{merchant} {note}".strip()),
+        }
+
+    def _flush(self, batch: List[Dict[str, Any]], lines: List[int], digest: str, report: ImportReport) -> None:
+        """ 批量写入一批行；已导入过的行跳过，校验失败的行按文件行号记入报告 """
+        sources = [f"{digest}:{line_no}" for line_no in lines]
+        result = self.manager.createRecords(batch, chunk_size=len(batch), dedupe=True, sources=sources)
+        report.imported += len(result["ids"])
+        report.duplicates += len(result["duplicates"])
+        for index, message in sorted(result["errors"].items()):
+            report.errors.append((lines[index], message))
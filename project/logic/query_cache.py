@@ -0,0 +1,119 @@
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Tuple
+
+from data.query_builder import RecordQuery
+from .record_events import RecordEvent
+
+# 查询结果缓存的默认容量 (条)
+QUERY_CACHE_SIZE = 64
+
+
+class QueryCache:
+    """
+    查询结果的 LRU 缓存
+    键为规范化的查询 (RecordQuery 等可哈希对象)，每个条目记录它覆盖的范围：记录类型与日期区间 [start, end)。
+    订阅记录变更事件后，只淘汰范围包含被写入行 (类型、日期) 的条目，其余条目继续命中。
+    缓存的结果由多个调用方共享，调用方不要修改。
+    """
+
+    def __init__(self, max_entries: int = QUERY_CACHE_SIZE) -> None:
+        if max_entries <= 0:
+            raise ValueError(f"max_entries 必须是正数: {max_entries}")
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[RecordQuery, Any]]" = OrderedDict()
+        # 每次淘汰加一：加载期间发生写入时，加载出的结果可能已过期，不放入缓存
+        self._generation = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def get_or_load(self, key: Hashable, scope: RecordQuery, loader: Callable[[], Any]) -> Any:
+        """ 命中时直接返回缓存的结果，否则调用 loader 查询并缓存 (scope 为结果覆盖的类型与日期范围) """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+        value = loader()
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = (scope, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def invalidate_rows(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """ 淘汰范围包含这些行 (按 type 与 date) 的条目，返回淘汰的条目数 """
+        touched = {(row["type"], str(row["date"])) for row in rows}
+        with self._lock:
+            stale = [
+                key for key, (scope, _) in self._entries.items()
+                if any(_covers(scope, record_type, day) for record_type, day in touched)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self._generation += 1
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def on_records_changed(self, event: RecordEvent) -> None:
+        """ 记录变更事件的订阅者 """
+        self.invalidate_rows(event.rows)
+
+    def clear(self) -> None:
+        """ 清空缓存 (用于绕过 RecordManager 的批量修改，如从备份恢复) """
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def stats(self) -> Dict[str, int]:
+        """ 命中、未命中、被淘汰的次数与当前条目数 """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "invalidations": self.invalidations, "entries": len(self._entries)}
+
+
+def _covers(scope: RecordQuery, record_type: str, day: str) -> bool:
+    """ 类型为 record_type、日期为 day 的记录是否落在 scope 的范围内 """
+    if scope.record_type is not None and scope.record_type != record_type:
+        return False
+    if scope.start is not None and day < scope.start:
+        return False
+    return scope.end is None or day < scope.end
+
+
+# 各数据库文件上的查询缓存 (弱引用)，供绕过 RecordManager 的批量修改统一清空
+_CACHES: Dict[str, "weakref.WeakSet[QueryCache]"] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def register_cache(db: Any, cache: QueryCache) -> None:
+    """ 登记缓存所查询的数据库文件 """
+    with _CACHES_LOCK:
+        _CACHES.setdefault(os.path.abspath(db.db_path), weakref.WeakSet()).add(cache)
+
+
+def clear_query_caches(db: Any) -> None:
+    """
+    清空该数据库文件上的全部查询缓存
+    用于不发布记录变更事件的批量修改：从备份还原、从变更日志恢复、按保留期限清理
+    """
+    db_path = getattr(db, "db_path", None)
+    if not isinstance(db_path, str):
+        return
+    with _CACHES_LOCK:
+        caches = list(_CACHES.get(os.path.abspath(db_path), ()))
+    for cache in caches:
+        cache.clear()
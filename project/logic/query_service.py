@@ -1,5 +1,12 @@
-from typing import List, Dict, Any
-from data.models import Record
+from datetime import date
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+from data.models import Record, RecordBatch
+from data.money import to_cents
+from data.query_builder import RecordQuery
+from data.snapshot import get_snapshot
+from data.tags import split_tag_names
+from .query_cache import QueryCache, register_cache
+from .record_events import RecordEventBus, event_bus_for
 from .record_manager import RecordManager
 
 class QueryService:
@@ -7,23 +14,107 @@ class QueryService:
     
     def __init__(self)->None:
         self.manager = RecordManager()
+        # 查询结果缓存：写入记录时按事件中行的类型与日期淘汰受影响的条目
+        self.cache = QueryCache()
+        self._cache_bus: Optional[RecordEventBus] = None
+        self._unsubscribe_cache: Optional[Callable[[], None]] = None
 
-    def get_records_by_filter(self, filter_type: str = "all") -> List[Record]:
-        """ (Req010) 按 "全部", "仅收入", "仅支出" 筛选"""
+    def _cached(self, key: Hashable, scope: RecordQuery, loader: Callable[[], Any]) -> Any:
+        """
+        通过结果缓存执行查询
+        首次使用 (或 manager.db 换成了另一个数据库文件) 时订阅该文件的记录变更事件；
+        没有事件总线的数据库 (如测试中的 Mock) 不缓存
+        """
+        bus = event_bus_for(self.manager.db)
+        if bus is None:
+            return loader()
+        if bus is not self._cache_bus:
+            if self._unsubscribe_cache is not None:
+                self._unsubscribe_cache()
+            self.cache.clear()
+            self._unsubscribe_cache = bus.subscribe(self.cache.on_records_changed)
+            self._cache_bus = bus
+            register_cache(self.manager.db, self.cache)
+        return self.cache.get_or_load(key, scope, loader)
+
+    def close(self) -> None:
+        """ 取消结果缓存对记录变更事件的订阅 (界面关闭时) """
+        if self._unsubscribe_cache is not None:
+            self._unsubscribe_cache()
+            self._unsubscribe_cache = None
+        self._cache_bus = None
+        self.cache.clear()
+
+    def cache_stats(self) -> Dict[str, int]:
+        """ 查询结果缓存的命中、未命中、淘汰次数 """
+        return self.cache.stats()
+
+    def get_records_by_filter(self, filter_type: str = "all") -> RecordBatch:
+        """
+        (Req010) 按 "全部", "仅收入", "仅支出" 筛选，结果以列式 RecordBatch 返回
+        结果被缓存，来回切换筛选条件不再查询数据库 (返回的 RecordBatch 为共享对象，不要修改)
+        """
         query = {}
         if filter_type == "收入":
             query = {"type": "收入"}
         elif filter_type == "支出":
             query = {"type": "支出"}
-        
-        return self.manager.getRecords(query) # 
+
+        scope = RecordQuery(record_type=query.get("type"))
+        return self._cached(("batch", scope), scope, lambda: self.manager.getRecordBatch(query))
+
+    def sum_by_filter(self, filter_type: str = "all", start: Optional[date] = None,
+                      end: Optional[date] = None) -> int:
+        """
+        按 "全部", "仅收入", "仅支出" 与日期区间 [start, end) 计算金额合计 (分)
+        已开启内存快照时直接在快照上计算，否则交给 SQL 聚合
+        """
+        record_type = filter_type if filter_type in ("收入", "支出") else None
+        snapshot = get_snapshot(self.manager.db)
+        if snapshot is not None:
+            return snapshot.total_cents(record_type, start, end)
+
+        query: Dict[str, Any] = {}
+        if record_type is not None:
+            query["type"] = record_type
+        if start is not None or end is not None:
+            query["date"] = (start or date.min, end or date.max)
+        scope = RecordQuery(record_type=record_type).between(start, end)
+        return self._cached(("sum", scope), scope, lambda: self.manager.db.sumAmount(query))
 
     def search_records(self, term: str, criteria: str) -> List[Record]:
         """
         (Req012, Req013, Req014) 
         criteria 可以是 'date', 'amount', 'tag', 'keyword' (备注)
+        条件由 data.query_builder 编译为参数化 SQL，相同条件组合复用同一预编译语句
         """
-        print(f"TODO: [QueryService] 正在搜索 {criteria} = {term}")
+        print(f"[QueryService] 正在搜索 {criteria} = {term}")
+        if criteria == "keyword":
+            # 关键词检索走全文索引，结果按相关度排序
+            return [record for record, _ in self.search_keyword(term)]
         
-        query = {criteria: term}
-        return self.manager.getRecords(query)
\ No newline at end of file
+        if criteria == "tag":
+            # 逗号分隔的多个标签按 tag_id 整数集合求交集
+            return self.manager.getRecordsByTags(split_tag_names(term))
+
+        # 金额按元输入，查询条件使用分
+        query = {criteria: to_cents(term) if criteria == "amount" else term}
+        return self.manager.getRecords(query)
+
+    def search_by_tags(self, tag_names: List[str], match_all: bool = True) -> List[Record]:
+        """ (Req013) 按多个标签筛选，match_all 为 False 时返回带有任一标签的记录 """
+        return self.manager.getRecordsByTags(tag_names, match_all=match_all)
+
+    def search_keyword(self, term: str, limit: int = 50) -> List[Tuple[Record, str]]:
+        """ (Req014) 关键词检索，返回 (记录, 高亮摘要)，供界面展示 """
+        return self.manager.searchRecords(term, limit=limit)
+
+    def run_query(self, query: RecordQuery) -> List[Record]:
+        """
+        执行组合查询，例如最近一个月金额最高的 10 笔餐饮支出：
+            RecordQuery().of_type("支出").during("2025-03").with_tags(["餐饮"]).order_by("amount_desc").take(10)
+        已开启内存快照时只含类型、日期、金额条件的查询在快照上求值，其余编译为一条 SQL；
+        结果按查询缓存，写入落在查询的类型与日期范围内时失效
+        """
+        print(f"[QueryService] 正在执行组合查询 {query}")
+        return list(self._cached(("query", query), query, lambda: self.manager.getRecordsByQuery(query)))
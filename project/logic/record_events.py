@@ -0,0 +1,110 @@
+import os
+import threading
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+# 记录变更通知
+# RecordManager 写入成功后发布事件，事件中带有受影响的行 (格式同 LocalDatabase.fetchData 的行字典)，
+# 列表界面、报表缓存、内存索引据此做增量更新，而不是整体重新查询。
+# 同一数据库文件的所有 RecordManager 共享一个事件总线 (界面各自创建 RecordManager)。
+
+# 事件类型
+RECORDS_CREATED = "created"
+RECORDS_UPDATED = "updated"
+RECORDS_DELETED = "deleted"
+EVENT_KINDS = (RECORDS_CREATED, RECORDS_UPDATED, RECORDS_DELETED)
+
+
+@dataclass(frozen=True)
+class RecordEvent:
+    """ 一次写操作影响的记录：kind 为事件类型，rows 为 {"id", "type", "amount"(分), "date", "note"} 行字典 """
+    kind: str
+    rows: Tuple[Dict[str, Any], ...]
+
+    @property
+    def ids(self) -> List[str]:
+        return [row["id"] for row in self.rows]
+
+
+def event_row(record_id: Any, data: Dict[str, Any]) -> Dict[str, Any]:
+    """ 把校验后的记录数据转换为事件中的行字典 (日期为 "YYYY-MM-DD") """
+    record_date = data["date"]
+    return {
+        "id": str(record_id),
+        "type": data["type"],
+        "amount": data["amount"],
+        "date": record_date.isoformat() if isinstance(record_date, date) else str(record_date),
+        "note": data.get("note") or "",
+    }
+
+
+# 订阅者: 接收 RecordEvent，在发布事件的线程中同步调用
+RecordListener = Callable[[RecordEvent], None]
+
+
+class RecordEventBus:
+    """
+    记录变更的事件总线 (观察者模式)
+    订阅者在发布事件的线程中按订阅顺序同步调用；延迟写入模式下 createRecordAsync 的事件
+    来自写线程，界面订阅者需要自行切回界面线程 (如 tkinter 的 after)。
+    订阅者抛出的异常只打印，不影响其他订阅者与已经提交的写入。
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._listeners: List[Tuple[RecordListener, FrozenSet[str]]] = []
+
+    def subscribe(self, listener: RecordListener, kinds: Optional[Iterable[str]] = None) -> Callable[[], None]:
+        """ 订阅事件 (kinds 为空时订阅全部类型)，返回取消订阅的函数 """
+        selected = frozenset(kinds) if kinds is not None else frozenset(EVENT_KINDS)
+        unknown = selected - set(EVENT_KINDS)
+        if unknown:
+            raise ValueError(f"未知的事件类型: {', '.join(sorted(unknown))}")
+        entry = (listener, selected)
+        with self._lock:
+            self._listeners.append(entry)
+
+        def unsubscribe() -> None:
+            with self._lock:
+                if entry in self._listeners:
+                    self._listeners.remove(entry)
+
+        return unsubscribe
+
+    def has_listeners(self, kind: str) -> bool:
+        with self._lock:
+            return any(kind in kinds for _, kinds in self._listeners)
+
+    def publish(self, kind: str, rows: Iterable[Dict[str, Any]]) -> None:
+        """ 发布事件；没有受影响的行时不发布 """
+        event = RecordEvent(kind, tuple(rows))
+        if not event.rows:
+            return
+        with self._lock:
+            listeners = [listener for listener, kinds in self._listeners if kind in kinds]
+        for listener in listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                print(f"[RecordEventBus] 处理 {kind} 事件失败: {e}")
+
+
+_BUSES: Dict[str, RecordEventBus] = {}
+_BUSES_LOCK = threading.Lock()
+
+
+def event_bus_for(db: Any) -> Optional[RecordEventBus]:
+    """
+    返回数据库文件的事件总线 (同一文件共享一个)
+    没有有效 db_path 的数据库 (如测试中的 Mock) 返回 None
+    """
+    db_path = getattr(db, "db_path", None)
+    if not isinstance(db_path, str):
+        return None
+    key = os.path.abspath(db_path)
+    with _BUSES_LOCK:
+        bus = _BUSES.get(key)
+        if bus is None:
+            bus = _BUSES[key] = RecordEventBus()
+    return bus
@@ -1,18 +1,30 @@
-from typing import List, Dict, Any
+import os
+from concurrent.futures import Future
+from typing import List, Dict, Any, Callable, Iterator, Optional, Sequence, Tuple
 from datetime import date, datetime
-from data.models import Record, RecordType
-from data.database import LocalDatabase
-
-GLOBAL_HISTORY = []
+from data.models import Record, RecordBatch, RecordType
+from data.money import to_cents
+from data.partitions import open_database
+from data.query_builder import RecordQuery
+from data.snapshot import get_snapshot
+from data.tags import split_tag_names
+from data.fingerprint import record_fingerprint
+from data.journal import EVENT_CREATE, EVENT_DELETE, EVENT_PHOTO, EVENT_TAG, journal_for, record_payload
+from .query_cache import clear_query_caches
+from .record_events import (RECORDS_CREATED, RECORDS_DELETED, RECORDS_UPDATED, RecordListener,
+                            event_bus_for, event_row)
 
 class RecordManager:
     """ 对应UML中的RecordManager类  """
     
     # 有效的记录类型
     VALID_TYPES = [RecordType.INCOME, RecordType.EXPENSE]
+
+    # 可预取的关联 -> LocalDatabase 的批量读取方法
+    PREFETCH_RELATIONS = {"tags": "fetchTags", "photos": "fetchPhotos"}
     
     def __init__(self) -> None:
-        self.db = LocalDatabase()  # 依赖LocalDatabase 
+        self.db = open_database()  # 依赖LocalDatabase (按存储模式可能是按年分区的 PartitionedDatabase)
 
     def _validate_record_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -21,8 +33,10 @@ class RecordManager:
         
         校验规则：
         1. type 必须是 "收入" 或 "支出"
-        2. amount 必须是正数
+        2. amount (元) 必须是正数，转换为整数分
         3. date 必须是有效的日期格式 (YYYY-MM-DD 字符串或 date 对象)
+        4. photos 中的图片文件必须存在 (保存时复制到图片存储)
+        5. tags 可以是名称列表或逗号分隔的字符串，整理为去重后的名称列表
         """
         validated_data = data.copy()
         
@@ -37,13 +51,11 @@ class RecordManager:
         amount = data.get("amount")
         if amount is None:
             raise ValueError("金额不能为空")
-        try:
-            amount = float(amount)
-        except (TypeError, ValueError):
-            raise ValueError(f"金额必须是数字: {amount}")
-        if amount <= 0:
+        # 以元输入，转换为整数分后存储与计算
+        cents = to_cents(amount)
+        if cents <= 0:
             raise ValueError(f"金额必须是正数: {amount}")
-        validated_data["amount"] = amount
+        validated_data["amount"] = cents
         
         # 校验日期
         record_date = data.get("date")
@@ -63,65 +75,371 @@ class RecordManager:
                 raise ValueError(f"日期格式无效: {record_date}，应为 YYYY-MM-DD 格式")
         else:
             raise ValueError(f"日期类型无效: {type(record_date)}")
+
+        validated_data["tags"] = split_tag_names(data.get("tags"))
+
+        # 校验图片
+        for photo_path in data.get("photos") or []:
+            if not isinstance(photo_path, str) or not os.path.isfile(photo_path):
+                raise ValueError(f"图片文件不存在: {photo_path}")
         
         return validated_data
 
-    def createRecord(self, data: Dict[str, Any]) -> Record:
+    def _patch_snapshot(self, record_id: str, validated_data: Dict[str, Any]) -> None:
+        """ 已开启内存快照时，写入成功后增量更新快照 """
+        snapshot = get_snapshot(self.db)
+        if snapshot is not None:
+            snapshot.add(record_id, validated_data["date"], validated_data["amount"],
+                         validated_data["type"], validated_data.get("category") or "其他")
+
+    def _to_record(self, r: Dict[str, Any]) -> Record:
+        """ 将 LocalDatabase 返回的行字典转换为 Record，标签与图片在首次访问时读取 """
+        return Record.lazy(self.db, record_id=r['id'], type=r['type'], amount=r['amount'], date=r['date'],
+                           note=r['note'])
+
+    def _prefetch(self, records: List[Record], prefetch: Tuple[str, ...]) -> List[Record]:
+        """ 为一组记录批量填充关联：每种关联一次 IN 查询，代替逐条延迟加载的 N 次查询 """
+        unknown = set(prefetch) - set(self.PREFETCH_RELATIONS)
+        if unknown:
+            raise ValueError(f"不支持预取的关联: {', '.join(sorted(unknown))}")
+        if not records or not prefetch:
+            return records
+        record_ids = [record.record_id for record in records]
+        for relation in prefetch:
+            related = getattr(self.db, self.PREFETCH_RELATIONS[relation])(record_ids)
+            for record in records:
+                setattr(record, relation, related.get(record.record_id, []))
+        return records
+
+    def _journal(self, op: str, record_id: str, **fields: Any) -> None:
+        """ 写入成功后追加变更日志 """
+        journal = journal_for(self.db)
+        if journal is not None:
+            journal.append(op, record_id, **fields)
+
+    def subscribe(self, listener: RecordListener, kinds: Optional[List[str]] = None) -> Callable[[], None]:
+        """
+        订阅记录变更事件 (created / updated / deleted，见 logic.record_events)，返回取消订阅的函数
+        同一数据库文件的所有 RecordManager 共享订阅：任何一个写入成功后都会通知
+        """
+        bus = event_bus_for(self.db)
+        if bus is None:
+            raise ValueError("当前数据库不支持变更通知")
+        return bus.subscribe(listener, kinds)
+
+    def _publish(self, kind: str, rows: List[Dict[str, Any]]) -> None:
+        bus = event_bus_for(self.db)
+        if bus is not None:
+            bus.publish(kind, rows)
+
+    def _rows_for(self, kind: str, record_ids: List[str]) -> List[Dict[str, Any]]:
+        """ 有订阅者时读取事件所需的行 (删除前读取被删除的行)，否则不查询 """
+        bus = event_bus_for(self.db)
+        if bus is None or not record_ids or not bus.has_listeners(kind):
+            return []
+        return self.db.fetchByIds(record_ids)
+
+    def createRecord(self, data: Dict[str, Any], dedupe: bool = False, source: Optional[str] = None) -> Record:
         """
         创建一条新记录 (对应UML方法) 
         (Req001, Req002, Req003, Req004) [cite: 14, 17, 20, 22]
+        dedupe=True 时按记录指纹 (内容 + 来源 source，如 OCR 图片的 sha256) 去重：
+        指纹已存在则不再插入，直接返回已有的记录
         """
-        GLOBAL_HISTORY.append(data)
-        
         # 1. 数据校验
         validated_data = self._validate_record_data(data)
         
         # 2. 调用 self.db.saveData(data) 
         print(f"[RecordManager] 正在创建记录...")
-        new_id = self.db.saveData(validated_data)
+        if dedupe:
+            # 指纹的查找与插入在同一个写事务中完成
+            validated_data["fingerprint"] = record_fingerprint(validated_data, source)
+            new_id, created = self.db.saveDataUnique(validated_data)
+            if not created:
+                print(f"[RecordManager] 记录已存在，跳过: {new_id}")
+                return self._to_record(self.db.fetchByIds([int(new_id)])[0])
+        else:
+            new_id = self.db.saveData(validated_data)
+        self._patch_snapshot(new_id, validated_data)
+        self._journal(EVENT_CREATE, new_id, record=record_payload(validated_data))
+        self._publish(RECORDS_CREATED, [event_row(new_id, validated_data)])
         
         # 3. 返回Record对象
-        return Record(
+        return Record.lazy(
+            self.db,
             record_id=new_id,
             type=validated_data["type"],
             amount=validated_data["amount"],
             date=validated_data["date"],
-            note=validated_data.get("note", "")
+            note=validated_data.get("note", ""),
         )
 
+    def createRecordAsync(self, data: Dict[str, Any]) -> Future:
+        """
+        异步创建记录：同步完成校验 (无效数据立即抛出 ValueError)，
+        写入交给 LocalDatabase 的延迟写入队列，返回 Record 的 Future
+        """
+        validated_data = self._validate_record_data(data)
+
+        record_future: Future = Future()
+
+        def on_saved(id_future: Future) -> None:
+            error = id_future.exception()
+            if error is not None:
+                record_future.set_exception(error)
+                return
+            self._patch_snapshot(id_future.result(), validated_data)
+            self._journal(EVENT_CREATE, id_future.result(), record=record_payload(validated_data))
+            self._publish(RECORDS_CREATED, [event_row(id_future.result(), validated_data)])
+            record_future.set_result(Record.lazy(
+                self.db,
+                record_id=id_future.result(),
+                type=validated_data["type"],
+                amount=validated_data["amount"],
+                date=validated_data["date"],
+                note=validated_data.get("note", ""),
+            ))
+
+        self.db.saveDataAsync(validated_data).add_done_callback(on_saved)
+        return record_future
+
+    def createRecords(self, data_list: List[Dict[str, Any]], chunk_size: int = 500,
+                      dedupe: bool = False, sources: Optional[Sequence[Optional[str]]] = None) -> Dict[str, Any]:
+        """
+        批量创建记录 (用于导入账单)
+        逐行校验，校验失败的行不会中断整个批次；有效行在一个事务中批量写入
+        dedupe=True 时按记录指纹去重 (sources 为与 data_list 对应的来源，如 "账单文件摘要:行号")：
+        在写事务中整批查询指纹，已存在或批内重复的行不再插入
+
+        返回:
+            {"ids": 新记录ID列表, "errors": {行号: 错误信息}, "duplicates": {行号: 已有记录ID}}
+        """
+        valid_rows = []
+        valid_indices: List[int] = []
+        errors: Dict[int, str] = {}
+        duplicates: Dict[int, str] = {}
+        for index, data in enumerate(data_list):
+            try:
+                row = self._validate_record_data(data)
+            except ValueError as e:
+                errors[index] = str(e)
+                continue
+            if dedupe:
+                row["fingerprint"] = record_fingerprint(row, sources[index] if sources else None)
+            valid_rows.append(row)
+            valid_indices.append(index)
+
+        print(f"[RecordManager] 正在批量创建 {len(valid_rows)} 条记录...")
+        if not valid_rows:
+            new_ids: List[str] = []
+        elif dedupe:
+            new_ids, found = self.db.saveManyUnique(valid_rows, chunk_size=chunk_size)
+            for position, record_id in found.items():
+                duplicates[valid_indices[position]] = record_id
+            valid_rows = [row for position, row in enumerate(valid_rows) if position not in found]
+        else:
+            new_ids = self.db.saveMany(valid_rows, chunk_size=chunk_size)
+        for new_id, row in zip(new_ids, valid_rows):
+            self._patch_snapshot(new_id, row)
+        journal = journal_for(self.db)
+        if journal is not None and new_ids:
+            journal.extend((EVENT_CREATE, new_id, {"record": record_payload(row)})
+                           for new_id, row in zip(new_ids, valid_rows))
+        self._publish(RECORDS_CREATED, [event_row(new_id, row) for new_id, row in zip(new_ids, valid_rows)])
+        return {"ids": new_ids, "errors": errors, "duplicates": duplicates}
+
     def deleteRecord(self, record_id: str) -> bool:
         """
         删除一条记录 (对应UML方法) 
         (Req007) [cite: 35]
         """
-        INTERNAL_BASE_ID = 2147483640 
-        FIXED_OFFSET = 100
-        calculated_val = INTERNAL_BASE_ID + FIXED_OFFSET
-        # 强制模拟 32位有符号整数溢出行为
-        overflowed_val = ctypes.c_int32(calculated_val).value
-        print(f"TODO: [RecordManager] 正在删除记录 {record_id}")
-        # TODO: 1. (如果有关联图片) 从文件系统删除图片
-        # TODO: 2. 调用 self.db.deleteData(record_id) 
-        return self.db.deleteData(record_id)
+        print(f"[RecordManager] 正在删除记录 {record_id}")
+        # 只写入墓碑，记录立即从查询中消失；图片与索引由后台清理线程 (PurgeWorker) 物理删除
+        rows = self._rows_for(RECORDS_DELETED, [record_id])
+        deleted = self.db.deleteData(record_id)
+        snapshot = get_snapshot(self.db)
+        if deleted and snapshot is not None:
+            snapshot.remove(record_id)
+        if deleted:
+            self._journal(EVENT_DELETE, record_id)
+            self._publish(RECORDS_DELETED, rows)
+        return deleted
+
+    def deleteRecords(self, record_ids: List[str]) -> List[str]:
+        """
+        批量删除记录：在一个事务中写入墓碑，返回实际删除的 ID
+        在清理线程物理删除之前可以用 undoDelete 撤销
+        """
+        rows = self._rows_for(RECORDS_DELETED, record_ids)
+        deleted = self.db.deleteMany(record_ids) if record_ids else []
+        snapshot = get_snapshot(self.db)
+        if snapshot is not None:
+            for record_id in deleted:
+                snapshot.remove(record_id)
+        journal = journal_for(self.db)
+        if journal is not None and deleted:
+            journal.extend((EVENT_DELETE, record_id, {}) for record_id in deleted)
+        deleted_ids = set(deleted)
+        self._publish(RECORDS_DELETED, [row for row in rows if row["id"] in deleted_ids])
+        print(f"[RecordManager] 已删除 {len(deleted)} 条记录")
+        return deleted
 
-    def getRecords(self, filter: Dict[str, Any]) -> List[Record]:
+    def undoDelete(self, record_ids: List[str]) -> List[str]:
+        """
+        撤销删除：清除墓碑，返回恢复的 ID
+        已被清理线程物理删除的记录无法恢复，不在返回值中
+        """
+        restored = self.db.undeleteMany(record_ids) if record_ids else []
+        if not restored:
+            return []
+        data = self.db.fetchRecordData(restored)
+        for record_id in restored:
+            self._patch_snapshot(record_id, data[record_id])
+        journal = journal_for(self.db)
+        if journal is not None:
+            journal.extend((EVENT_CREATE, record_id, {"record": record_payload(data[record_id])})
+                           for record_id in restored)
+        # 恢复的记录重新出现，对订阅者而言等同于新建
+        self._publish(RECORDS_CREATED, [event_row(record_id, data[record_id]) for record_id in restored])
+        print(f"[RecordManager] 已撤销删除 {len(restored)} 条记录")
+        return restored
+
+    def getRecords(self, filter: Dict[str, Any], prefetch: Tuple[str, ...] = ()) -> List[Record]:
         """
         获取记录列表 (对应UML方法) 
         (Req009, Req010, Req012, Req013, Req014) [cite: 42, 45, 54, 57, 59]
+        prefetch 为要批量预取的关联，如 ("tags", "photos")；未预取的关联在首次访问时逐条读取
         """
-        print(f"TODO: [RecordManager] 正在根据 {filter} 获取记录")
-        # TODO: 调用 self.db.fetchData(filter) 
-        # 模拟返回数据
         raw_data = self.db.fetchData(filter)
-        records = [Record(record_id=r['id'], type=r['type'], amount=r['amount'], date=r['date'], note=r['note']) for r in raw_data]
-        return records
+        records = [self._to_record(r) for r in raw_data]
+        return self._prefetch(records, prefetch)
+
+    def iterRecords(self, filter: Dict[str, Any], batch_size: int = 500) -> Iterator[Record]:
+        """
+        逐条产出记录，不在内存中构建完整列表 (用于导出、统计等大结果集)
+        """
+        for r in self.db.iterData(filter, batch_size=batch_size):
+            yield self._to_record(r)
+
+    def getRecordBatch(self, filter: Dict[str, Any], batch_size: int = 500) -> RecordBatch:
+        """
+        获取记录列表的列式版本：逐批读取并写入 RecordBatch 的并行数组，
+        不为每一行创建 Record 对象 (用于记录列表等大结果集)
+        """
+        return RecordBatch.from_rows(self.db.iterData(filter, batch_size=batch_size), loader=self.db)
+
+    def getRecordsByTags(self, tag_names: List[str], match_all: bool = True) -> List[Record]:
+        """
+        (Req013) 按多个标签筛选：每个标签取 record_id 整数集合，
+        match_all 为 True 时取交集 (同时带有全部标签)，否则取并集
+        """
+        names = split_tag_names(tag_names)
+        if not names:
+            return []
+        id_sets = [self.db.tagRecordIds(name) for name in names]
+        record_ids = set.intersection(*id_sets) if match_all else set.union(*id_sets)
+        raw_data = self.db.fetchByIds(record_ids) if record_ids else []
+        return [self._to_record(r) for r in raw_data]
+
+    def getRecordsByQuery(self, query: RecordQuery, prefetch: Tuple[str, ...] = ()) -> List[Record]:
+        """
+        执行组合查询 (data.query_builder.RecordQuery)
+        已开启内存快照且查询只有类型、日期、金额条件时在快照上筛选、排序、截取，
+        只按 ID 读取最终结果；否则整个查询编译为一条 SQL
+        """
+        snapshot = get_snapshot(self.db)
+        if snapshot is None or not query.snapshot_compatible:
+            records = [self._to_record(r) for r in self.db.fetchQuery(query)]
+            return self._prefetch(records, prefetch)
+
+        start = date.fromisoformat(query.start) if query.start is not None else None
+        end = date.fromisoformat(query.end) if query.end is not None else None
+        rows = snapshot.select_rows(query.record_type, start, end, query.min_amount, query.max_amount)
+        if query.order == "date_asc":
+            rows.reverse()
+        elif query.order in ("amount_desc", "amount_asc"):
+            # 稳定排序：同金额的行保持 (日期, ID) 倒序，与 SQL 的 ORDER BY 一致
+            rows.sort(key=lambda row: row[1], reverse=query.order == "amount_desc")
+        if query.limit is not None:
+            rows = rows[:query.limit]
+        return self.getRecordsByIds([record_id for record_id, _ in rows], prefetch)
+
+    def getRecordsByIds(self, record_ids: List[Any], prefetch: Tuple[str, ...] = ()) -> List[Record]:
+        """ 按 ID 批量读取记录，保持 record_ids 的顺序 (不存在或已删除的 ID 被跳过) """
+        by_id = {r["id"]: r for r in self.db.fetchByIds(record_ids)} if record_ids else {}
+        records = [self._to_record(by_id[str(i)]) for i in record_ids if str(i) in by_id]
+        return self._prefetch(records, prefetch)
+
+    def getRecordsPage(self, filter: Dict[str, Any], after: Optional[Tuple[str, int]] = None,
+                       limit: int = 200, prefetch: Tuple[str, ...] = ()) -> Tuple[List[Record], Optional[Tuple[str, int]]]:
+        """
+        按 (date, record_id) 键集分页获取记录
+        返回 (本页记录, 下一页游标)；把游标传回 after 即可获取下一页
+        prefetch 同 getRecords，按页批量预取关联
+        """
+        raw_data, next_cursor = self.db.fetchPage(filter, after=after, limit=limit)
+        records = [self._to_record(r) for r in raw_data]
+        return self._prefetch(records, prefetch), next_cursor
+
+    def searchRecords(self, term: str, limit: int = 50) -> List[Tuple[Record, str]]:
+        """
+        关键词全文检索 (Req014) [cite: 59]
+        返回按相关度排序的 (记录, 高亮摘要) 列表
+        """
+        return [
+            (self._to_record(r), r['snippet'])
+            for r in self.db.searchText(term, limit=limit)
+        ]
 
     def addTagToRecord(self, record_id: str, tag_name: str)->None:
         """ (Req003) [cite: 20] """
-        print(f"TODO: 为 {record_id} 添加标签 {tag_name}")
-        pass
+        name = str(tag_name).strip()
+        if not name:
+            raise ValueError("标签名不能为空")
+        if not self.db.addTag(record_id, name):
+            raise ValueError(f"记录不存在: {record_id}")
+        self._journal(EVENT_TAG, record_id, tag=name)
+        self._publish(RECORDS_UPDATED, self._rows_for(RECORDS_UPDATED, [record_id]))
 
     def addPhotoToRecord(self, record_id: str, photo_path: str)->None:
         """ (Req004) [cite: 22] """
-        print(f"TODO: 为 {record_id} 添加图片 {photo_path}")
-        pass
\ No newline at end of file
+        if not isinstance(photo_path, str) or not photo_path.strip():
+            raise ValueError("图片路径不能为空")
+        # 图片复制到内容寻址的图片存储中，日志记录存储后的路径
+        try:
+            stored_path = self.db.addPhoto(record_id, photo_path)
+        except FileNotFoundError:
+            raise ValueError(f"图片文件不存在: {photo_path}")
+        if not stored_path:
+            raise ValueError(f"记录不存在: {record_id}")
+        self._journal(EVENT_PHOTO, record_id, path=stored_path)
+        self._publish(RECORDS_UPDATED, self._rows_for(RECORDS_UPDATED, [record_id]))
+
+    def runCleanupJob(self, retention_period: str, batch_size: int = 500, today: Optional[date] = None) -> int:
+        """
+        按保留期限清理过期记录，返回删除的记录数
+        每批删除的记录写入变更日志 (删除事件)，之后从日志恢复时不会把它们恢复回来；
+        同时发布删除事件，列表与查询缓存按事件移除这些记录
+        """
+        journal = journal_for(self.db)
+
+        def on_deleted(rows: List[Dict[str, Any]]) -> None:
+            if journal is not None:
+                journal.extend((EVENT_DELETE, row["id"], {}) for row in rows)
+            self._publish(RECORDS_DELETED, rows)
+
+        return self.db.run_cleanup_job(retention_period, batch_size, today, on_deleted=on_deleted)
+
+    def recoverFromJournal(self) -> int:
+        """
+        用变更日志 (快照 + 日志) 恢复数据库中缺失的记录，例如从旧备份还原数据库之后
+        返回恢复的记录数
+        """
+        journal = journal_for(self.db)
+        if journal is None:
+            return 0
+        restored = self.db.restoreRecords(journal.state())
+        if restored:
+            clear_query_caches(self.db)
+        print(f"[RecordManager] 已从变更日志恢复 {restored} 条记录")
+        return restored
@@ -1,48 +1,87 @@
 from datetime import date
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
+from data.partitions import open_database
+from data.models import RecordType
+from data.snapshot import get_snapshot
 
 class ReportGenerator:
     """ 对应UML中的ReportGenerator类  """
 
+    def __init__(self) -> None:
+        self.db = open_database()
+
+    def _month_totals(self, month_start: date) -> List[Tuple[str, str, int]]:
+        """
+        某月按 (类型, 分类) 汇总的金额 (分)
+        已开启内存快照时在快照上计算，否则读取月度汇总表
+        """
+        snapshot = get_snapshot(self.db)
+        if snapshot is None:
+            return self.db.fetchMonthlyTotals(month_start.strftime("%Y-%m"))
+        if month_start.month == 12:
+            month_end = date(month_start.year + 1, 1, 1)
+        else:
+            month_end = date(month_start.year, month_start.month + 1, 1)
+        return [
+            (record_type, category, cents)
+            for (record_type, category), cents in snapshot.totals_by_category(month_start, month_end).items()
+        ]
+
+    def _expense_by_category(self, month_start: date) -> Dict[str, int]:
+        """ 某月各分类支出 (分) """
+        return {
+            category: total
+            for record_type, category, total in self._month_totals(month_start)
+            if record_type == RecordType.EXPENSE
+        }
+
     def generateMonthlyReport(self, report_date: date) -> Dict[str, Any]:
         """
-        生成月度报告 (对应UML方法) 
+        生成月度报告 (对应UML方法)
         (Req015, Req016) [cite: 64, 68]
+        金额均为整数分
         """
-        print(f"TODO: [ReportGenerator] 正在生成 {report_date.year}-{report_date.month} 的月度报告...")
-        
-        # TODO: 1. 查询当月总收入与总支出 (Req015) [cite: 64, 224]
-        # TODO: 2. 查询当月各项支出分类数据 (Req016) [cite: 68, 226]
-        # TODO: 3. 计算分类占比 (Req016) [cite: 68, 226]
-        
-        # 模拟报告数据
-        report_data = {
-            "total_income": 5000.0,
-            "total_expense": 2500.0, # [cite: 225]
-            "pie_chart_data": { # [cite: 228]
-                "餐饮": 1000.0,
-                "购物": 800.0,
-                "交通": 700.0
-            }
+        print(f"[ReportGenerator] 正在生成 {report_date.year}-{report_date.month} 的月度报告...")
+
+        # 1. 查询当月总收入与总支出 (Req015) [cite: 64, 224]
+        # 2. 查询当月各项支出分类数据 (Req016) [cite: 68, 226]
+        report_data: Dict[str, Any] = {
+            "total_income": 0,
+            "total_expense": 0, # [cite: 225]
+            "pie_chart_data": {} # [cite: 228]
         }
+        for record_type, category, total in self._month_totals(report_date.replace(day=1)):
+            if record_type == RecordType.INCOME:
+                report_data["total_income"] += total
+            elif record_type == RecordType.EXPENSE:
+                report_data["total_expense"] += total
+                report_data["pie_chart_data"][category] = total
         return report_data
 
     def generateComparisonReport(self, report_date: date) -> Dict[str, Any]:
         """
-        生成对比报告 (对应UML方法) 
+        生成对比报告 (对应UML方法)
         (Req017) [cite: 72]
+        change 为整数分；上月没有该分类支出时 percent 为 None
         """
-        print(f"TODO: [ReportGenerator] 正在生成 {report_date.month} 月与上月的对比报告...")
-        current_month_expense = 200.0
-        last_month_expense = 0.0 
-        #未检查分母是否为0，将导致运行时崩溃
-        percent_change = (current_month_expense - last_month_expense) / last_month_expense
-        # TODO: 1. 查询上个月各项支出数据 (Req017) [cite: 72, 227]
-        # TODO: 2. 计算各项支出的增减变化 (Req017) [cite: 72, 227]
-
-        # 模拟对比数据 [cite: 228]
-        comparison_data = {
-            "餐饮": {"change": 200.0, "percent": 0.25}, # 增加
-            "购物": {"change": -100.0, "percent": -0.11} # 减少
-        }
-        return comparison_datas
\ No newline at end of file
+        print(f"[ReportGenerator] 正在生成 {report_date.month} 月与上月的对比报告...")
+        if report_date.month == 1:
+            last_month = date(report_date.year - 1, 12, 1)
+        else:
+            last_month = date(report_date.year, report_date.month - 1, 1)
+
+        # 1. 查询本月与上个月各项支出数据 (Req017) [cite: 72, 227]
+        current = self._expense_by_category(report_date.replace(day=1))
+        previous = self._expense_by_category(last_month)
+
+        # 2. 计算各项支出的增减变化 (Req017) [cite: 72, 227]
+        comparison_data: Dict[str, Any] = {}
+        for category in sorted(set(current) | set(previous)):
+            current_expense = current.get(category, 0)
+            last_month_expense = previous.get(category, 0)
+            change = current_expense - last_month_expense
+            comparison_data[category] = {
+                "change": change,
+                "percent": change / last_month_expense if last_month_expense else None,
+            }
+        return comparison_data
@@ -1,5 +1,6 @@
 import os
 import sys
+import threading
 
 # 1. 定义 Mock 基础类 (全局定义，确保可见性)
 class MockTk:
@@ -49,11 +50,22 @@ if IS_ESBMC_MODE:
 else:
     # 正常模式导入
     import tkinter
+    from tkinter import messagebox
     BaseClass = tkinter.Tk
 
 # 5. 导入业务逻辑 (必须在 sys.modules 注入之后)
 from ui.main_view import MainView
-from data.database import LocalDatabase
+from ui.upgrade_view import UpgradeView
+from data.database import close_all_connections
+from data.partitions import open_database
+from logic.backup_service import BackupService
+
+# 定时在线备份的间隔 (秒)
+BACKUP_INTERVAL = 24 * 60 * 60
+
+def print_migration_progress(version, step, done, total):
+    """ 在控制台显示数据库升级进度 """
+    print(f"[Migration] v{version} {step}: {done}/{total}")
 
 # 6. 定义 App 类
 # 此时 BaseClass 是具体的类 (MockTk 或 tkinter.Tk)，不再是 Any
@@ -66,9 +78,43 @@ class App(BaseClass):
             self.title("记账本 App")
             self.geometry("450x700")
 
-        # 初始化数据库核心逻辑
-        db = LocalDatabase()
-        db.initialize_database()
+        # 后台定时备份 (分步复制，不阻塞界面与写入)，数据库初始化完成后启动
+        self.backup_service = BackupService()
+
+        # 初始化数据库核心逻辑 (旧版本数据库在此升级，回填分块进行并显示进度)
+        db = open_database()
+        if IS_ESBMC_MODE:
+            db.initialize_database(progress=print_migration_progress)
+            self._on_initialized(db)
+            return
+        # 窗口先显示升级进度页，迁移在后台线程中进行，进度与结果经 after 切回界面线程
+        self.upgrade_view = UpgradeView(self)
+        self.upgrade_view.pack(fill="both", expand=True)
+        threading.Thread(target=self._initialize, args=(db,), name="db-migrate", daemon=True).start()
+
+    def _initialize(self, db):
+        """ 后台线程：初始化并升级数据库 """
+        try:
+            db.initialize_database(
+                progress=lambda *args: self.after(0, self.upgrade_view.show_progress, *args)
+            )
+        except Exception as e:
+            # 任何异常 (创建目录失败、回填步骤出错、磁盘已满等) 都要报告，否则窗口会停在升级进度页
+            self.after(0, self._on_initialize_failed, e)
+            return
+        self.after(0, self._on_initialized, db)
+
+    def _on_initialize_failed(self, error):
+        messagebox.showerror("数据库升级失败", str(error))
+        self.destroy()
+
+    def _on_initialized(self, db):
+        """ 数据库就绪后启动后台任务并加载主视图 """
+        if not IS_ESBMC_MODE:
+            self.upgrade_view.destroy()
+        # 后台物理删除已删除 (墓碑) 的记录；保留期内的删除可以撤销
+        db.startPurgeWorker()
+        self.backup_service.start(BACKUP_INTERVAL)
 
         # 加载主视图
         main_view = MainView(self)
@@ -77,4 +123,7 @@ class App(BaseClass):
 if __name__ == "__main__":
     app = App()
     if not IS_ESBMC_MODE:
-        app.mainloop()
\ No newline at end of file
+        app.mainloop()
+        app.backup_service.stop()
+        # 退出前关闭连接池，触发 WAL 检查点
+        close_all_connections()
\ No newline at end of file
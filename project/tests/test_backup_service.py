@@ -0,0 +1,163 @@
+"""
+BackupService 在线备份测试
+
+测试策略：使用临时目录中的数据库与备份目录
+覆盖以下场景：
+1. 分步备份与进度回调，备份期间可以继续写入
+2. 备份轮换
+3. 校验与还原，还原前后变化的记录发布删除与新建事件，还原后清理线程与延迟写入继续运行
+4. 定时备份，最新备份已过期时启动后立即备份
+"""
+
+import pytest
+import sys
+import os
+import threading
+import time
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.database import LocalDatabase
+from logic.backup_service import BackupService
+from logic.record_events import RECORDS_CREATED, RECORDS_DELETED, event_bus_for
+
+
+@pytest.fixture
+def service(tmp_path):
+    """创建使用临时数据库的 BackupService"""
+    service = BackupService(backup_dir=str(tmp_path / "backups"), keep=2, pages=4, sleep=0)
+    service.db = LocalDatabase(str(tmp_path / "app.db"))
+    service.db.initialize_database()
+    service.db.saveMany([
+        {"type": "支出", "amount": i + 1, "date": "2025-03-01", "note": "x" * 200} for i in range(300)
+    ])
+    yield service
+    service.stop()
+    service.db.close()
+
+
+class TestBackup:
+    """备份"""
+
+    def test_backup_copies_all_records(self, service):
+        path = service.backup()
+        assert service.verify(path) == []
+        copy = LocalDatabase(path)
+        assert len(copy.fetchData({})) == 300
+        copy.close()
+
+    def test_backup_runs_in_steps(self, service):
+        steps = []
+        service.backup(progress=lambda remaining, total: steps.append(remaining))
+        assert len(steps) > 1
+        assert steps[-1] == 0
+
+    def test_writes_during_backup(self, service):
+        """备份的步间隙中其他线程可以写入"""
+        service.sleep = 0.005
+        errors = []
+
+        def writer():
+            db = LocalDatabase(service.db.db_path)
+            try:
+                for _ in range(5):
+                    db.saveData({"type": "收入", "amount": 1, "date": "2025-03-02"})
+            except Exception as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        service.backup()
+        thread.join()
+        assert errors == []
+
+    def test_rotation_keeps_newest(self, service):
+        paths = [service.run_once() for _ in range(3)]
+        assert service.list_backups() == [paths[2], paths[1]]
+        assert not os.path.exists(paths[0])
+
+
+class TestRestore:
+    """校验与还原"""
+
+    def test_restore_replaces_data(self, service):
+        path = service.backup()
+        service.db.saveData({"type": "收入", "amount": 5, "date": "2025-04-01"})
+        service.restore(path)
+        assert len(service.db.fetchData({})) == 300
+        assert service.db.checkMonthlyTotals() == []
+
+    def test_restore_publishes_changes(self, service):
+        path = service.backup()
+        added = service.db.saveData({"type": "收入", "amount": 5, "date": "2025-04-01"})
+        service.db.deleteData("1")
+        received = []
+        unsubscribe = event_bus_for(service.db).subscribe(lambda event: received.append((event.kind, event.ids)))
+        try:
+            service.restore(path)
+        finally:
+            unsubscribe()
+        assert received == [(RECORDS_DELETED, [added]), (RECORDS_CREATED, ["1"])]
+
+    def test_restore_restarts_purge_worker(self, service):
+        path = service.backup()
+        service.db.startPurgeWorker(interval=30, grace=5)
+        service.restore(path)
+        purger = service.db.purgeWorker()
+        assert purger is not None
+        assert (purger.interval, purger.grace) == (30, 5)
+        service.db.stopPurgeWorker()
+
+    def test_restore_keeps_write_behind(self, service):
+        path = service.backup()
+        service.db.enableWriteBehind(flush_interval=0.2, max_batch=10)
+        service.restore(path)
+        writer = service.db._writer()
+        assert writer is not None
+        assert (writer.flush_interval, writer.max_batch) == (0.2, 10)
+        service.db.saveData({"type": "收入", "amount": 5, "date": "2025-04-01"})
+        assert len(service.db.fetchData({})) == 301
+
+    def test_verify_detects_corrupt_file(self, service, tmp_path):
+        bad = tmp_path / "bad.db"
+        bad.write_bytes(b"not a database" * 100)
+        assert service.verify(str(bad)) != []
+
+    def test_restore_rejects_invalid_backup(self, service, tmp_path):
+        with pytest.raises(ValueError):
+            service.restore(str(tmp_path / "missing.db"))
+        assert len(service.db.fetchData({})) == 300
+
+
+class TestSchedule:
+    """定时备份"""
+
+    def test_scheduled_backups(self, service):
+        service.start(interval=0.05)
+        deadline = time.monotonic() + 5
+        while len(service.list_backups()) < 2 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        service.stop()
+        assert len(service.list_backups()) == 2
+
+    def test_stale_backup_runs_on_start(self, service):
+        stale = service.backup()
+        os.utime(stale, (time.time() - 7200, time.time() - 7200))
+        service.start(interval=3600)
+        deadline = time.monotonic() + 5
+        while len(service.list_backups()) < 2 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        service.stop()
+        assert len(service.list_backups()) == 2
+
+    def test_recent_backup_not_repeated_on_start(self, service):
+        service.backup()
+        service.start(interval=3600)
+        time.sleep(0.1)
+        service.stop()
+        assert len(service.list_backups()) == 1
+
+    def test_invalid_interval(self, service):
+        with pytest.raises(ValueError):
+            service.start(interval=0)
@@ -0,0 +1,437 @@
+"""
+LocalDatabase 单元测试
+
+测试策略：使用临时 SQLite 文件进行真实读写
+覆盖以下场景：
+1. 表结构与索引创建
+2. saveData / fetchData / deleteData 读写闭环
+3. EXPLAIN QUERY PLAN 检查 QueryService 与 ReportGenerator 的查询命中索引
+"""
+
+import pytest
+import sys
+import os
+import sqlite3
+import threading
+from datetime import date
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.database import LocalDatabase, MONTHLY_TOTALS_SQL
+from data.photo_store import file_sha256
+from data.query_builder import build_select
+
+
+@pytest.fixture
+def db(tmp_path):
+    """创建已初始化的临时数据库"""
+    database = LocalDatabase(str(tmp_path / "app.db"))
+    database.initialize_database()
+    yield database
+    database.close()
+
+
+def _uses_index(plan, index_name):
+    return any(index_name in detail for detail in plan)
+
+
+def _has_full_scan(plan, table="records"):
+    return any(
+        detail.startswith(f"SCAN {table}") and "INDEX" not in detail
+        for detail in plan
+    )
+
+
+class TestDatabaseSchema:
+    """表结构测试类"""
+
+    def test_tables_created(self, db):
+        """测试1: 创建 records/tags/record_tags/photos/reminders 表"""
+        conn = db._get_connection()
+        names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert {"records", "tags", "record_tags", "photos", "reminders"} <= names
+
+    def test_initialize_is_idempotent(self, db):
+        """测试2: 重复初始化不报错"""
+        db.initialize_database()
+
+
+class TestDatabaseConnectionPool:
+    """连接池测试类"""
+
+    def test_connection_reused_within_thread(self, db):
+        """测试: 同一线程内多个 LocalDatabase 实例共享连接"""
+        other = LocalDatabase(db.db_path)
+        assert db._get_connection() is other._get_connection()
+
+    def test_connection_per_thread(self, db):
+        """测试: 不同线程使用各自的连接"""
+        result = {}
+        worker = threading.Thread(target=lambda: result.setdefault("conn", db._get_connection()))
+        worker.start()
+        worker.join()
+        assert result["conn"] is not db._get_connection()
+
+    def test_pragmas_applied(self, db):
+        """测试: 连接创建时设置 WAL 与 synchronous=NORMAL"""
+        conn = db._get_connection()
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+        assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+
+
+class TestDatabaseReadWrite:
+    """读写闭环测试类"""
+
+    def test_save_and_fetch(self, db):
+        """测试3: 保存后可查询"""
+        record_id = db.saveData({"type": "支出", "amount": 50.0, "date": date(2025, 10, 31), "note": "午餐"})
+        rows = db.fetchData({})
+        assert rows == [{"id": record_id, "type": "支出", "amount": 50.0, "date": "2025-10-31", "note": "午餐"}]
+
+    def test_fetch_by_type_and_month(self, db):
+        """测试4: 按类型与月份筛选"""
+        db.saveData({"type": "支出", "amount": 50.0, "date": "2025-10-31"})
+        db.saveData({"type": "收入", "amount": 1000.0, "date": "2025-10-30"})
+        db.saveData({"type": "支出", "amount": 20.0, "date": "2025-11-01"})
+        assert len(db.fetchData({"type": "支出"})) == 2
+        assert len(db.fetchData({"date": "2025-10"})) == 2
+        assert len(db.fetchData({"type": "支出", "date": "2025-10"})) == 1
+
+    def test_fetch_by_tag(self, db):
+        """测试5: 按标签筛选"""
+        record_id = db.saveData({"type": "支出", "amount": 30.0, "date": "2025-10-01", "tags": ["餐饮", " "]})
+        db.saveData({"type": "支出", "amount": 40.0, "date": "2025-10-02", "tags": ["交通"]})
+        rows = db.fetchData({"tag": "餐饮"})
+        assert [r["id"] for r in rows] == [record_id]
+
+    def test_unknown_criteria_raises_error(self, db):
+        """测试6: 不支持的查询条件抛出 ValueError"""
+        with pytest.raises(ValueError):
+            db.fetchData({"unknown": "x"})
+
+    def test_delete(self, db):
+        """测试7: 删除记录并级联删除标签关联"""
+        record_id = db.saveData({"type": "支出", "amount": 30.0, "date": "2025-10-01", "tags": ["餐饮"]})
+        assert db.deleteData(record_id) is True
+        assert db.deleteData(record_id) is False
+        assert db.fetchData({"tag": "餐饮"}) == []
+
+
+class TestWriteBehind:
+    """延迟写入队列测试类"""
+
+    def test_async_saves_are_grouped_and_flushed(self, db):
+        """测试: 并发写入合并提交，flush 之后全部可见"""
+        writer = db.enableWriteBehind(flush_interval=0.5, max_batch=1000)
+        assert db.enableWriteBehind() is writer
+        futures = [
+            db.saveDataAsync({"type": "支出", "amount": float(i + 1), "date": "2025-03-01"})
+            for i in range(50)
+        ]
+        db.flush()
+        assert all(f.done() for f in futures)
+        ids = [f.result() for f in futures]
+        assert len(set(ids)) == 50
+        assert len(db.fetchData({})) == 50
+
+    def test_sync_api_uses_writer(self, db):
+        """测试: 开启后 saveData/deleteData 通过写线程执行"""
+        db.enableWriteBehind(flush_interval=0.01)
+        record_id = LocalDatabase(db.db_path).saveData({"type": "收入", "amount": 5.0, "date": "2025-03-02"})
+        assert db.deleteData(record_id) is True
+        assert db.fetchData({}) == []
+
+    def test_failed_write_does_not_fail_batch(self, db):
+        """测试: 同一批中出错的写入单独失败，其余写入成功"""
+        db.enableWriteBehind(flush_interval=0.5)
+        good = db.saveDataAsync({"type": "支出", "amount": 1.0, "date": "2025-03-01"})
+        bad = db.saveDataAsync({"type": "支出", "amount": None, "date": "2025-03-01"})
+        db.flush()
+        assert good.result()
+        assert isinstance(bad.exception(), sqlite3.IntegrityError)
+        assert len(db.fetchData({})) == 1
+
+    def test_without_write_behind_returns_completed_future(self, db):
+        """测试: 未开启延迟写入时同步写入"""
+        future = db.saveDataAsync({"type": "支出", "amount": 1.0, "date": "2025-03-01"})
+        assert future.done()
+        db.flush()
+
+
+class TestDatabaseSaveMany:
+    """批量写入测试类"""
+
+    def test_save_many_returns_ids_in_order(self, db):
+        """测试: 批量写入按输入顺序返回 ID，且跨多个分块"""
+        existing = db.saveData({"type": "收入", "amount": 1.0, "date": "2025-01-01"})
+        rows = [
+            {"type": "支出", "amount": float(i + 1), "date": date(2025, 2, 1), "tags": ["导入"]}
+            for i in range(7)
+        ]
+        ids = db.saveMany(rows, chunk_size=3)
+        assert len(ids) == 7
+        assert existing not in ids
+        fetched = {r["id"]: r["amount"] for r in db.fetchData({"tag": "导入"})}
+        assert [fetched[i] for i in ids] == [float(i + 1) for i in range(7)]
+
+    def test_save_many_rolls_back_on_error(self, db):
+        """测试: 写入失败时整个事务回滚"""
+        with pytest.raises(KeyError):
+            db.saveMany([{"type": "支出", "amount": 1.0, "date": "2025-02-01"}, {"type": "支出"}])
+        assert db.fetchData({}) == []
+
+    def test_save_many_invalid_chunk_size(self, db):
+        """测试: chunk_size 必须为正数"""
+        with pytest.raises(ValueError):
+            db.saveMany([], chunk_size=0)
+
+
+class TestDatabaseStreaming:
+    """流式读取与键集分页测试类"""
+
+    @pytest.fixture
+    def filled_db(self, db):
+        db.saveMany([
+            {"type": "支出" if i % 2 else "收入", "amount": float(i + 1), "date": date(2025, 1, 1 + i % 5)}
+            for i in range(23)
+        ])
+        return db
+
+    def test_iter_data_matches_fetch_data(self, filled_db):
+        """测试: iterData 与 fetchData 结果一致"""
+        assert list(filled_db.iterData({}, batch_size=4)) == filled_db.fetchData({})
+
+    def test_fetch_page_walks_all_rows(self, filled_db):
+        """测试: 依次翻页可以不重不漏地遍历所有记录"""
+        for query in ({}, {"type": "支出"}):
+            expected = [r["id"] for r in filled_db.fetchData(query)]
+            seen, cursor = [], None
+            while True:
+                rows, cursor = filled_db.fetchPage(query, after=cursor, limit=5)
+                seen.extend(r["id"] for r in rows)
+                if cursor is None:
+                    break
+            assert seen == expected
+
+    @pytest.mark.parametrize("query, index_name", [
+        ({}, "idx_records_date"),
+        ({"type": "支出"}, "idx_records_type_date"),
+    ])
+    def test_keyset_page_uses_index_without_sort(self, db, query, index_name):
+        """测试: 键集分页直接按索引顺序读取，无需排序"""
+        sql, params = build_select(query, after=("2025-01-03", 10), limit=5)
+        plan = db.explainQueryPlan(sql, params)
+        assert _uses_index(plan, index_name)
+        assert not any("TEMP B-TREE" in detail for detail in plan)
+
+
+class TestDatabaseCleanup:
+    """数据保留期限清理测试类"""
+
+    def test_cleanup_deletes_expired_records_in_batches(self, db, tmp_path):
+        """测试: 分批删除过期记录、图片文件与孤立标签"""
+        photo = tmp_path / "old.jpg"
+        photo.write_bytes(b"jpg")
+        db.saveMany([
+            {"type": "支出", "amount": 1.0, "date": "2024-01-01", "tags": ["旧"], "photos": [str(photo)]}
+            for _ in range(5)
+        ])
+        keep_id = db.saveData({"type": "支出", "amount": 2.0, "date": "2025-06-01", "tags": ["新"]})
+
+        deleted = db.run_cleanup_job("保存一年", batch_size=2, today=date(2025, 6, 30))
+
+        assert deleted == 5
+        assert [r["id"] for r in db.fetchData({})] == [keep_id]
+        # 图片存储中的副本按引用计数回收，用户的原文件保留
+        assert photo.exists()
+        assert not db.photoStore().exists(file_sha256(str(photo))[0])
+        conn = db._get_connection()
+        assert [row[0] for row in conn.execute("SELECT name FROM tags")] == ["新"]
+        assert conn.execute("SELECT COUNT(*) FROM pending_photo_deletes").fetchone()[0] == 0
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+    def test_cleanup_resumes_pending_photo_deletes(self, db, tmp_path):
+        """测试: 中断后遗留的待删图片在下次运行时删除"""
+        photo = tmp_path / "left.jpg"
+        photo.write_bytes(b"jpg")
+        conn = db._get_connection()
+        with conn:
+            conn.execute("INSERT INTO pending_photo_deletes (file_path) VALUES (?)", (str(photo),))
+        assert db.run_cleanup_job("永久保存") == 0
+        assert not photo.exists()
+
+    def test_cleanup_invalid_period(self, db):
+        """测试: 无效的保留期限抛出 ValueError"""
+        with pytest.raises(ValueError):
+            db.run_cleanup_job("保存十年")
+
+
+class TestMonthlyTotals:
+    """月度汇总表测试类"""
+
+    def test_rollup_follows_writes(self, db):
+        """测试: 写入、修改、删除与批量写入后汇总表保持一致"""
+        a = db.saveData({"type": "支出", "amount": 1050, "date": "2025-10-01", "category": "餐饮"})
+        db.saveData({"type": "支出", "amount": 450, "date": "2025-10-20", "category": "餐饮"})
+        db.saveMany([{"type": "收入", "amount": 10000, "date": "2025-10-05"}] * 3)
+        assert sorted(db.fetchMonthlyTotals("2025-10")) == [("支出", "餐饮", 1500), ("收入", "其他", 30000)]
+
+        conn = db._get_connection()
+        with conn:
+            conn.execute("UPDATE records SET date = '2025-11-02' WHERE record_id = ?", (a,))
+        db.deleteData(db.fetchData({"type": "收入"})[0]["id"])
+        assert sorted(db.fetchMonthlyTotals("2025-10")) == [("支出", "餐饮", 450), ("收入", "其他", 20000)]
+        assert db.fetchMonthlyTotals("2025-11") == [("支出", "餐饮", 1050)]
+        assert db.checkMonthlyTotals() == []
+
+    def test_rollup_rows_removed_when_empty(self, db):
+        """测试: 某分类记录全部删除后汇总行被移除"""
+        record_id = db.saveData({"type": "支出", "amount": 1.0, "date": "2025-10-01"})
+        db.deleteData(record_id)
+        assert db.fetchMonthlyTotals("2025-10") == []
+
+    def test_rollup_follows_cleanup(self, db):
+        """测试: 数据清理同步更新汇总表"""
+        db.saveMany([{"type": "支出", "amount": 1.0, "date": "2020-01-01"}] * 3)
+        db.run_cleanup_job("保存半年", batch_size=2, today=date(2025, 1, 1))
+        assert db.fetchMonthlyTotals("2020-01") == []
+
+    def test_check_and_rebuild(self, db):
+        """测试: 一致性检查发现偏差，重建后恢复一致"""
+        db.saveData({"type": "支出", "amount": 8.0, "date": "2025-10-01"})
+        conn = db._get_connection()
+        with conn:
+            conn.execute("UPDATE monthly_totals SET total = 99")
+            conn.execute("INSERT INTO monthly_totals VALUES ('2024-01', '收入', '其他', 1, 1)")
+        assert db.checkMonthlyTotals() == [("2024-01", "收入", "其他"), ("2025-10", "支出", "其他")]
+        db.rebuildMonthlyTotals()
+        assert db.checkMonthlyTotals() == []
+
+
+class TestFullTextSearch:
+    """全文检索测试类"""
+
+    @pytest.fixture
+    def search_db(self, db):
+        db.saveData({"type": "支出", "amount": 30.0, "date": "2025-10-01", "note": "星巴克咖啡", "merchant": "Starbucks"})
+        db.saveData({"type": "支出", "amount": 18.0, "date": "2025-10-02", "note": "楼下奶茶", "tags": ["下午茶"]})
+        db.saveMany([{"type": "支出", "amount": 12.0, "date": "2025-10-03", "note": "午餐", "tags": ["工作餐"]}])
+        return db
+
+    @pytest.mark.parametrize("term, notes", [
+        ("咖啡", ["星巴克咖啡"]),
+        ("巴克咖", ["星巴克咖啡"]),
+        ("star", ["星巴克咖啡"]),
+        ("茶", ["楼下奶茶"]),
+        ("下午茶", ["楼下奶茶"]),
+        ("工作", ["午餐"]),
+        ("咖啡 starbucks", ["星巴克咖啡"]),
+        ("火锅", []),
+    ])
+    def test_search_matches_chinese_fragments(self, search_db, term, notes):
+        """测试: 中文片段、单字、英文前缀与标签均可检索"""
+        assert [r["note"] for r in search_db.searchText(term)] == notes
+
+    def test_search_snippet_highlight(self, search_db):
+        """测试: 结果附带高亮摘要"""
+        result = search_db.searchText("咖啡")[0]
+        assert "【咖啡】" in result["snippet"]
+
+    def test_search_index_follows_updates_and_deletes(self, search_db):
+        """测试: 修改备注、删除标签与删除记录后索引同步"""
+        record_id = search_db.searchText("咖啡")[0]["id"]
+        conn = search_db._get_connection()
+        with conn:
+            conn.execute("UPDATE records SET note = '拿铁' WHERE record_id = ?", (record_id,))
+            conn.execute("DELETE FROM record_tags WHERE record_id IN (SELECT record_id FROM records WHERE note = '楼下奶茶')")
+        assert search_db.searchText("咖啡") == []
+        assert [r["id"] for r in search_db.searchText("拿铁")] == [record_id]
+        assert search_db.searchText("下午茶") == []
+        search_db.deleteData(record_id)
+        assert search_db.searchText("拿铁") == []
+
+    def test_keyword_filter_combines_with_other_criteria(self, search_db):
+        """测试: keyword 条件可与其他条件组合"""
+        assert [r["note"] for r in search_db.fetchData({"keyword": "茶", "date": "2025-10-02"})] == ["楼下奶茶"]
+        assert search_db.fetchData({"keyword": "茶", "date": "2025-10-01"}) == []
+
+    def test_rebuild_search_index(self, search_db):
+        """测试: 重建索引后检索结果不变"""
+        search_db.rebuildSearchIndex()
+        assert [r["note"] for r in search_db.searchText("工作")] == ["午餐"]
+
+    def test_invalid_keyword(self, search_db):
+        """测试: 没有可检索字符的关键词抛出 ValueError"""
+        with pytest.raises(ValueError):
+            search_db.searchText("  ,, ")
+
+
+class TestQueryBuilder:
+    """参数化查询构建测试类"""
+
+    def test_sql_text_is_stable(self):
+        """测试: 相同条件组合不论顺序都生成同一 SQL 文本"""
+        sql1, params1 = build_select({"type": "支出", "date": "2025-10"})
+        sql2, params2 = build_select({"date": "2025-10", "type": "支出"})
+        assert sql1 is sql2
+        assert params1 == params2 == ["支出", "2025-10-01", "2025-11-01"]
+
+    def test_values_are_bound_not_inlined(self):
+        """测试: 用户输入只作为参数绑定"""
+        sql, params = build_select({"keyword": "' OR 1=1 --"})
+        assert "OR 1=1" not in sql
+        assert params == ['grams : "or"* AND grams : "1"* AND grams : "1"*']
+
+    def test_unknown_criteria_raises_error(self):
+        """测试: 不支持的条件抛出 ValueError"""
+        with pytest.raises(ValueError):
+            build_select({"note; DROP TABLE records": "x"})
+
+    @pytest.mark.parametrize("value, bounds", [
+        ("2025-12", ("2025-12-01", "2026-01-01")),
+        ("2025", ("2025-01-01", "2026-01-01")),
+        (date(2025, 2, 28), ("2025-02-28", "2025-03-01")),
+    ])
+    def test_date_bounds(self, value, bounds):
+        """测试: 日期条件转换为半开区间"""
+        assert build_select({"date": value})[1] == list(bounds)
+
+    def test_fetch_by_note_is_parameterized(self, db):
+        """测试: fetchByNote 安全处理引号"""
+        db.saveData({"type": "支出", "amount": 1.0, "date": "2025-01-01", "note": "it's"})
+        assert len(db.fetchByNote("it's")) == 1
+        assert db.fetchByNote("' OR '1'='1") == []
+
+
+class TestDatabaseQueryPlan:
+    """EXPLAIN QUERY PLAN 索引命中测试类"""
+
+    @pytest.mark.parametrize("query, index_name", [
+        ({"type": "收入"}, "idx_records_type_date"),
+        ({"type": "支出", "date": "2025-10"}, "idx_records_"),
+        ({"date": "2025-10-31"}, "idx_records_date"),
+    ])
+    def test_query_service_filters_use_index(self, db, query, index_name):
+        """测试8: QueryService 的筛选条件命中索引"""
+        sql, params = build_select(query)
+        plan = db.explainQueryPlan(sql, params)
+        assert _uses_index(plan, index_name)
+        assert not _has_full_scan(plan)
+
+    def test_tag_filter_uses_tag_index(self, db):
+        """测试9: 标签筛选通过 tag_id -> record_id 索引"""
+        sql, params = build_select({"tag": 1})
+        plan = db.explainQueryPlan(sql, params)
+        assert _uses_index(plan, "idx_record_tags_tag")
+
+    def test_monthly_report_reads_rollup_by_primary_key(self, db):
+        """测试10: ReportGenerator 的月度汇总按主键读取汇总表"""
+        plan = db.explainQueryPlan(MONTHLY_TOTALS_SQL, ["2025-10"])
+        assert _uses_index(plan, "SEARCH monthly_totals USING PRIMARY KEY (month=?)")
+        assert not _has_full_scan(plan)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
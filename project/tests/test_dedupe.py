@@ -0,0 +1,165 @@
+"""
+记录指纹去重测试
+
+测试策略：使用临时 SQLite 文件与临时账单 CSV
+覆盖以下场景：
+1. 指纹对空白、大小写不敏感，对金额、日期、来源敏感
+2. createRecord(dedupe=True) 幂等，返回已有记录
+3. createRecords 批量去重 (已存在与批内重复)
+4. 重复导入同一账单文件不产生重复记录
+5. 删除记录时指纹一并删除
+6. 指纹在写事务中检查：并发写入、延迟写入与按年分区存储都不产生重复，已有指纹不被改指向新记录
+"""
+
+import pytest
+import sys
+import os
+import threading
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.database import LocalDatabase
+from data.fingerprint import record_fingerprint
+from data.partitions import PartitionedDatabase
+from logic.import_service import ImportService
+from logic.record_manager import RecordManager
+
+LUNCH = {"type": "支出", "amount": 3550, "date": "2025-03-01", "merchant": "某某餐厅", "note": "午餐"}
+
+
+@pytest.fixture
+def manager(tmp_path):
+    """使用临时数据库的 RecordManager"""
+    manager = RecordManager()
+    manager.db = LocalDatabase(str(tmp_path / "app.db"))
+    manager.db.initialize_database()
+    yield manager
+    manager.db.close()
+
+
+class TestFingerprint:
+    """指纹计算"""
+
+    def test_normalized_text(self):
+        assert record_fingerprint(LUNCH) == record_fingerprint(dict(LUNCH, merchant="  某某餐厅 ", note="午餐"))
+        assert record_fingerprint(dict(LUNCH, note="Lunch  Set")) == record_fingerprint(dict(LUNCH, note="lunch set"))
+
+    @pytest.mark.parametrize("change", [
+        {"amount": 3551},
+        {"date": "2025-03-02"},
+        {"type": "收入"},
+        {"note": "晚餐"},
+    ])
+    def test_content_changes(self, change):
+        assert record_fingerprint(LUNCH) != record_fingerprint(dict(LUNCH, **change))
+
+    def test_source(self):
+        assert record_fingerprint(LUNCH, "abc:2") != record_fingerprint(LUNCH, "abc:3")
+        assert record_fingerprint(LUNCH, "abc:2") == record_fingerprint(LUNCH, "abc:2")
+
+
+class TestCreateRecordDedupe:
+    """RecordManager 去重写入"""
+
+    def test_create_record_idempotent(self, manager):
+        first = manager.createRecord(dict(LUNCH, amount=35.5), dedupe=True, source="img")
+        again = manager.createRecord(dict(LUNCH, amount=35.5), dedupe=True, source="img")
+        assert again.record_id == first.record_id
+        assert len(manager.db.fetchData({})) == 1
+        # 不去重时照常写入
+        manager.createRecord(dict(LUNCH, amount=35.5))
+        assert len(manager.db.fetchData({})) == 2
+
+    def test_create_records_batch(self, manager):
+        existing = manager.createRecord(dict(LUNCH, amount=35.5), dedupe=True)
+        result = manager.createRecords([
+            dict(LUNCH, amount=35.5),
+            dict(LUNCH, amount=1, note="早餐"),
+            dict(LUNCH, amount=1, note="早餐"),
+            dict(LUNCH, amount="abc"),
+        ], dedupe=True)
+        assert len(result["ids"]) == 1
+        assert result["duplicates"] == {0: existing.record_id, 2: result["ids"][0]}
+        assert list(result["errors"]) == [3]
+        assert len(manager.db.fetchData({})) == 2
+
+    def test_delete_removes_fingerprint(self, manager):
+        record = manager.createRecord(dict(LUNCH, amount=35.5), dedupe=True)
+        fingerprint = record_fingerprint(dict(LUNCH))
+        assert manager.db.findFingerprints([fingerprint]) == {fingerprint: record.record_id}
+        manager.deleteRecord(record.record_id)
+        assert manager.db.findFingerprints([fingerprint]) == {}
+        # 指纹已删除，同样的数据可以重新写入
+        manager.createRecord(dict(LUNCH, amount=35.5), dedupe=True)
+        assert len(manager.db.fetchData({})) == 1
+
+
+class TestTransactionalDedupe:
+    """指纹的查找与插入在同一写事务中"""
+
+    def test_concurrent_writers(self, manager):
+        rows = [dict(LUNCH, amount=i + 1) for i in range(50)]
+        barrier = threading.Barrier(4)
+        results = []
+
+        def worker():
+            other = RecordManager()
+            other.db = LocalDatabase(manager.db.db_path)
+            barrier.wait()
+            results.append(other.createRecords(rows, dedupe=True))
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sum(len(result["ids"]) for result in results) == 50
+        assert len(manager.db.fetchData({})) == 50
+
+    def test_existing_fingerprint_not_repointed(self, manager):
+        first = manager.createRecord(dict(LUNCH, amount=35.5), dedupe=True)
+        fingerprint = record_fingerprint(dict(LUNCH))
+        # 绕过去重检查直接写入同一指纹
+        manager.db.saveMany([dict(LUNCH, fingerprint=fingerprint)])
+        assert manager.db.findFingerprints([fingerprint]) == {fingerprint: first.record_id}
+
+    def test_write_behind(self, manager):
+        manager.db.enableWriteBehind()
+        first = manager.createRecord(dict(LUNCH, amount=35.5), dedupe=True)
+        again = manager.createRecord(dict(LUNCH, amount=35.5), dedupe=True)
+        assert again.record_id == first.record_id
+        manager.db.flush()
+        assert len(manager.db.fetchData({})) == 1
+
+    def test_partitions(self, tmp_path):
+        manager = RecordManager()
+        manager.db = PartitionedDatabase(str(tmp_path / "app.db"))
+        manager.db.initialize_database()
+        rows = [dict(LUNCH, amount=1, date="2024-12-31"), dict(LUNCH, amount=1), dict(LUNCH, amount=1)]
+        result = manager.createRecords(rows, dedupe=True)
+        assert result["duplicates"] == {2: result["ids"][1]}
+        again = manager.createRecords(rows[:2], dedupe=True)
+        assert again["ids"] == [] and again["duplicates"] == {0: result["ids"][0], 1: result["ids"][1]}
+        assert manager.createRecord(rows[0], dedupe=True).record_id == result["ids"][0]
+        assert len(manager.db.fetchData({})) == 2
+        manager.db.close()
+
+
+class TestImportDedupe:
+    """重复导入账单"""
+
+    def test_reimport_same_file(self, manager, tmp_path):
+        lines = ["交易日期,交易金额,对方户名,摘要"]
+        lines += [f"2025-03-{i % 28 + 1:02d},-{i % 5 + 1}.00,某某餐厅,午餐" for i in range(30)]
+        path = tmp_path / "bank.csv"
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        service = ImportService(batch_size=7)
+        service.manager = manager
+
+        first = service.import_file(str(path))
+        again = service.import_file(str(path))
+
+        assert (first.imported, first.duplicates) == (30, 0)
+        assert (again.imported, again.duplicates) == (0, 30)
+        assert len(manager.db.fetchData({})) == 30
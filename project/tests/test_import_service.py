@@ -0,0 +1,147 @@
+"""
+ImportService 账单导入测试
+
+测试策略：在临时目录生成账单 CSV，导入到临时数据库
+覆盖以下场景：
+1. 微信 (UTF-8，表头前有说明行)、支付宝 (GBK)、银行 (按金额正负区分收支) 三种格式
+2. 不计收支行与末尾说明行跳过
+3. 逐行错误报告 (文件行号)，错误行不影响其他行
+4. 分批写入与进度回调
+5. 日期解析缓存
+"""
+
+import pytest
+import sys
+import os
+from datetime import date
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.database import LocalDatabase
+from logic.import_service import ImportService, parse_statement_date
+
+WECHAT = """微信支付账单明细
+微信昵称：[某某]
+起始时间：[2025-03-01 00:00:00] 终止时间：[2025-03-31 23:59:59]
+----------------------微信支付账单明细列表--------------------
+交易时间,交易类型,交易对方,商品,收/支,金额(元),支付方式,当前状态,交易单号,商户单号,备注
+2025-03-01 12:30:00,商户消费,某某餐厅,午餐,支出,¥35.50,零钱,支付成功,1,1,/
+2025-03-02 08:00:00,转账,张三,/,收入,¥200.00,零钱,已收钱,2,2,/
+2025-03-03 09:00:00,零钱提现,微信,/,/,¥100.00,零钱,提现已到账,3,3,/
+2025-03-04 18:00:00,商户消费,滴滴出行,打车,支出,¥abc,零钱,支付成功,4,4,/
+"""
+
+ALIPAY = """支付宝交易记录明细查询
+账号:[example@example.com]
+交易号,商户订单号,交易创建时间,付款时间,最近修改时间,交易来源地,类型,交易对方,商品名称,金额（元）,收/支,交易状态
+1,1,2025-03-05 10:00:00,2025-03-05 10:00:01,2025-03-05 10:00:01,其他,即时到账交易,某某超市,日用品,"1,024.00",支出,交易成功
+2,2,2025/3/6 11:00,2025/3/6 11:00,2025/3/6 11:00,其他,即时到账交易,某某公司,退款,12.30,不计收支,交易成功
+------------------------------------------------------------------------------------
+共2笔记录
+"""
+
+BANK = """交易日期,交易金额,余额,对方户名,摘要
+20250310,-88.80,1000.00,国家电网,电费
+20250311,5000.00,6000.00,某某公司,工资
+2025-02-30,-1.00,5999.00,某某,错误日期
+"""
+
+
+@pytest.fixture
+def service(tmp_path):
+    """使用临时数据库的 ImportService"""
+    service = ImportService(batch_size=2)
+    service.manager.db = LocalDatabase(str(tmp_path / "app.db"))
+    service.manager.db.initialize_database()
+    yield service
+    service.manager.db.close()
+
+
+def _write(tmp_path, name, text, encoding="utf-8"):
+    path = tmp_path / name
+    path.write_bytes(text.encode(encoding))
+    return str(path)
+
+
+class TestStatementFormats:
+    """三种账单格式"""
+
+    def test_wechat(self, service, tmp_path):
+        report = service.import_file(_write(tmp_path, "wechat.csv", WECHAT, "utf-8-sig"))
+        assert report.format_name == "微信支付"
+        assert (report.imported, report.skipped) == (2, 1)
+        assert report.errors == [(9, "金额必须是数字: abc")]
+        rows = service.manager.db.fetchData({})
+        assert [(r["type"], r["amount"], r["date"], r["note"]) for r in rows] == [
+            ("收入", 20000, "2025-03-02", "张三"),
+            ("支出", 3550, "2025-03-01", "午餐"),
+        ]
+        assert ("支出", "餐饮", 3550) in service.manager.db.fetchMonthlyTotals("2025-03")
+
+    def test_alipay_gbk(self, service, tmp_path):
+        report = service.import_file(_write(tmp_path, "alipay.csv", ALIPAY, "gbk"))
+        assert report.format_name == "支付宝"
+        # 不计收支 1 行，末尾分隔线与 "共2笔记录" 2 行
+        assert (report.imported, report.skipped, report.errors) == (1, 3, [])
+        assert service.manager.db.fetchMonthlyTotals("2025-03") == [("支出", "购物", 102400)]
+
+    def test_bank_signed_amounts(self, service, tmp_path):
+        report = service.import_file(_write(tmp_path, "bank.csv", BANK))
+        assert report.format_name == "银行"
+        assert report.imported == 2
+        assert report.errors == [(4, "日期格式无效: 2025-02-30")]
+        rows = {r["note"]: r for r in service.manager.db.fetchData({})}
+        assert (rows["电费"]["type"], rows["电费"]["amount"]) == ("支出", 8880)
+        assert (rows["工资"]["type"], rows["工资"]["amount"]) == ("收入", 500000)
+
+    def test_unknown_format(self, service, tmp_path):
+        with pytest.raises(ValueError):
+            service.import_file(_write(tmp_path, "other.csv", "a,b,c\n1,2,3\n"))
+
+
+class TestStreaming:
+    """分批写入与进度"""
+
+    def test_batches_and_progress(self, service, tmp_path):
+        lines = ["交易日期,交易金额,对方户名,摘要"]
+        lines += [f"2025-03-{i % 28 + 1:02d},-{i + 1}.00,某某餐厅,午餐{i}" for i in range(9)]
+        path = _write(tmp_path, "bank.csv", "\n".join(lines) + "\n")
+        calls = []
+        batches = []
+        create = service.manager.createRecords
+        service.manager.createRecords = lambda rows, chunk_size=500, **kwargs: batches.append(len(rows)) or create(rows, chunk_size, **kwargs)
+
+        report = service.import_file(path, progress=lambda *args: calls.append(args))
+
+        assert report.imported == 9
+        assert batches == [2, 2, 2, 2, 1]
+        assert calls[-1] == (9, os.path.getsize(path), os.path.getsize(path))
+        assert [done for done, _, _ in calls] == [2, 4, 6, 8, 9]
+        assert service.manager.db.sumAmount({}) == sum(range(1, 10)) * 100
+
+    def test_error_report_file(self, service, tmp_path):
+        report = service.import_file(_write(tmp_path, "bank.csv", BANK))
+        error_path = str(tmp_path / "errors.csv")
+        report.write_errors(error_path)
+        with open(error_path, encoding="utf-8-sig") as f:
+            assert f.read().splitlines() == ["行号,错误", "4,日期格式无效: 2025-02-30"]
+
+
+class TestParseDate:
+    """日期解析"""
+
+    @pytest.mark.parametrize("text, expected", [
+        ("2025-03-01", date(2025, 3, 1)),
+        ("2025/3/1 12:00", date(2025, 3, 1)),
+        ("20250301", date(2025, 3, 1)),
+        ("2025-03-01T08:00:00", date(2025, 3, 1)),
+    ])
+    def test_formats(self, text, expected):
+        assert parse_statement_date(text) == expected
+
+    def test_cached(self):
+        parse_statement_date.cache_clear()
+        parse_statement_date("2025-03-01 12:00:00")
+        parse_statement_date("2025-03-01 12:00:00")
+        assert parse_statement_date.cache_info().hits == 1
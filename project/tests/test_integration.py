@@ -65,13 +65,13 @@ class TestIntegrationRecordManagerDatabase:
         saved_data = integrated_manager.db.saveData.call_args[0][0]
         # 验证传递给数据库的数据
         assert saved_data["type"] == "收入"
-        assert saved_data["amount"] == 8000.0
+        assert saved_data["amount"] == 800000  # 分
         assert saved_data["date"] == date(2025, 12, 25)  # 日期被转换
         
         # 验证返回的 Record 对象
         assert record.record_id == "income_001"
         assert record.type == "收入"
-        assert record.amount == 8000.0
+        assert record.amount == 800000
         assert record.note == "年终奖金"
     
     def test_integration_create_and_save_expense_record(self, integrated_manager):
@@ -225,7 +225,7 @@ class TestIntegrationOCRToRecord:
         
         # Step 4: 验证完整流程
         assert record.type == "支出"
-        assert record.amount == 156.0
+        assert record.amount == 15600
         assert "沃尔玛超市" in record.note
         assert "购物" in record.note
     
@@ -255,7 +255,7 @@ class TestIntegrationOCRToRecord:
         }
         
         record = record_manager.createRecord(record_data)
-        assert record.amount == 200.0
+        assert record.amount == 20000
     
     def test_integration_ocr_restaurant_full_flow(self, ocr_service, record_manager):
         """
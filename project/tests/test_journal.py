@@ -0,0 +1,116 @@
+"""
+EventJournal 变更日志测试
+
+测试策略：使用临时目录中的日志文件 (RecordManager 写入日志与从日志恢复见 test_record_manager.py)
+覆盖以下场景：
+1. 追加写入与重放
+2. 后台压缩为快照后日志清空、状态不变，遗留的待压缩日志在打开时继续压缩
+3. 快照逐行写出，旧格式 (单个 JSON 对象) 的快照仍可读取并在压缩时改写
+4. 崩溃留下的不完整末行
+"""
+
+import pytest
+import sys
+import os
+import json
+from datetime import date
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.journal import EventJournal, record_payload
+
+RECORD = record_payload({"type": "支出", "amount": 12.5, "date": date(2025, 3, 1), "note": "午餐"})
+
+
+@pytest.fixture
+def journal(tmp_path):
+    """创建临时日志"""
+    j = EventJournal(str(tmp_path / "app.journal"), compact_every=100)
+    yield j
+    j.close()
+
+
+class TestEventJournal:
+    """日志读写"""
+
+    def test_append_and_replay(self, journal):
+        journal.append("create", "1", record=RECORD)
+        journal.append("create", "2", record=RECORD)
+        journal.append("tag", "1", tag="餐饮")
+        journal.append("delete", "2")
+        state = journal.state()
+        assert list(state) == ["1"]
+        assert state["1"]["tags"] == ["餐饮"]
+        assert journal.seq == 4
+
+    def test_events_after_seq(self, journal):
+        journal.extend([("create", str(i), {"record": RECORD}) for i in range(5)])
+        assert [e["id"] for e in journal.events(after_seq=3)] == ["3", "4"]
+
+    def test_compaction_keeps_state(self, journal):
+        for i in range(150):
+            journal.append("create", str(i), record=RECORD)
+            if i % 2:
+                journal.append("delete", str(i))
+        # 累计 100 条事件时在后台压缩，日志只保留压缩之后的事件
+        journal.wait_compaction()
+        assert min(e["seq"] for e in journal.events()) > 100
+        assert os.path.exists(journal.snapshot_path)
+        assert sorted(journal.state(), key=int) == [str(i) for i in range(0, 150, 2)]
+        assert journal.seq == 225
+
+    def test_reopen_continues_sequence(self, journal):
+        journal.append("create", "1", record=RECORD)
+        journal.compact()
+        journal.append("create", "2", record=RECORD)
+        journal.close()
+        reopened = EventJournal(journal.path)
+        assert reopened.seq == 2
+        assert sorted(reopened.state()) == ["1", "2"]
+        reopened.close()
+
+    def test_leftover_rotation_compacted_on_open(self, journal):
+        journal.append("create", "1", record=RECORD)
+        journal.close()
+        # 模拟改名后、压缩完成前进程退出
+        os.replace(journal.path, journal.compacting_path)
+        reopened = EventJournal(journal.path)
+        reopened.append("create", "2", record=RECORD)
+        reopened.wait_compaction()
+        assert not os.path.exists(reopened.compacting_path)
+        assert sorted(reopened.state()) == ["1", "2"]
+        assert [e["id"] for e in reopened.events()] == ["2"]
+        reopened.close()
+
+    def test_snapshot_written_line_by_line(self, journal):
+        journal.extend([("create", str(i), {"record": RECORD}) for i in range(3)])
+        journal.append("delete", "1")
+        journal.compact()
+        with open(journal.snapshot_path, encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f]
+        assert lines[0] == {"seq": 4}
+        assert [entry["id"] for entry in lines[1:]] == ["0", "2"]
+
+    def test_legacy_snapshot(self, journal):
+        journal.close()
+        with open(journal.snapshot_path, "w", encoding="utf-8") as f:
+            json.dump({"seq": 5, "records": {"1": RECORD, "2": RECORD}}, f)
+        reopened = EventJournal(journal.path)
+        assert reopened.append("tag", "1", tag="餐饮") == 6
+        assert sorted(reopened.state()) == ["1", "2"]
+        reopened.compact()
+        assert reopened.state()["1"]["tags"] == ["餐饮"]
+        with open(reopened.snapshot_path, encoding="utf-8") as f:
+            assert json.loads(f.readline()) == {"seq": 6}
+        reopened.close()
+
+    def test_torn_last_line_dropped(self, journal):
+        journal.append("create", "1", record=RECORD)
+        journal.close()
+        with open(journal.path, "a", encoding="utf-8") as f:
+            f.write('{"seq": 2, "op": "cre')
+        reopened = EventJournal(journal.path)
+        reopened.append("delete", "1")
+        assert reopened.state() == {}
+        reopened.close()
@@ -0,0 +1,169 @@
+"""
+数据库结构迁移测试
+
+测试策略：使用临时数据库文件
+覆盖以下场景：
+1. 新数据库直接升级到最新版本
+2. 旧数据库 (只有 records 表、user_version = 0) 的分块回填
+3. 进度回调
+4. 回填中断后从游标处继续
+5. 版本 2 金额改为整数分时重建 records 表
+"""
+
+import pytest
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.database import LocalDatabase
+from data.migrations import MIGRATIONS, Backfill, Migration, SqlScript, migrate, schema_version
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+@pytest.fixture
+def db(tmp_path):
+    """创建临时数据库 (尚未初始化)"""
+    database = LocalDatabase(str(tmp_path / "app.db"))
+    yield database
+    database.close()
+
+
+def _create_legacy_records(db, count):
+    """模拟升级前的数据库：只有 records 表"""
+    conn = db._get_connection()
+    conn.execute(
+        "CREATE TABLE records (record_id INTEGER PRIMARY KEY, type TEXT NOT NULL, "
+        "amount REAL NOT NULL, date TEXT NOT NULL, note TEXT NOT NULL DEFAULT '', "
+        "merchant TEXT NOT NULL DEFAULT '', category TEXT NOT NULL DEFAULT '其他')"
+    )
+    with conn:
+        conn.executemany(
+            "INSERT INTO records (type, amount, date, note, category) VALUES (?, ?, ?, ?, ?)",
+            [("支出", 1.5, f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}", f"午餐 {i}", "餐饮")
+             for i in range(count)],
+        )
+
+
+class TestFreshDatabase:
+    """新数据库"""
+
+    def test_initialize_sets_latest_version(self, db):
+        assert db.initialize_database() == LATEST_VERSION
+        assert db.schemaVersion() == LATEST_VERSION
+
+    def test_initialize_twice_is_noop(self, db):
+        db.initialize_database()
+        calls = []
+        db.initialize_database(progress=lambda *args: calls.append(args))
+        assert calls == []
+
+    def test_progress_table_cleared(self, db):
+        db.initialize_database()
+        rows = db._get_connection().execute("SELECT COUNT(*) FROM migration_progress").fetchone()
+        assert rows[0] == 0
+
+
+class TestLegacyUpgrade:
+    """旧数据库升级"""
+
+    def test_backfills_monthly_totals(self, db):
+        _create_legacy_records(db, 100)
+        db.initialize_database()
+        assert db.checkMonthlyTotals() == []
+
+    def test_backfills_search_index(self, db):
+        _create_legacy_records(db, 100)
+        db.initialize_database()
+        assert len(db.searchText("午餐", limit=1000)) == 100
+
+    def test_backfill_reports_progress_in_chunks(self, db):
+        _create_legacy_records(db, 25)
+        calls = []
+        migrate(db._get_connection(), progress=lambda *args: calls.append(args), chunk_size=10)
+        search = [(done, total) for _, step, done, total in calls if step == "回填全文检索"]
+        assert search == [(0, 25), (10, 25), (20, 25), (25, 25), (25, 25)]
+        assert schema_version(db._get_connection()) == LATEST_VERSION
+
+
+class TestIntegerCents:
+    """版本 2：金额改为整数分"""
+
+    def test_amounts_converted_and_links_kept(self, db):
+        conn = db._get_connection()
+        migrate(conn, MIGRATIONS[:1])
+        with conn:
+            conn.execute(
+                "INSERT INTO records (record_id, type, amount, date, note) "
+                "VALUES (1, '支出', 12.35, '2025-03-01', '午餐'), (2, '支出', 0.1, '2025-03-02', '')"
+            )
+            conn.execute("INSERT INTO tags (tag_id, name) VALUES (1, '工作')")
+            conn.execute("INSERT INTO record_tags (record_id, tag_id) VALUES (1, 1)")
+            conn.execute("INSERT INTO photos (record_id, file_path) VALUES (1, 'a.jpg')")
+        db.initialize_database()
+
+        assert conn.execute("SELECT amount, typeof(amount) FROM records ORDER BY record_id").fetchall() == \
+            [(1235, "integer"), (10, "integer")]
+        # 替换表时外键级联没有删掉标签与图片
+        assert conn.execute("SELECT COUNT(*) FROM record_tags").fetchone()[0] == 1
+        assert conn.execute("SELECT COUNT(*) FROM photos").fetchone()[0] == 1
+        assert db.fetchMonthlyTotals("2025-03") == [("支出", "其他", 1245)]
+        assert [r["id"] for r in db.fetchData({"tag": "工作"})] == ["1"]
+        assert len(db.searchText("午餐")) == 1
+
+    def test_triggers_and_indexes_rebuilt(self, db):
+        db.initialize_database()
+        names = {row[0] for row in db._get_connection().execute("SELECT name FROM sqlite_master")}
+        assert {"trg_records_rollup_insert", "trg_records_fts_insert", "trg_record_tags_fts_insert",
+                "idx_records_date", "idx_records_date_type_category"} <= names
+        assert "records_v2" not in names
+
+    def test_swap_rerun_is_safe(self, db):
+        """替换完成后、标记步骤完成前中断，重跑替换步骤时不会再次删除 records"""
+        db.initialize_database()
+        db.saveData({"type": "支出", "amount": 100, "date": "2025-03-01"})
+        swap = next(step for step in MIGRATIONS[1].steps if step.name == "替换 records 表")
+        swap.fn(db._get_connection())
+        assert len(db.fetchData({})) == 1
+
+
+class TestResume:
+    """回填中断后继续"""
+
+    def test_backfill_resumes_from_cursor(self, db):
+        conn = db._get_connection()
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY)")
+        conn.execute("CREATE TABLE copied (id INTEGER PRIMARY KEY)")
+        with conn:
+            conn.executemany("INSERT INTO items (id) VALUES (?)", [(i,) for i in range(1, 31)])
+        seen = []
+        failures = {"left": 1}
+
+        def copy_chunk(conn, cursor, chunk_size):
+            lo = int(cursor or 0)
+            if lo == 10 and failures["left"]:
+                failures["left"] -= 1
+                raise RuntimeError("中断")
+            rows = conn.execute(
+                "SELECT id FROM items WHERE id > ? ORDER BY id LIMIT ?", (lo, chunk_size)
+            ).fetchall()
+            if not rows:
+                return None
+            seen.extend(r[0] for r in rows)
+            conn.executemany("INSERT INTO copied (id) VALUES (?)", rows)
+            return str(rows[-1][0]), len(rows)
+
+        migrations = (Migration(1, "复制", (
+            SqlScript("准备", "CREATE TABLE IF NOT EXISTS marker (x)"),
+            Backfill("复制数据", "SELECT COUNT(*) FROM items", copy_chunk),
+        )),)
+        with pytest.raises(RuntimeError):
+            migrate(conn, migrations, chunk_size=10)
+        assert schema_version(conn) == 0
+
+        assert migrate(conn, migrations, chunk_size=10) == 1
+        # 第一块不会重复处理
+        assert seen == list(range(1, 31))
+        assert conn.execute("SELECT COUNT(*) FROM copied").fetchone()[0] == 30
@@ -0,0 +1,122 @@
+"""
+数据模型测试
+
+测试策略：直接构造模型对象；RecordBatch 另用临时数据库验证读取
+覆盖以下场景：
+1. Record、Tag、Photo、Reminder 使用 __slots__
+2. RecordBatch 列式保存与行视图
+3. RecordManager.getRecordBatch 逐批读取
+4. 行视图经批次关联的数据库读取标签与图片，没有关联数据库时抛出异常
+"""
+
+import pytest
+import sys
+import os
+from datetime import date, datetime
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.database import LocalDatabase
+from data.models import Photo, Record, RecordBatch, Reminder, Tag
+from logic.record_manager import RecordManager
+
+ROWS = [
+    {"id": "3", "type": "支出", "amount": 1250, "date": "2025-03-02", "note": "午餐"},
+    {"id": "7", "type": "收入", "amount": 800000, "date": "2025-03-01", "note": ""},
+    {"id": "9", "type": "支出", "amount": 300, "date": "2025-02-28", "note": None},
+]
+
+
+class TestSlots:
+    """模型不带 __dict__"""
+
+    @pytest.mark.parametrize("obj", [
+        Record(record_id="1", type="支出", amount=100, date=date(2025, 3, 1)),
+        Tag(tag_id=1, name="餐饮"),
+        Photo(photo_id="1", file_path="a.jpg"),
+        Reminder(reminder_id="1", title="还款", reminder_time=datetime(2025, 3, 1, 9)),
+    ])
+    def test_no_instance_dict(self, obj):
+        assert not hasattr(obj, "__dict__")
+        # frozen 且带 __slots__ 的 dataclass (Tag) 在 Python 3.11 中抛出 TypeError
+        with pytest.raises((AttributeError, TypeError)):
+            obj.unknown = 1
+
+    def test_tag_is_immutable(self):
+        tag = Tag(tag_id=1, name="餐饮")
+        with pytest.raises(AttributeError):
+            tag.name = "交通"
+
+    def test_default_lists_not_shared(self):
+        a = Record(record_id="1", type="支出", amount=100, date=date(2025, 3, 1))
+        b = Record(record_id="2", type="支出", amount=100, date=date(2025, 3, 1))
+        a.tags.append(Tag(tag_id=1, name="餐饮"))
+        assert b.tags == []
+
+
+class TestRecordBatch:
+    """列式容器"""
+
+    def test_columns(self):
+        batch = RecordBatch.from_rows(ROWS)
+        assert len(batch) == 3
+        assert list(batch.ids) == [3, 7, 9]
+        assert list(batch.amounts) == [1250, 800000, 300]
+        assert batch.type_names == ["支出", "收入"]
+        assert list(batch.types) == [0, 1, 0]
+
+    def test_row_view(self):
+        row = RecordBatch.from_rows(ROWS)[0]
+        assert (row.record_id, row.type, row.amount, row.date, row.note) == \
+            ("3", "支出", 1250, date(2025, 3, 2), "午餐")
+        assert not hasattr(row, "__dict__")
+
+    def test_relations_without_loader_raise(self):
+        row = RecordBatch.from_rows(ROWS)[0]
+        with pytest.raises(RuntimeError):
+            row.tags
+        with pytest.raises(RuntimeError):
+            row.photos
+
+    def test_indexing_and_iteration(self):
+        batch = RecordBatch.from_rows(ROWS)
+        assert batch[-1].record_id == "9"
+        assert batch[-1].note == ""
+        assert [row.record_id for row in batch] == ["3", "7", "9"]
+        with pytest.raises(IndexError):
+            batch[3]
+
+    def test_to_records(self):
+        records = RecordBatch.from_rows(ROWS).to_records()
+        assert records[1] == Record(record_id="7", type="收入", amount=800000, date=date(2025, 3, 1), note="")
+
+
+class TestRecordManagerBatch:
+    """RecordManager.getRecordBatch"""
+
+    def test_batch_matches_get_records(self, tmp_path):
+        manager = RecordManager()
+        manager.db = LocalDatabase(str(tmp_path / "app.db"))
+        manager.db.initialize_database()
+        manager.createRecords([
+            {"type": "支出" if i % 2 else "收入", "amount": i + 1, "date": f"2025-03-{i % 28 + 1:02d}", "note": f"n{i}"}
+            for i in range(50)
+        ])
+        batch = manager.getRecordBatch({"type": "支出"}, batch_size=7)
+        records = manager.getRecords({"type": "支出"})
+        assert [(r.record_id, r.amount, r.note) for r in batch] == \
+            [(r.record_id, r.amount, r.note) for r in records]
+        assert [r.date.isoformat() for r in batch] == [r.date for r in records]
+        manager.db.close()
+
+    def test_batch_rows_load_relations(self, tmp_path):
+        manager = RecordManager()
+        manager.db = LocalDatabase(str(tmp_path / "app.db"))
+        manager.db.initialize_database()
+        manager.createRecords([{"type": "支出", "amount": 1, "date": "2025-03-01", "tags": "餐饮"}])
+        row = manager.getRecordBatch({})[0]
+        assert [t.name for t in row.tags] == ["餐饮"]
+        assert row.photos == ()
+        assert [t.name for t in row.to_record().tags] == ["餐饮"]
+        manager.db.close()
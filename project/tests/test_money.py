@@ -0,0 +1,47 @@
+"""
+金额工具测试
+
+覆盖以下场景：
+1. 元到分的精确转换 (十进制四舍五入)
+2. 非法输入与越界
+3. 分到元的格式化
+"""
+
+import pytest
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.money import MAX_CENTS, format_cents, to_cents
+
+
+class TestToCents:
+    """元 -> 分"""
+
+    @pytest.mark.parametrize("value, expected", [
+        (12.5, 1250), ("12.50", 1250), (100, 10000), (0.1, 10), ("0.005", 1), (1.005, 101), (-2.345, -235),
+    ])
+    def test_exact_conversion(self, value, expected):
+        assert to_cents(value) == expected
+
+    def test_sum_is_exact(self):
+        assert sum(to_cents(0.1) for _ in range(1000)) == 10000
+
+    @pytest.mark.parametrize("value", ["abc", "", None, True, float("nan"), float("inf"), [1]])
+    def test_invalid_values(self, value):
+        with pytest.raises(ValueError):
+            to_cents(value)
+
+    def test_out_of_range(self):
+        with pytest.raises(ValueError):
+            to_cents(MAX_CENTS)
+
+
+class TestFormatCents:
+    """分 -> 元"""
+
+    @pytest.mark.parametrize("cents, expected", [(1250, "12.50"), (5, "0.05"), (0, "0.00"), (-101, "-1.01")])
+    def test_format(self, cents, expected):
+        assert format_cents(cents) == expected
@@ -0,0 +1,157 @@
+"""
+按年分区存储测试
+
+测试策略：使用临时目录中的主库与分区文件
+覆盖以下场景：
+1. 写入路由到记录年份的分区，ID 全局唯一
+2. 按日期条件只打开相关分区，跨年查询与分页保持排序
+3. 保留期限清理删除整年分区文件
+4. RecordManager / ReportGenerator 在分区存储上工作
+5. 按参数或环境变量选择存储模式
+"""
+
+import pytest
+import sys
+import os
+from datetime import date
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.database import LocalDatabase
+from data.partitions import STORAGE_ENV, PartitionedDatabase, open_database
+from logic.record_manager import RecordManager
+from logic.report_generator import ReportGenerator
+
+
+@pytest.fixture
+def db(tmp_path):
+    """创建临时分区数据库，包含 2023-2025 三年的记录"""
+    database = PartitionedDatabase(str(tmp_path / "app.db"))
+    database.initialize_database()
+    (tmp_path / "receipt.jpg").write_bytes(b"receipt")
+    database.saveMany([
+        {"type": "支出", "amount": 1000, "date": "2023-05-01", "note": "旧午餐", "category": "餐饮"},
+        {"type": "支出", "amount": 2000, "date": "2024-12-31", "note": "跨年晚餐", "category": "餐饮"},
+        {"type": "收入", "amount": 500000, "date": "2025-01-01", "note": "工资"},
+        {"type": "支出", "amount": 3000, "date": "2025-03-15", "note": "午餐", "category": "餐饮",
+         "tags": ["工作"], "photos": [str(tmp_path / "receipt.jpg")]},
+    ])
+    yield database
+    database.close()
+
+
+class TestPartitionRouting:
+    """写入与查询路由"""
+
+    def test_one_file_per_year(self, db, tmp_path):
+        assert db.partitionYears() == [2025, 2024, 2023]
+        assert os.path.exists(tmp_path / "app.2024.db")
+
+    def test_ids_unique_across_partitions(self, db):
+        new_id = db.saveData({"type": "支出", "amount": 1, "date": date(2023, 1, 1)})
+        ids = [r["id"] for r in db.fetchData({})]
+        assert len(ids) == len(set(ids)) == 5
+        assert new_id in ids
+
+    def test_date_query_opens_only_matching_partition(self, db):
+        db.close()
+        rows = db.fetchData({"date": "2024-12"})
+        assert [r["note"] for r in rows] == ["跨年晚餐"]
+        assert list(db._partitions) == [2024]
+
+    def test_cross_year_results_sorted(self, db):
+        dates = [r["date"] for r in db.fetchData({})]
+        assert dates == sorted(dates, reverse=True)
+
+    def test_range_ending_on_new_year_excludes_that_year(self, db):
+        assert db._routed_years({"date": ("2024-06-01", "2025-01-01")}) == [2024]
+
+    def test_pagination_across_partitions(self, db):
+        seen = []
+        cursor = None
+        while True:
+            page, cursor = db.fetchPage({}, after=cursor, limit=3)
+            seen.extend(r["date"] for r in page)
+            if cursor is None:
+                break
+        assert seen == ["2025-03-15", "2025-01-01", "2024-12-31", "2023-05-01"]
+
+    def test_sum_and_monthly_totals(self, db):
+        assert db.sumAmount({"type": "支出"}) == 6000
+        assert db.fetchMonthlyTotals("2025-03") == [("支出", "餐饮", 3000)]
+        assert db.fetchMonthlyTotals("1999-01") == []
+        assert db.checkMonthlyTotals() == []
+
+    def test_search_and_delete(self, db):
+        found = db.searchText("午餐")
+        assert {r["note"] for r in found} == {"午餐", "旧午餐"}
+        assert db.deleteData(found[0]["id"]) is True
+        assert db.deleteData(found[0]["id"]) is False
+
+    def test_write_behind_not_supported(self, db):
+        with pytest.raises(ValueError):
+            db.enableWriteBehind()
+
+
+class TestPartitionRetention:
+    """保留期限清理"""
+
+    def test_drops_expired_partition_files(self, db, tmp_path):
+        deleted = db.run_cleanup_job("保存一年", today=date(2025, 6, 1))
+        # 2023 整年删除文件，2024 分区删除 6 月 1 日之前的记录
+        assert deleted == 1
+        assert db.partitionYears() == [2025, 2024]
+        assert not os.path.exists(tmp_path / "app.2023.db")
+
+    def test_boundary_partition_cleaned_by_rows(self, db):
+        # 截止日期 2025-01-02：2023、2024 整年删除，2025 分区只删除 1 月 1 日的记录
+        deleted = db.run_cleanup_job("保存半年", today=date(2025, 7, 2))
+        assert deleted == 3
+        assert [r["date"] for r in db.fetchData({})] == ["2025-03-15"]
+
+    def test_dropped_partition_photo_store_deleted(self, tmp_path):
+        database = PartitionedDatabase(str(tmp_path / "app.db"))
+        database.initialize_database()
+        photo = tmp_path / "old.jpg"
+        photo.write_bytes(b"jpg")
+        database.saveData({"type": "支出", "amount": 1, "date": "2020-01-01", "photos": [str(photo)]})
+        assert os.path.isdir(tmp_path / "app.2020.photos")
+        assert database.run_cleanup_job("保存一年", today=date(2025, 1, 1)) == 1
+        # 分区的图片存储随分区一起删除，用户的原文件不受影响
+        assert not os.path.exists(tmp_path / "app.2020.photos")
+        assert photo.exists()
+        database.close()
+
+
+class TestPartitionedManager:
+    """逻辑层在分区存储上工作"""
+
+    def test_record_manager_and_report(self, db):
+        manager = RecordManager()
+        manager.db = db
+        manager.createRecord({"type": "支出", "amount": 12.5, "date": "2025-03-20", "category": "交通"})
+        assert len(manager.getRecords({"date": "2025-03"})) == 2
+
+        generator = ReportGenerator()
+        generator.db = db
+        report = generator.generateMonthlyReport(date(2025, 3, 1))
+        assert report["total_expense"] == 4250
+        assert report["pie_chart_data"] == {"餐饮": 3000, "交通": 1250}
+
+
+class TestStorageMode:
+    """选择存储模式"""
+
+    def test_explicit_flag(self, tmp_path):
+        path = str(tmp_path / "app.db")
+        assert type(open_database(path, partitioned=False)) is LocalDatabase
+        assert type(open_database(path, partitioned=True)) is PartitionedDatabase
+
+    def test_environment(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "app.db")
+        monkeypatch.setenv(STORAGE_ENV, "partitioned")
+        assert type(open_database(path)) is PartitionedDatabase
+        assert type(RecordManager().db) is PartitionedDatabase
+        monkeypatch.delenv(STORAGE_ENV)
+        assert type(open_database(path)) is LocalDatabase
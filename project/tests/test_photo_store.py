@@ -0,0 +1,145 @@
+"""
+图片内容寻址存储测试
+
+测试策略：使用临时目录中的数据库与图片文件
+覆盖以下场景：
+1. 按 sha256 分散目录存放，内容相同的图片只存一份
+2. 引用计数随关联、删除记录增减
+3. 删除记录后回收无引用的文件，仍被引用的文件保留
+4. RecordManager 添加图片的校验与日志
+"""
+
+import pytest
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.database import LocalDatabase
+from data.journal import journal_for
+from data.photo_store import PhotoStore, file_sha256
+from logic.record_manager import RecordManager
+
+
+@pytest.fixture
+def db(tmp_path):
+    """创建已初始化的临时数据库"""
+    database = LocalDatabase(str(tmp_path / "app.db"))
+    database.initialize_database()
+    yield database
+    database.close()
+
+
+@pytest.fixture
+def receipt(tmp_path):
+    """一张小票图片"""
+    path = tmp_path / "receipt.jpg"
+    path.write_bytes(b"receipt-" * 1000)
+    return str(path)
+
+
+def _ref_count(db, sha256):
+    row = db._get_connection().execute(
+        "SELECT ref_count FROM photo_blobs WHERE sha256 = ?", (sha256,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+class TestPhotoStore:
+    """文件存储"""
+
+    def test_fan_out_path(self, tmp_path, receipt):
+        store = PhotoStore(str(tmp_path / "store"))
+        sha256, size = store.put(receipt)
+        assert size == 8000
+        assert store.path(sha256) == os.path.join(str(tmp_path / "store"), sha256[:2], sha256[2:4], sha256)
+        with open(store.path(sha256), "rb") as f:
+            assert f.read() == b"receipt-" * 1000
+
+    def test_same_content_stored_once(self, tmp_path, receipt):
+        store = PhotoStore(str(tmp_path / "store"))
+        copy = tmp_path / "copy.jpg"
+        copy.write_bytes(b"receipt-" * 1000)
+        assert store.put(receipt) == store.put(str(copy))
+        files = [name for _, _, names in os.walk(store.root) for name in names]
+        assert len(files) == 1
+
+    def test_missing_source(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            PhotoStore(str(tmp_path / "store")).put(str(tmp_path / "none.jpg"))
+
+
+class TestReferenceCounting:
+    """引用计数与回收"""
+
+    def test_store_path_saved(self, db, receipt):
+        record_id = db.saveData({"type": "支出", "amount": 100, "date": "2025-03-01", "photos": [receipt]})
+        sha256 = file_sha256(receipt)[0]
+        row = db._get_connection().execute(
+            "SELECT file_path, sha256 FROM photos WHERE record_id = ?", (record_id,)
+        ).fetchone()
+        assert row == (db.photoStore().path(sha256), sha256)
+        assert db.photoStore().root == os.path.splitext(db.db_path)[0] + ".photos"
+
+    def test_duplicates_counted(self, db, receipt):
+        db.saveMany([{"type": "支出", "amount": 100, "date": "2025-03-01", "photos": [receipt]}] * 3)
+        record_id = db.saveData({"type": "支出", "amount": 100, "date": "2025-03-02"})
+        db.addPhoto(record_id, receipt)
+        assert _ref_count(db, file_sha256(receipt)[0]) == 4
+
+    def test_delete_keeps_shared_blob(self, db, receipt):
+        first = db.saveData({"type": "支出", "amount": 100, "date": "2025-03-01", "photos": [receipt]})
+        second = db.saveData({"type": "支出", "amount": 100, "date": "2025-03-02", "photos": [receipt]})
+        sha256 = file_sha256(receipt)[0]
+
+        # 删除只写入墓碑，图片引用在物理删除时释放
+        assert db.deleteData(first)
+        assert _ref_count(db, sha256) == 2
+        assert db.purgeDeleted() == 1
+        assert _ref_count(db, sha256) == 1
+        assert db.photoStore().exists(sha256)
+
+        assert db.deleteData(second)
+        assert db.purgeDeleted() == 1
+        assert _ref_count(db, sha256) is None
+        assert not db.photoStore().exists(sha256)
+        # 用户选择的原文件不受影响
+        assert os.path.exists(receipt)
+
+    def test_add_photo_to_missing_record(self, db, receipt):
+        assert db.addPhoto("999", receipt) is None
+        assert db._get_connection().execute("SELECT COUNT(*) FROM photo_blobs").fetchone()[0] == 0
+
+    def test_collect_orphan_files(self, db, receipt):
+        # 存入文件后、登记引用前中断：登记为 0 引用的文件下次回收
+        sha256, size = db.photoStore().put(receipt)
+        conn = db._get_connection()
+        with conn:
+            conn.execute("INSERT INTO photo_blobs (sha256, size) VALUES (?, ?)", (sha256, size))
+        assert db.collectPhotos() == 1
+        assert not db.photoStore().exists(sha256)
+
+
+class TestRecordManagerPhotos:
+    """RecordManager 添加图片"""
+
+    @pytest.fixture
+    def manager(self, db):
+        manager = RecordManager()
+        manager.db = db
+        return manager
+
+    def test_add_photo_journals_store_path(self, manager, receipt):
+        record = manager.createRecord({"type": "支出", "amount": 12.5, "date": "2025-03-01"})
+        manager.addPhotoToRecord(record.record_id, receipt)
+        event = list(journal_for(manager.db).events())[-1]
+        assert event["path"] == manager.db.photoStore().path(file_sha256(receipt)[0])
+
+    def test_missing_photo_file(self, manager, tmp_path):
+        record = manager.createRecord({"type": "支出", "amount": 12.5, "date": "2025-03-01"})
+        with pytest.raises(ValueError, match="图片文件不存在"):
+            manager.addPhotoToRecord(record.record_id, str(tmp_path / "none.jpg"))
+        with pytest.raises(ValueError, match="图片文件不存在"):
+            manager.createRecord({"type": "支出", "amount": 1, "date": "2025-03-01",
+                                  "photos": [str(tmp_path / "none.jpg")]})
@@ -0,0 +1,113 @@
+"""
+Record 标签/图片延迟加载与批量预取测试
+
+测试策略：使用临时 SQLite 文件，统计 LocalDatabase 批量读取方法的调用次数
+覆盖以下场景：
+1. 未预取时首次访问才读取，且只读取一次
+2. prefetch=("tags", "photos") 每种关联只查询一次
+3. 预取得到的 Tag 为标签字典中的共享对象
+4. 不支持的关联名称
+5. 构造时给出的 tags/photos 直接使用，不经数据库读取
+"""
+
+import pytest
+import sys
+import os
+from datetime import date
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.database import LocalDatabase
+from data.models import Photo, Record, Tag
+from logic.record_manager import RecordManager
+
+
+class CountingDatabase(LocalDatabase):
+    """记录 fetchTags / fetchPhotos 调用次数的数据库"""
+
+    def __init__(self, db_path):
+        super().__init__(db_path)
+        self.calls = {"fetchTags": 0, "fetchPhotos": 0}
+
+    def fetchTags(self, record_ids, chunk_size=500):
+        self.calls["fetchTags"] += 1
+        return super().fetchTags(record_ids, chunk_size)
+
+    def fetchPhotos(self, record_ids, chunk_size=500):
+        self.calls["fetchPhotos"] += 1
+        return super().fetchPhotos(record_ids, chunk_size)
+
+
+@pytest.fixture
+def manager(tmp_path):
+    """使用临时数据库的 RecordManager，包含 20 条记录，偶数条带图片"""
+    photo = tmp_path / "receipt.jpg"
+    photo.write_bytes(b"receipt")
+    manager = RecordManager()
+    manager.db = CountingDatabase(str(tmp_path / "app.db"))
+    manager.db.initialize_database()
+    manager.createRecords([
+        {"type": "支出", "amount": i + 1, "date": f"2025-03-{i + 1:02d}", "tags": ["餐饮", f"t{i % 3}"],
+         "photos": [str(photo)] if i % 2 == 0 else []}
+        for i in range(20)
+    ])
+    yield manager
+    manager.db.close()
+
+
+class TestLazyRelations:
+    """延迟加载"""
+
+    def test_not_loaded_until_accessed(self, manager):
+        records = manager.getRecords({})
+        assert manager.db.calls == {"fetchTags": 0, "fetchPhotos": 0}
+        assert sorted(t.name for t in records[0].tags) == ["t1", "餐饮"]
+        records[0].tags
+        assert manager.db.calls == {"fetchTags": 1, "fetchPhotos": 0}
+
+    def test_constructor_relations(self, manager):
+        record = Record(record_id="1", type="支出", amount=100, date=date(2025, 3, 1),
+                        tags=[Tag(tag_id=9, name="交通")], photos=[Photo(photo_id="1", file_path="a.jpg")])
+        assert [t.name for t in record.tags] == ["交通"]
+        assert [p.file_path for p in record.photos] == ["a.jpg"]
+        assert manager.db.calls == {"fetchTags": 0, "fetchPhotos": 0}
+
+    def test_lazy_factory(self, manager):
+        first = manager.getRecords({})[-1]
+        record = Record.lazy(manager.db, record_id=first.record_id, type=first.type, amount=first.amount,
+                             date=first.date)
+        assert sorted(t.name for t in record.tags) == ["t0", "餐饮"]
+        assert manager.db.calls == {"fetchTags": 1, "fetchPhotos": 0}
+
+    def test_record_without_relations(self, manager):
+        record = manager.createRecord({"type": "支出", "amount": 1, "date": "2025-04-01"})
+        assert record.tags == [] and record.photos == []
+
+
+class TestPrefetch:
+    """批量预取"""
+
+    def test_one_query_per_relation(self, manager):
+        records = manager.getRecords({}, prefetch=("tags", "photos"))
+        assert manager.db.calls == {"fetchTags": 1, "fetchPhotos": 1}
+        assert all(len(r.tags) == 2 for r in records)
+        assert [len(r.photos) for r in records] == [0, 1] * 10
+        # 访问已预取的关联不再查询
+        assert manager.db.calls == {"fetchTags": 1, "fetchPhotos": 1}
+
+    def test_prefetched_tags_are_shared(self, manager):
+        records = manager.getRecords({}, prefetch=("tags",))
+        shared = {id(t) for r in records for t in r.tags if t.name == "餐饮"}
+        assert len(shared) == 1
+        assert records[0].tags[0] is manager.db.tagDictionary().lookup(records[0].tags[0].name)
+
+    def test_page_prefetch(self, manager):
+        page, cursor = manager.getRecordsPage({}, limit=5, prefetch=("photos",))
+        assert len(page) == 5 and cursor is not None
+        assert manager.db.calls["fetchPhotos"] == 1
+        assert page[1].photos[0].file_path.startswith(manager.db.photoStore().root)
+
+    def test_unknown_relation(self, manager):
+        with pytest.raises(ValueError):
+            manager.getRecords({}, prefetch=("reminders",))
@@ -0,0 +1,162 @@
+"""
+查询结果缓存测试
+
+测试策略：使用临时 SQLite 文件，用 Mock 包装数据库方法统计实际执行的查询
+覆盖以下场景：
+1. LRU 容量淘汰、命中/未命中计数
+2. 按写入行的类型与日期精确淘汰条目，加载期间发生写入时不缓存过期结果
+3. QueryService 来回切换筛选条件只在首次查询数据库
+4. 新建、删除、撤销、修改标签后受影响的结果刷新，其余结果继续命中
+5. 从变更日志恢复后清空缓存；没有事件总线的数据库不缓存
+"""
+
+import pytest
+import sys
+import os
+from datetime import date
+from unittest.mock import Mock
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.database import LocalDatabase
+from data.query_builder import RecordQuery
+from logic.query_cache import QueryCache, clear_query_caches
+from logic.query_service import QueryService
+from logic.record_manager import RecordManager
+
+
+@pytest.fixture
+def service(tmp_path):
+    """使用临时数据库的 QueryService，包含一条收入与两条支出"""
+    service = QueryService()
+    service.manager = RecordManager()
+    service.manager.db = LocalDatabase(str(tmp_path / "app.db"))
+    service.manager.db.initialize_database()
+    service.manager.createRecords([
+        {"type": "支出", "amount": 10, "date": "2025-03-01", "note": "午餐", "tags": "餐饮"},
+        {"type": "支出", "amount": 20, "date": "2025-04-01", "note": "晚餐"},
+        {"type": "收入", "amount": 300, "date": "2025-03-05", "note": "工资"},
+    ])
+    yield service
+    service.close()
+    service.manager.db.close()
+
+
+def _count_queries(service):
+    """包装 iterData，返回统计调用次数的 Mock"""
+    service.manager.db.iterData = Mock(wraps=service.manager.db.iterData)
+    return service.manager.db.iterData
+
+
+class TestQueryCache:
+    """缓存本身"""
+
+    def test_lru_eviction_and_counters(self):
+        cache = QueryCache(max_entries=2)
+        scope = RecordQuery()
+        cache.get_or_load("a", scope, lambda: 1)
+        cache.get_or_load("b", scope, lambda: 2)
+        assert cache.get_or_load("a", scope, lambda: 0) == 1
+        cache.get_or_load("c", scope, lambda: 3)
+        # b 最久未使用，被淘汰
+        assert cache.get_or_load("b", scope, lambda: 20) == 20
+        assert cache.stats() == {"hits": 1, "misses": 4, "invalidations": 0, "entries": 2}
+
+    def test_invalidation_by_type_and_date(self):
+        cache = QueryCache()
+        march_expense = RecordQuery().of_type("支出").during("2025-03")
+        cache.get_or_load("march_expense", march_expense, lambda: 1)
+        cache.get_or_load("income", RecordQuery().of_type("收入"), lambda: 2)
+        cache.get_or_load("all", RecordQuery(), lambda: 3)
+
+        assert cache.invalidate_rows([{"type": "支出", "date": "2025-04-01"}]) == 1
+        assert len(cache) == 2
+        assert cache.invalidate_rows([{"type": "支出", "date": "2025-03-31"}]) == 1
+        assert len(cache) == 1
+        assert cache.get_or_load("income", RecordQuery(), lambda: 0) == 2
+
+    def test_write_during_load_not_cached(self):
+        cache = QueryCache()
+
+        def load():
+            cache.invalidate_rows([{"type": "支出", "date": "2025-03-01"}])
+            return "stale"
+
+        cache.get_or_load("key", RecordQuery(), load)
+        assert len(cache) == 0
+
+    def test_invalid_size(self):
+        with pytest.raises(ValueError):
+            QueryCache(max_entries=0)
+
+
+class TestQueryServiceCache:
+    """QueryService 的结果缓存"""
+
+    def test_toggle_filters_queries_once(self, service):
+        queries = _count_queries(service)
+        for _ in range(3):
+            for filter_type in ("全部", "收入", "支出"):
+                service.get_records_by_filter(filter_type)
+        assert queries.call_count == 3
+        assert service.cache_stats()["hits"] == 6
+        assert [r.note for r in service.get_records_by_filter("收入")] == ["工资"]
+
+    def test_write_invalidates_only_affected(self, service):
+        for filter_type in ("全部", "收入", "支出"):
+            service.get_records_by_filter(filter_type)
+        queries = _count_queries(service)
+
+        service.manager.createRecord({"type": "支出", "amount": 5, "date": "2025-03-02", "note": "咖啡"})
+        assert [r.note for r in service.get_records_by_filter("收入")] == ["工资"]
+        assert queries.call_count == 0
+        assert [r.note for r in service.get_records_by_filter("支出")] == ["晚餐", "咖啡", "午餐"]
+        assert len(service.get_records_by_filter("全部")) == 4
+        assert queries.call_count == 2
+
+    def test_delete_and_undo(self, service):
+        income = service.get_records_by_filter("收入")
+        service.manager.deleteRecord(income[0].record_id)
+        assert len(service.get_records_by_filter("收入")) == 0
+        service.manager.undoDelete([income[0].record_id])
+        assert len(service.get_records_by_filter("收入")) == 1
+
+    def test_sum_by_date_range(self, service):
+        march = (date(2025, 3, 1), date(2025, 4, 1))
+        assert service.sum_by_filter("支出", *march) == 1000
+        assert service.sum_by_filter("支出", *march) == 1000
+        service.manager.createRecord({"type": "支出", "amount": 1, "date": "2025-05-01"})
+        assert service.cache_stats()["invalidations"] == 0
+        service.manager.createRecord({"type": "支出", "amount": 1, "date": "2025-03-31"})
+        assert service.sum_by_filter("支出", *march) == 1100
+        assert service.cache_stats()["hits"] == 1
+
+    def test_tag_change_invalidates_query(self, service):
+        query = RecordQuery().with_tags(["外卖"])
+        assert service.run_query(query) == []
+        dinner = service.manager.getRecords({"type": "支出"})[0]
+        service.manager.addTagToRecord(dinner.record_id, "外卖")
+        assert [r.note for r in service.run_query(query)] == ["晚餐"]
+
+    def test_shared_with_other_managers(self, service):
+        service.get_records_by_filter("收入")
+        other = RecordManager()
+        other.db = LocalDatabase(service.manager.db.db_path)
+        other.createRecord({"type": "收入", "amount": 1, "date": "2025-06-01", "note": "红包"})
+        assert [r.note for r in service.get_records_by_filter("收入")] == ["红包", "工资"]
+
+    def test_clear_on_bulk_changes(self, service):
+        service.get_records_by_filter("全部")
+        clear_query_caches(service.manager.db)
+        assert service.cache_stats()["entries"] == 0
+
+    def test_mock_database_not_cached(self):
+        service = QueryService()
+        service.manager.db = Mock()
+        service.manager.db.iterData.return_value = iter([])
+        service.get_records_by_filter("全部")
+        service.manager.db.iterData.return_value = iter([])
+        service.get_records_by_filter("全部")
+        assert service.manager.db.iterData.call_count == 2
+        assert service.cache_stats()["entries"] == 0
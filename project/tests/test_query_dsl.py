@@ -0,0 +1,208 @@
+"""
+组合查询 (RecordQuery) 测试
+
+测试策略：使用临时 SQLite 文件，与逐条比较的暴力筛选结果对照
+覆盖以下场景：
+1. 组合方法返回新查询、区间取交集与参数校验
+2. 编译出的 SQL 与绑定参数，日期、类型条件命中索引
+3. 类型、日期、金额、标签 (全部/任一)、关键词组合筛选，以及排序与条数限制
+4. 开启内存快照后快照求值与 SQL 结果一致
+5. 按年分区存储的组合查询
+"""
+
+import pytest
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.database import LocalDatabase
+from data.partitions import PartitionedDatabase
+from data.query_builder import RecordQuery, compile_query
+from data.snapshot import enable_snapshot
+from logic.query_service import QueryService
+from logic.record_manager import RecordManager
+
+ROWS = [
+    {"type": "支出", "amount": 12.5, "date": "2025-02-28", "note": "午餐", "tags": "餐饮"},
+    {"type": "支出", "amount": 88, "date": "2025-03-01", "note": "聚餐", "tags": "餐饮,朋友"},
+    {"type": "支出", "amount": 30, "date": "2025-03-01", "note": "电影", "tags": "娱乐,朋友"},
+    {"type": "收入", "amount": 5000, "date": "2025-03-05", "note": "工资"},
+    {"type": "支出", "amount": 88, "date": "2025-03-20", "note": "晚餐", "tags": "餐饮"},
+    {"type": "支出", "amount": 200, "date": "2025-04-02", "note": "聚餐", "tags": "餐饮"},
+]
+
+
+def _make_manager(db):
+    manager = RecordManager()
+    manager.db = db
+    manager.db.initialize_database()
+    manager.createRecords(ROWS)
+    return manager
+
+
+@pytest.fixture
+def manager(tmp_path):
+    """使用临时数据库的 RecordManager，包含 ROWS 中的记录"""
+    manager = _make_manager(LocalDatabase(str(tmp_path / "app.db")))
+    yield manager
+    manager.db.close()
+
+
+def _notes(records):
+    return [(r.note, str(r.date)) for r in records]
+
+
+class TestRecordQuery:
+    """查询对象的组合与校验"""
+
+    def test_immutable_composition(self):
+        base = RecordQuery().of_type("支出")
+        narrowed = base.during("2025-03").take(5)
+        assert base.start is None and base.limit is None
+        assert (narrowed.start, narrowed.end, narrowed.limit) == ("2025-03-01", "2025-04-01", 5)
+
+    def test_ranges_intersect(self):
+        query = RecordQuery().during("2025").between("2025-03-01", "2026-06-01").amount_between(100, 900)
+        query = query.amount_between(300, None).amount_between(None, 1000)
+        assert (query.start, query.end) == ("2025-03-01", "2026-01-01")
+        assert (query.min_amount, query.max_amount) == (300, 900)
+
+    def test_tags_accumulate(self):
+        query = RecordQuery().with_tags(["餐饮"]).with_tags(["朋友", "餐饮"], match_all=False)
+        assert query.tags == ("餐饮", "朋友")
+        assert not query.match_all_tags
+        assert not query.snapshot_compatible
+
+    @pytest.mark.parametrize("build", [
+        lambda q: q.of_type("转账"),
+        lambda q: q.order_by("note"),
+        lambda q: q.take(0),
+        lambda q: q.between("2025-13-01"),
+        lambda q: q.matching("  "),
+    ])
+    def test_invalid(self, build):
+        with pytest.raises(ValueError):
+            build(RecordQuery())
+
+
+class TestCompile:
+    """编译为单条 SQL"""
+
+    def test_sql_and_params(self):
+        query = (RecordQuery().of_type("支出").during("2025-03").amount_between(1000, None)
+                 .with_tags([3, 4]).order_by("amount_desc").take(10))
+        sql, params = compile_query(query)
+        assert sql.count("SELECT record_id FROM record_tags WHERE tag_id = ?") == 2
+        assert "amount <= ?" not in sql
+        assert sql.endswith("ORDER BY amount DESC, date DESC, record_id DESC LIMIT ?")
+        assert params == ["支出", "2025-03-01", "2025-04-01", 1000, 3, 4, 10]
+
+    def test_same_shape_reuses_sql(self):
+        first, _ = compile_query(RecordQuery().of_type("支出").during("2025-03"))
+        second, _ = compile_query(RecordQuery().of_type("收入").during("2024-01"))
+        assert first is second
+
+    @pytest.mark.parametrize("query, index_name", [
+        (RecordQuery().of_type("支出").during("2025-03").amount_between(1000, 5000), "idx_records_"),
+        (RecordQuery().during("2025-03").take(20), "idx_records_date"),
+    ])
+    def test_uses_index(self, manager, query, index_name):
+        sql, params = compile_query(query)
+        plan = manager.db.explainQueryPlan(sql, params)
+        assert any(index_name in detail for detail in plan)
+        assert not any(detail.startswith("SCAN records") for detail in plan)
+
+
+class TestFetchQuery:
+    """组合筛选结果"""
+
+    def test_combined_filters_match_brute_force(self, manager):
+        query = RecordQuery().of_type("支出").between("2025-03-01", "2025-04-01").amount_between(3000, 8800)
+        expected = [
+            (r["note"], r["date"]) for r in manager.db.fetchData({})
+            if r["type"] == "支出" and "2025-03-01" <= r["date"] < "2025-04-01" and 3000 <= r["amount"] <= 8800
+        ]
+        assert _notes(manager.getRecordsByQuery(query)) == expected
+        assert len(expected) == 3
+
+    @pytest.mark.parametrize("order, expected", [
+        ("date_desc", ["聚餐", "晚餐", "聚餐", "午餐"]),
+        ("date_asc", ["午餐", "聚餐", "晚餐", "聚餐"]),
+        ("amount_desc", ["聚餐", "晚餐", "聚餐", "午餐"]),
+        ("amount_asc", ["午餐", "晚餐", "聚餐", "聚餐"]),
+    ])
+    def test_order(self, manager, order, expected):
+        query = RecordQuery().with_tags(["餐饮"]).order_by(order)
+        assert [r.note for r in manager.getRecordsByQuery(query)] == expected
+
+    def test_amount_ties_newest_first(self, manager):
+        query = RecordQuery().amount_between(8800, 8800).order_by("amount_desc")
+        assert _notes(manager.getRecordsByQuery(query)) == [("晚餐", "2025-03-20"), ("聚餐", "2025-03-01")]
+
+    def test_tags_all_and_any(self, manager):
+        both = RecordQuery().with_tags(["餐饮", "朋友"])
+        either = RecordQuery().with_tags(["娱乐", "不存在"], match_all=False)
+        assert [r.note for r in manager.getRecordsByQuery(both)] == ["聚餐"]
+        assert [r.note for r in manager.getRecordsByQuery(either)] == ["电影"]
+        assert manager.getRecordsByQuery(RecordQuery().with_tags(["餐饮", "不存在"])) == []
+
+    def test_keyword_and_limit(self, manager):
+        query = RecordQuery().matching("聚餐").order_by("amount_desc").take(1)
+        assert _notes(manager.getRecordsByQuery(query)) == [("聚餐", "2025-04-02")]
+
+    def test_deleted_records_hidden(self, manager):
+        query = RecordQuery().matching("聚餐")
+        newest = manager.getRecordsByQuery(query)[0]
+        manager.deleteRecord(newest.record_id)
+        assert _notes(manager.getRecordsByQuery(query)) == [("聚餐", "2025-03-01")]
+
+    def test_query_service(self, manager):
+        service = QueryService()
+        service.manager = manager
+        records = service.run_query(RecordQuery().of_type("收入"))
+        assert [r.amount for r in records] == [500000]
+
+
+class TestSnapshotEvaluation:
+    """内存快照求值"""
+
+    @pytest.mark.parametrize("query", [
+        RecordQuery(),
+        RecordQuery().of_type("支出").during("2025-03"),
+        RecordQuery().amount_between(3000, None).order_by("amount_asc").take(3),
+        RecordQuery().between(None, "2025-03-02").order_by("date_asc"),
+        RecordQuery().of_type("支出").order_by("amount_desc").take(2),
+    ])
+    def test_matches_sql(self, manager, query):
+        expected = _notes(manager.getRecordsByQuery(query))
+        snapshot = enable_snapshot(manager.db)
+        manager.db.fetchQuery = None  # 快照路径不应执行 SQL 查询
+        assert _notes(manager.getRecordsByQuery(query)) == expected
+        assert len(snapshot) == len(ROWS)
+
+    def test_tag_query_falls_back_to_sql(self, manager):
+        enable_snapshot(manager.db)
+        assert [r.note for r in manager.getRecordsByQuery(RecordQuery().with_tags(["朋友"]))] == ["电影", "聚餐"]
+
+    def test_follows_writes(self, manager):
+        enable_snapshot(manager.db)
+        manager.createRecord({"type": "支出", "amount": 999, "date": "2025-03-10", "note": "手机"})
+        top = manager.getRecordsByQuery(RecordQuery().of_type("支出").order_by("amount_desc").take(1))
+        assert [r.note for r in top] == ["手机"]
+
+
+class TestPartitions:
+    """按年分区存储"""
+
+    def test_merge_across_years(self, tmp_path):
+        manager = _make_manager(PartitionedDatabase(str(tmp_path / "app.db")))
+        manager.createRecords([
+            {"type": "支出", "amount": 500, "date": "2024-12-31", "note": "年夜饭", "tags": "餐饮"},
+        ])
+        query = RecordQuery().with_tags(["餐饮"]).order_by("amount_desc").take(2)
+        assert _notes(manager.getRecordsByQuery(query)) == [("年夜饭", "2024-12-31"), ("聚餐", "2025-04-02")]
+        ranged = RecordQuery().between("2024-12-01", "2025-03-01").order_by("date_asc")
+        assert [r.note for r in manager.getRecordsByQuery(ranged)] == ["年夜饭", "午餐"]
+        manager.db.close()
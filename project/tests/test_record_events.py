@@ -0,0 +1,159 @@
+"""
+记录变更通知测试
+
+测试策略：使用临时 SQLite 文件，订阅者记录收到的事件
+覆盖以下场景：
+1. 事件总线的订阅、按类型订阅、取消订阅与订阅者异常隔离
+2. 新建 (单条、批量、去重)、修改 (标签、图片)、删除 (单条、批量)、撤销删除发布的事件与行
+3. 同一数据库文件的多个 RecordManager 共享订阅
+4. 没有删除订阅者时不为事件额外查询
+5. 按保留期限清理发布删除事件
+"""
+
+import pytest
+import sys
+import os
+from datetime import date
+from unittest.mock import Mock
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.database import LocalDatabase
+from logic.record_events import RECORDS_CREATED, RECORDS_DELETED, RECORDS_UPDATED, RecordEventBus
+from logic.record_manager import RecordManager
+
+
+@pytest.fixture
+def manager(tmp_path):
+    """使用临时数据库的 RecordManager"""
+    manager = RecordManager()
+    manager.db = LocalDatabase(str(tmp_path / "app.db"))
+    manager.db.initialize_database()
+    yield manager
+    manager.db.close()
+
+
+@pytest.fixture
+def events(manager):
+    """订阅全部事件，返回收到的 (类型, 行) 列表"""
+    received = []
+    unsubscribe = manager.subscribe(lambda event: received.append((event.kind, list(event.rows))))
+    yield received
+    unsubscribe()
+
+
+LUNCH = {"type": "支出", "amount": 12.5, "date": "2025-03-01", "note": "午餐"}
+
+
+class TestEventBus:
+    """事件总线"""
+
+    def test_subscribe_and_unsubscribe(self):
+        bus = RecordEventBus()
+        received = []
+        unsubscribe = bus.subscribe(received.append)
+        bus.publish(RECORDS_CREATED, [{"id": "1"}])
+        unsubscribe()
+        unsubscribe()
+        bus.publish(RECORDS_CREATED, [{"id": "2"}])
+        assert [event.ids for event in received] == [["1"]]
+
+    def test_kinds_filter(self):
+        bus = RecordEventBus()
+        received = []
+        bus.subscribe(received.append, kinds=[RECORDS_DELETED])
+        assert not bus.has_listeners(RECORDS_CREATED)
+        bus.publish(RECORDS_CREATED, [{"id": "1"}])
+        bus.publish(RECORDS_DELETED, [{"id": "1"}])
+        assert [event.kind for event in received] == [RECORDS_DELETED]
+        with pytest.raises(ValueError):
+            bus.subscribe(received.append, kinds=["moved"])
+
+    def test_empty_events_not_published(self):
+        bus = RecordEventBus()
+        received = []
+        bus.subscribe(received.append)
+        bus.publish(RECORDS_DELETED, [])
+        assert received == []
+
+    def test_listener_errors_isolated(self):
+        bus = RecordEventBus()
+        received = []
+        bus.subscribe(Mock(side_effect=RuntimeError("界面已关闭")))
+        bus.subscribe(received.append)
+        bus.publish(RECORDS_CREATED, [{"id": "1"}])
+        assert len(received) == 1
+
+
+class TestManagerEvents:
+    """RecordManager 发布的事件"""
+
+    def test_create(self, manager, events):
+        record = manager.createRecord(LUNCH)
+        assert events == [(RECORDS_CREATED, [
+            {"id": record.record_id, "type": "支出", "amount": 1250, "date": "2025-03-01", "note": "午餐"},
+        ])]
+
+    def test_create_many_and_dedupe(self, manager, events):
+        result = manager.createRecords([LUNCH, dict(LUNCH, amount="abc"), dict(LUNCH, note="晚餐")], dedupe=True)
+        assert events[0][0] == RECORDS_CREATED
+        assert [row["id"] for row in events[0][1]] == result["ids"]
+        # 重复的记录与已存在的记录不再发布事件
+        manager.createRecords([LUNCH], dedupe=True)
+        manager.createRecord(LUNCH, dedupe=True)
+        assert len(events) == 1
+
+    def test_update(self, manager, events, tmp_path):
+        record = manager.createRecord(LUNCH)
+        manager.addTagToRecord(record.record_id, "餐饮")
+        receipt = tmp_path / "receipt.jpg"
+        receipt.write_bytes(b"receipt")
+        manager.addPhotoToRecord(record.record_id, str(receipt))
+        assert [kind for kind, _ in events] == [RECORDS_CREATED, RECORDS_UPDATED, RECORDS_UPDATED]
+        assert events[1][1] == [
+            {"id": record.record_id, "type": "支出", "amount": 1250, "date": "2025-03-01", "note": "午餐"},
+        ]
+
+    def test_delete_and_undo(self, manager, events):
+        ids = manager.createRecords([LUNCH, dict(LUNCH, note="晚餐"), dict(LUNCH, note="早餐")])["ids"]
+        assert manager.deleteRecord(ids[0])
+        assert not manager.deleteRecord(ids[0])
+        manager.deleteRecords(ids)
+        manager.undoDelete(ids[:1])
+
+        kinds = [kind for kind, _ in events]
+        assert kinds == [RECORDS_CREATED, RECORDS_DELETED, RECORDS_DELETED, RECORDS_CREATED]
+        assert [row["id"] for row in events[1][1]] == [ids[0]]
+        # 已删除的记录不重复通知，删除事件带有被删除行的内容
+        assert sorted(row["id"] for row in events[2][1]) == ids[1:]
+        assert {row["note"] for row in events[2][1]} == {"晚餐", "早餐"}
+        assert events[3][1] == [
+            {"id": ids[0], "type": "支出", "amount": 1250, "date": "2025-03-01", "note": "午餐"},
+        ]
+
+    def test_cleanup(self, manager, events):
+        old = manager.createRecord(dict(LUNCH, date="2020-03-01"))
+        manager.createRecord(LUNCH)
+        assert manager.runCleanupJob("保存一年", today=date(2025, 6, 1)) == 1
+        assert events[-1] == (RECORDS_DELETED, [
+            {"id": old.record_id, "type": "支出", "amount": 1250, "date": "2020-03-01", "note": "午餐"},
+        ])
+
+    def test_shared_between_managers(self, manager, events):
+        other = RecordManager()
+        other.db = LocalDatabase(manager.db.db_path)
+        other.createRecord(LUNCH)
+        assert [kind for kind, _ in events] == [RECORDS_CREATED]
+
+    def test_no_lookup_without_listeners(self, manager):
+        record = manager.createRecord(LUNCH)
+        manager.db.fetchByIds = Mock(wraps=manager.db.fetchByIds)
+        manager.deleteRecord(record.record_id)
+        manager.db.fetchByIds.assert_not_called()
+
+    def test_mock_database(self):
+        manager = RecordManager()
+        manager.db = Mock()
+        with pytest.raises(ValueError):
+            manager.subscribe(lambda event: None)
@@ -4,8 +4,14 @@ RecordManager.createRecord 单元测试
 测试策略：条件覆盖 + 边界值测试
 覆盖以下条件分支：
 1. type 为空 / 有效值(收入/支出) / 无效值
-2. amount 为空 / 正数 / 零 / 负数 / 非数字
+2. amount 为空 / 正数 / 零 / 负数 / 非数字，以及元到分的转换
 3. date 为空 / 有效字符串 / 无效格式 / date对象 / 空字符串 / 其他类型
+另用临时 SQLite 文件测试：
+4. 写操作写入变更日志，从变更日志恢复丢失的记录，按保留期限清理的记录不会被恢复
+5. 按指纹去重：重复的记录返回已有记录，不重复的记录正常写入
+6. 指纹包含来源 (source / sources)：内容相同、来源不同的记录都写入
+7. 写操作发布的记录变更事件 (新建、修改、删除、撤销删除、按保留期限清理) 及其中的行
+8. 组合查询 getRecordsByQuery：SQL 路径与内存快照路径 (排序、金额区间、条数限制、预取)
 """
 
 import pytest
@@ -13,12 +19,29 @@ import sys
 import os
 from datetime import date, datetime
 from unittest.mock import Mock, patch
+from concurrent.futures import Future
 
 # 添加项目根目录到路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from logic.record_manager import RecordManager
+from data.database import LocalDatabase
+from data.journal import journal_for
 from data.models import RecordType
+from data.partitions import PartitionedDatabase
+from data.query_builder import RecordQuery
+from data.snapshot import disable_snapshot, enable_snapshot
+from logic.record_events import RECORDS_CREATED, RECORDS_DELETED, RECORDS_UPDATED, event_bus_for
+
+
+@pytest.fixture
+def sqlite_manager(tmp_path):
+    """创建使用临时 SQLite 数据库的 RecordManager"""
+    manager = RecordManager()
+    manager.db = LocalDatabase(str(tmp_path / "app.db"))
+    manager.db.initialize_database()
+    yield manager
+    manager.db.close()
 
 
 class TestRecordManagerCreateRecord:
@@ -46,7 +69,7 @@ class TestRecordManagerCreateRecord:
         
         assert record.record_id == "test_record_id_001"
         assert record.type == "收入"
-        assert record.amount == 5000.0
+        assert record.amount == 500000
         assert record.date == date(2025, 12, 1)
         assert record.note == "工资"
     
@@ -61,7 +84,7 @@ class TestRecordManagerCreateRecord:
         record = manager.createRecord(data)
         
         assert record.type == "支出"
-        assert record.amount == 50.5
+        assert record.amount == 5050
         assert record.date == date(2025, 11, 15)
     
     def test_create_record_with_date_object(self, manager):
@@ -96,8 +119,8 @@ class TestRecordManagerCreateRecord:
         }
         record = manager.createRecord(data)
         
-        assert record.amount == 100.0
-        assert isinstance(record.amount, float)
+        assert record.amount == 10000
+        assert isinstance(record.amount, int)
     
     def test_create_record_with_string_amount(self, manager):
         """测试6: 金额为数字字符串时正确转换"""
@@ -108,7 +131,7 @@ class TestRecordManagerCreateRecord:
         }
         record = manager.createRecord(data)
         
-        assert record.amount == 99.99
+        assert record.amount == 9999
     
     # ==================== 类型校验测试 ====================
     
@@ -266,7 +289,7 @@ class TestRecordManagerCreateRecord:
             "date": "2025-01-01"
         }
         record = manager.createRecord(data)
-        assert record.amount == 0.01
+        assert record.amount == 1
     
     def test_large_amount(self, manager):
         """测试21: 大金额 (百万级)"""
@@ -276,7 +299,86 @@ class TestRecordManagerCreateRecord:
             "date": "2025-01-01"
         }
         record = manager.createRecord(data)
-        assert record.amount == 1000000.00
+        assert record.amount == 100000000
+
+    def test_amount_rounded_half_up_to_cent(self, manager):
+        """金额按十进制四舍五入到分"""
+        record = manager.createRecord({"type": "支出", "amount": "0.125", "date": "2025-01-01"})
+        assert record.amount == 13
+
+    def test_amount_below_one_cent_raises_error(self, manager):
+        """不足半分的金额四舍五入为 0，视为非正数"""
+        with pytest.raises(ValueError):
+            manager.createRecord({"type": "支出", "amount": 0.004, "date": "2025-01-01"})
+
+
+class TestRecordManagerCreateRecords:
+    """RecordManager.createRecords 批量创建测试类"""
+
+    @pytest.fixture
+    def manager(self):
+        """创建 RecordManager 实例，使用 Mock 数据库"""
+        manager = RecordManager()
+        manager.db = Mock()
+        manager.db.saveMany = Mock(side_effect=lambda rows, chunk_size: [str(i) for i in range(len(rows))])
+        return manager
+
+    def test_create_records_collects_errors(self, manager):
+        """测试: 无效行记录错误，有效行继续写入"""
+        result = manager.createRecords([
+            {"type": "支出", "amount": 10, "date": "2025-01-01"},
+            {"type": "借款", "amount": 10, "date": "2025-01-01"},
+            {"type": "收入", "amount": "abc", "date": "2025-01-01"},
+            {"type": "收入", "amount": 20, "date": "2025-01-02"},
+        ], chunk_size=100)
+
+        assert result["ids"] == ["0", "1"]
+        assert set(result["errors"]) == {1, 2}
+        assert "无效的记录类型" in result["errors"][1]
+        saved_rows = manager.db.saveMany.call_args[0][0]
+        assert [row["date"] for row in saved_rows] == [date(2025, 1, 1), date(2025, 1, 2)]
+        assert manager.db.saveMany.call_args[1] == {"chunk_size": 100}
+
+    def test_create_records_all_invalid(self, manager):
+        """测试: 全部无效时不访问数据库"""
+        result = manager.createRecords([{"type": None}])
+        assert result == {"ids": [], "errors": {0: "记录类型不能为空"}, "duplicates": {}}
+        manager.db.saveMany.assert_not_called()
+
+
+class TestRecordManagerCreateRecordAsync:
+    """RecordManager.createRecordAsync 测试类"""
+
+    @pytest.fixture
+    def manager(self):
+        """创建 RecordManager 实例，使用 Mock 数据库"""
+        manager = RecordManager()
+        manager.db = Mock()
+        return manager
+
+    def test_create_record_async(self, manager):
+        """测试: 写入完成后 Future 返回 Record"""
+        id_future = Future()
+        manager.db.saveDataAsync = Mock(return_value=id_future)
+        record_future = manager.createRecordAsync({"type": "支出", "amount": 12, "date": "2025-01-01"})
+        assert not record_future.done()
+        id_future.set_result("42")
+        assert record_future.result().record_id == "42"
+        assert record_future.result().date == date(2025, 1, 1)
+
+    def test_create_record_async_validates_first(self, manager):
+        """测试: 无效数据立即抛出 ValueError"""
+        with pytest.raises(ValueError):
+            manager.createRecordAsync({"type": "支出", "amount": -1, "date": "2025-01-01"})
+        manager.db.saveDataAsync.assert_not_called()
+
+    def test_create_record_async_propagates_error(self, manager):
+        """测试: 写入失败时 Future 带上异常"""
+        id_future = Future()
+        manager.db.saveDataAsync = Mock(return_value=id_future)
+        record_future = manager.createRecordAsync({"type": "支出", "amount": 12, "date": "2025-01-01"})
+        id_future.set_exception(RuntimeError("disk full"))
+        assert isinstance(record_future.exception(), RuntimeError)
 
 
 class TestRecordManagerDeleteRecord:
@@ -324,8 +426,8 @@ class TestRecordManagerGetRecords:
     def test_get_all_records(self, manager):
         """测试24: 获取所有记录"""
         mock_data = [
-            {"id": "1", "type": "支出", "amount": 50.0, "date": "2025-10-31", "note": "午餐"},
-            {"id": "2", "type": "收入", "amount": 1000.0, "date": "2025-10-30", "note": "工资"},
+            {"id": "1", "type": "支出", "amount": 5000, "date": "2025-10-31", "note": "午餐"},
+            {"id": "2", "type": "收入", "amount": 100000, "date": "2025-10-30", "note": "工资"},
         ]
         manager.db.fetchData = Mock(return_value=mock_data)
         
@@ -333,12 +435,12 @@ class TestRecordManagerGetRecords:
         
         assert len(records) == 2
         assert records[0].record_id == "1"
-        assert records[1].amount == 1000.0
+        assert records[1].amount == 100000
     
     def test_get_records_with_filter(self, manager):
         """测试25: 按类型筛选记录"""
         mock_data = [
-            {"id": "1", "type": "支出", "amount": 50.0, "date": "2025-10-31", "note": "午餐"},
+            {"id": "1", "type": "支出", "amount": 5000, "date": "2025-10-31", "note": "午餐"},
         ]
         manager.db.fetchData = Mock(return_value=mock_data)
         
@@ -368,14 +470,345 @@ class TestRecordManagerTagAndPhoto:
     
     def test_add_tag_to_record(self, manager):
         """测试27: 为记录添加标签"""
-        # 方法只是打印，无返回值，验证不抛异常即可
         result = manager.addTagToRecord("record_123", "餐饮")
         assert result is None
+        manager.db.addTag.assert_called_once_with("record_123", "餐饮")
     
     def test_add_photo_to_record(self, manager):
         """测试28: 为记录添加图片"""
         result = manager.addPhotoToRecord("record_123", "/path/to/photo.jpg")
         assert result is None
+        manager.db.addPhoto.assert_called_once_with("record_123", "/path/to/photo.jpg")
+
+    def test_add_tag_to_missing_record(self, manager):
+        """为不存在的记录添加标签抛出 ValueError"""
+        manager.db.addTag.return_value = False
+        with pytest.raises(ValueError):
+            manager.addTagToRecord("record_404", "餐饮")
+
+    def test_add_empty_tag(self, manager):
+        """空标签名抛出 ValueError"""
+        with pytest.raises(ValueError):
+            manager.addTagToRecord("record_123", "  ")
+        manager.db.addTag.assert_not_called()
+
+
+class TestRecordManagerJournal:
+    """RecordManager 写入变更日志与从日志恢复"""
+
+    def test_writes_are_journaled(self, sqlite_manager, tmp_path):
+        """新建、标签、图片、批量新建、删除依次写入日志"""
+        photo = tmp_path / "1.jpg"
+        photo.write_bytes(b"jpg")
+        record = sqlite_manager.createRecord({"type": "支出", "amount": 12.5, "date": "2025-03-01"})
+        sqlite_manager.addTagToRecord(record.record_id, "餐饮")
+        sqlite_manager.addPhotoToRecord(record.record_id, str(photo))
+        sqlite_manager.createRecords([{"type": "收入", "amount": 100, "date": "2025-03-02"}])
+        sqlite_manager.deleteRecord(record.record_id)
+        ops = [e["op"] for e in journal_for(sqlite_manager.db).events()]
+        assert ops == ["create", "tag", "photo", "create", "delete"]
+
+    def test_add_tag_to_missing_record(self, sqlite_manager):
+        """为不存在的记录添加标签时抛出 ValueError，不写日志"""
+        with pytest.raises(ValueError):
+            sqlite_manager.addTagToRecord("999", "餐饮")
+        assert list(journal_for(sqlite_manager.db).events()) == []
+
+    def test_recover_missing_records(self, sqlite_manager):
+        """从日志恢复数据库中缺失的记录 (含标签与月度汇总)，已存在的记录不重复恢复"""
+        record = sqlite_manager.createRecord({"type": "支出", "amount": 12.5, "date": "2025-03-01",
+                                              "tags": ["午餐"], "category": "餐饮"})
+        # 模拟从不包含该记录的旧备份还原
+        conn = sqlite_manager.db._get_connection()
+        with conn:
+            conn.execute("DELETE FROM records")
+        assert sqlite_manager.recoverFromJournal() == 1
+        rows = sqlite_manager.db.fetchData({"tag": "午餐"})
+        assert [r["id"] for r in rows] == [record.record_id]
+        assert sqlite_manager.db.checkMonthlyTotals() == []
+        assert sqlite_manager.recoverFromJournal() == 0
+
+    def test_cleanup_not_recovered(self, sqlite_manager):
+        """按保留期限清理的记录写入删除事件，恢复时不会恢复"""
+        sqlite_manager.createRecords([
+            {"type": "支出", "amount": 1, "date": "2020-03-01", "note": "过期"},
+            {"type": "支出", "amount": 2, "date": "2025-03-01", "note": "保留"},
+        ])
+        assert sqlite_manager.runCleanupJob("保存一年", today=date(2025, 6, 1)) == 1
+        assert sqlite_manager.recoverFromJournal() == 0
+        assert [r.note for r in sqlite_manager.getRecords({})] == ["保留"]
+
+    def test_partition_drop_not_recovered(self, tmp_path):
+        """整年删除的分区中的记录同样不会被恢复"""
+        manager = RecordManager()
+        manager.db = PartitionedDatabase(str(tmp_path / "parts.db"))
+        manager.db.initialize_database()
+        manager.createRecords([
+            {"type": "支出", "amount": 1, "date": "2020-03-01", "note": "过期"},
+            {"type": "支出", "amount": 2, "date": "2024-03-01", "note": "过期"},
+            {"type": "支出", "amount": 3, "date": "2025-03-01", "note": "保留"},
+        ])
+        assert manager.runCleanupJob("保存一年", today=date(2025, 6, 1)) == 2
+        assert manager.recoverFromJournal() == 0
+        assert [r.note for r in manager.getRecords({})] == ["保留"]
+        manager.db.close()
+
+
+class TestRecordManagerDedupe:
+    """RecordManager 按记录指纹去重"""
+
+    LUNCH = {"type": "支出", "amount": 12.5, "date": "2025-03-01", "note": "午餐"}
+
+    def test_duplicate_returns_existing(self, sqlite_manager):
+        """重复的记录不再插入，返回已有记录，不写日志"""
+        first = sqlite_manager.createRecord(self.LUNCH, dedupe=True)
+        events = len(list(journal_for(sqlite_manager.db).events()))
+        second = sqlite_manager.createRecord(dict(self.LUNCH), dedupe=True)
+        assert second.record_id == first.record_id
+        assert second.amount == 1250
+        assert len(sqlite_manager.getRecords({})) == 1
+        assert len(list(journal_for(sqlite_manager.db).events())) == events
+
+    def test_different_content_inserted(self, sqlite_manager):
+        """内容不同的记录正常写入"""
+        first = sqlite_manager.createRecord(self.LUNCH, dedupe=True)
+        second = sqlite_manager.createRecord(dict(self.LUNCH, amount=13), dedupe=True)
+        assert second.record_id != first.record_id
+        assert len(sqlite_manager.getRecords({})) == 2
+
+    def test_without_dedupe_always_inserted(self, sqlite_manager):
+        """不去重时相同内容也写入"""
+        sqlite_manager.createRecord(self.LUNCH, dedupe=True)
+        sqlite_manager.createRecord(self.LUNCH)
+        assert len(sqlite_manager.getRecords({})) == 2
+
+    def test_deleted_record_not_a_duplicate(self, sqlite_manager):
+        """已删除记录的指纹不再拦截相同内容的新记录"""
+        first = sqlite_manager.createRecord(self.LUNCH, dedupe=True)
+        sqlite_manager.deleteRecord(first.record_id)
+        second = sqlite_manager.createRecord(self.LUNCH, dedupe=True)
+        assert second.record_id != first.record_id
+        assert [r.record_id for r in sqlite_manager.getRecords({})] == [second.record_id]
+
+    def test_batch_duplicates(self, sqlite_manager):
+        """批量去重：已存在的行与批内重复的行记入 duplicates，行号对应输入位置"""
+        existing = sqlite_manager.createRecord(self.LUNCH, dedupe=True)
+        result = sqlite_manager.createRecords([
+            {"type": "借款", "amount": 1, "date": "2025-03-01"},
+            dict(self.LUNCH),
+            dict(self.LUNCH, note="晚餐"),
+            dict(self.LUNCH, note="晚餐"),
+        ], dedupe=True)
+        assert set(result["errors"]) == {0}
+        assert len(result["ids"]) == 1
+        assert result["duplicates"] == {1: existing.record_id, 3: result["ids"][0]}
+        assert sorted(r.note for r in sqlite_manager.getRecords({})) == ["午餐", "晚餐"]
+        ops = [e["op"] for e in journal_for(sqlite_manager.db).events()]
+        assert ops == ["create", "create"]
+
+    def test_batch_all_duplicates(self, sqlite_manager):
+        """整批重复时不写入新记录"""
+        sqlite_manager.createRecords([self.LUNCH], dedupe=True)
+        result = sqlite_manager.createRecords([self.LUNCH], dedupe=True)
+        assert result["ids"] == []
+        assert list(result["duplicates"]) == [0]
+        assert len(sqlite_manager.getRecords({})) == 1
+
+
+class TestRecordManagerSources:
+    """记录指纹中的来源"""
+
+    LUNCH = {"type": "支出", "amount": 12.5, "date": "2025-03-01", "note": "午餐"}
+
+    def test_same_source_is_duplicate(self, sqlite_manager):
+        """同一来源 (如同一张 OCR 图片) 的相同内容只写入一次"""
+        first = sqlite_manager.createRecord(self.LUNCH, dedupe=True, source="sha256-a")
+        second = sqlite_manager.createRecord(self.LUNCH, dedupe=True, source="sha256-a")
+        assert second.record_id == first.record_id
+
+    def test_different_sources_inserted(self, sqlite_manager):
+        """内容相同、来源不同 (如两张小票) 时都写入，也不与无来源的记录重复"""
+        ids = {
+            sqlite_manager.createRecord(self.LUNCH, dedupe=True, source=source).record_id
+            for source in ("sha256-a", "sha256-b", None)
+        }
+        assert len(ids) == 3
+
+    def test_batch_sources(self, sqlite_manager):
+        """批量写入时 sources 与行一一对应：同一账单行重复导入时跳过"""
+        rows = [self.LUNCH, self.LUNCH]
+        first = sqlite_manager.createRecords(rows, dedupe=True, sources=["bill:2", "bill:3"])
+        assert len(first["ids"]) == 2 and first["duplicates"] == {}
+        again = sqlite_manager.createRecords(rows + [self.LUNCH], dedupe=True,
+                                             sources=["bill:2", "bill:3", "bill:4"])
+        assert again["duplicates"] == {0: first["ids"][0], 1: first["ids"][1]}
+        assert len(again["ids"]) == 1
+        assert len(sqlite_manager.getRecords({})) == 3
+
+    def test_sources_follow_valid_rows(self, sqlite_manager):
+        """无效行不影响后续行的来源对应关系"""
+        sqlite_manager.createRecords([self.LUNCH], dedupe=True, sources=["bill:3"])
+        result = sqlite_manager.createRecords([{"type": None}, self.LUNCH], dedupe=True,
+                                              sources=["bill:2", "bill:3"])
+        assert set(result["errors"]) == {0}
+        assert list(result["duplicates"]) == [1]
+        assert result["ids"] == []
+
+
+class TestRecordManagerEvents:
+    """RecordManager 发布的记录变更事件"""
+
+    @pytest.fixture
+    def events(self, sqlite_manager):
+        """经事件总线订阅全部事件，返回收到的 (类型, 行) 列表"""
+        received = []
+        unsubscribe = event_bus_for(sqlite_manager.db).subscribe(
+            lambda event: received.append((event.kind, list(event.rows)))
+        )
+        yield received
+        unsubscribe()
+
+    @staticmethod
+    def _row(record_id, amount, record_date, note):
+        return {"id": record_id, "type": "支出", "amount": amount, "date": record_date, "note": note}
+
+    def test_create_events(self, sqlite_manager, events):
+        """单条与批量新建发布新建事件，金额为分"""
+        record = sqlite_manager.createRecord({"type": "支出", "amount": 12.5, "date": "2025-03-01", "note": "午餐"})
+        ids = sqlite_manager.createRecords([{"type": "支出", "amount": 3, "date": "2025-03-02"}])["ids"]
+        assert events == [
+            (RECORDS_CREATED, [self._row(record.record_id, 1250, "2025-03-01", "午餐")]),
+            (RECORDS_CREATED, [self._row(ids[0], 300, "2025-03-02", "")]),
+        ]
+
+    def test_update_event(self, sqlite_manager, events):
+        """添加标签发布修改事件"""
+        record = sqlite_manager.createRecord({"type": "支出", "amount": 1, "date": "2025-03-01"})
+        sqlite_manager.addTagToRecord(record.record_id, "餐饮")
+        assert events[-1] == (RECORDS_UPDATED, [self._row(record.record_id, 100, "2025-03-01", "")])
+
+    def test_delete_and_undo_events(self, sqlite_manager, events):
+        """删除事件带有被删除行的内容，已删除的记录不重复通知；撤销删除发布新建事件"""
+        ids = sqlite_manager.createRecords([
+            {"type": "支出", "amount": 1, "date": "2025-03-01", "note": "早餐"},
+            {"type": "支出", "amount": 2, "date": "2025-03-02", "note": "午餐"},
+        ])["ids"]
+        del events[:]
+        assert sqlite_manager.deleteRecord(ids[0])
+        assert sqlite_manager.deleteRecords(ids) == [ids[1]]
+        assert sqlite_manager.undoDelete(ids) == ids
+        assert events == [
+            (RECORDS_DELETED, [self._row(ids[0], 100, "2025-03-01", "早餐")]),
+            (RECORDS_DELETED, [self._row(ids[1], 200, "2025-03-02", "午餐")]),
+            (RECORDS_CREATED, [self._row(ids[0], 100, "2025-03-01", "早餐"),
+                               self._row(ids[1], 200, "2025-03-02", "午餐")]),
+        ]
+
+    def test_undo_nothing(self, sqlite_manager, events):
+        """没有可恢复的记录时不发布事件"""
+        assert sqlite_manager.undoDelete(["404"]) == []
+        assert events == []
+
+    def test_cleanup_event(self, sqlite_manager, events):
+        """按保留期限清理发布删除事件"""
+        old = sqlite_manager.createRecord({"type": "支出", "amount": 1, "date": "2020-03-01", "note": "过期"})
+        sqlite_manager.createRecord({"type": "支出", "amount": 2, "date": "2025-03-01"})
+        del events[:]
+        assert sqlite_manager.runCleanupJob("保存一年", today=date(2025, 6, 1)) == 1
+        assert events == [(RECORDS_DELETED, [self._row(old.record_id, 100, "2020-03-01", "过期")])]
+
+    def test_manager_subscribe(self, sqlite_manager):
+        """RecordManager.subscribe 按类型订阅并可取消；Mock 数据库不支持订阅"""
+        deleted = []
+        unsubscribe = sqlite_manager.subscribe(lambda event: deleted.append(event.ids), kinds=[RECORDS_DELETED])
+        record = sqlite_manager.createRecord({"type": "支出", "amount": 1, "date": "2025-03-01"})
+        sqlite_manager.deleteRecord(record.record_id)
+        unsubscribe()
+        sqlite_manager.undoDelete([record.record_id])
+        sqlite_manager.deleteRecord(record.record_id)
+        assert deleted == [[record.record_id]]
+
+        manager = RecordManager()
+        manager.db = Mock()
+        with pytest.raises(ValueError):
+            manager.subscribe(lambda event: None)
+
+
+class TestRecordManagerQuery:
+    """RecordManager.getRecordsByQuery 组合查询"""
+
+    ROWS = [
+        {"type": "支出", "amount": 12.5, "date": "2025-02-28", "note": "午餐", "tags": "餐饮"},
+        {"type": "支出", "amount": 88, "date": "2025-03-01", "note": "聚餐", "tags": "餐饮,朋友"},
+        {"type": "收入", "amount": 5000, "date": "2025-03-05", "note": "工资"},
+        {"type": "支出", "amount": 88, "date": "2025-03-20", "note": "晚餐"},
+        {"type": "支出", "amount": 200, "date": "2025-04-02", "note": "电影"},
+    ]
+
+    QUERIES = [
+        RecordQuery(),
+        RecordQuery().of_type("支出").during("2025-03"),
+        RecordQuery().between(None, "2025-03-02").order_by("date_asc"),
+        RecordQuery().amount_between(5000, 20000).order_by("amount_desc"),
+        RecordQuery().of_type("支出").order_by("amount_asc").take(2),
+    ]
+
+    @pytest.fixture
+    def manager(self, sqlite_manager):
+        """写入 ROWS 的 RecordManager，结束时关闭内存快照"""
+        sqlite_manager.createRecords(self.ROWS)
+        yield sqlite_manager
+        disable_snapshot(sqlite_manager.db)
+
+    @staticmethod
+    def _notes(records):
+        return [r.note for r in records]
+
+    def test_sql_path(self, manager):
+        """未开启快照时编译为 SQL：类型、日期、金额组合筛选与排序"""
+        query = RecordQuery().of_type("支出").between("2025-03-01", "2025-05-01").amount_between(8800, None)
+        assert self._notes(manager.getRecordsByQuery(query.order_by("amount_desc"))) == ["电影", "晚餐", "聚餐"]
+        assert self._notes(manager.getRecordsByQuery(query.take(1))) == ["电影"]
+
+    def test_sql_path_with_tags_and_prefetch(self, manager):
+        """标签条件走 SQL，预取标签"""
+        records = manager.getRecordsByQuery(RecordQuery().with_tags(["餐饮"]), prefetch=("tags",))
+        assert self._notes(records) == ["聚餐", "午餐"]
+        assert sorted(t.name for t in records[0].tags) == ["朋友", "餐饮"]
+
+    @pytest.mark.parametrize("query", QUERIES)
+    def test_snapshot_matches_sql(self, manager, query):
+        """开启快照后在快照上筛选、排序、截取，结果与 SQL 一致，且不执行 SQL 查询"""
+        expected = self._notes(manager.getRecordsByQuery(query))
+        enable_snapshot(manager.db)
+        manager.db.fetchQuery = Mock(side_effect=AssertionError("快照路径不应执行 SQL 查询"))
+        assert self._notes(manager.getRecordsByQuery(query)) == expected
+
+    def test_snapshot_amount_ties(self, manager):
+        """快照路径按金额排序时，同金额的行保持日期倒序"""
+        enable_snapshot(manager.db)
+        records = manager.getRecordsByQuery(RecordQuery().amount_between(8800, 8800).order_by("amount_desc"))
+        assert [str(r.date) for r in records] == ["2025-03-20", "2025-03-01"]
+
+    def test_snapshot_tag_query_falls_back_to_sql(self, manager):
+        """快照不支持标签条件，回退到 SQL"""
+        enable_snapshot(manager.db)
+        assert self._notes(manager.getRecordsByQuery(RecordQuery().with_tags(["朋友"]))) == ["聚餐"]
+
+    def test_snapshot_follows_writes(self, manager):
+        """新建、删除后快照增量更新"""
+        enable_snapshot(manager.db)
+        top = RecordQuery().of_type("支出").order_by("amount_desc").take(1)
+        assert self._notes(manager.getRecordsByQuery(top)) == ["电影"]
+        phone = manager.createRecord({"type": "支出", "amount": 999, "date": "2025-03-10", "note": "手机"})
+        assert self._notes(manager.getRecordsByQuery(top)) == ["手机"]
+        manager.deleteRecord(phone.record_id)
+        assert self._notes(manager.getRecordsByQuery(top)) == ["电影"]
+
+    def test_unknown_prefetch(self, manager):
+        """不支持的预取关联抛出 ValueError"""
+        with pytest.raises(ValueError):
+            manager.getRecordsByQuery(RecordQuery(), prefetch=("comments",))
 
 
 if __name__ == "__main__":
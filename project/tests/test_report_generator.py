@@ -0,0 +1,65 @@
+"""
+ReportGenerator 单元测试
+
+测试策略：Mock 数据库返回的月度汇总数据
+覆盖以下场景：
+1. 月度报告的收入、支出与分类汇总
+2. 对比报告的增减变化，上月无支出时不除以零
+3. 跨年 (1 月与上年 12 月) 对比
+"""
+
+import pytest
+import sys
+import os
+from datetime import date
+from unittest.mock import Mock
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logic.report_generator import ReportGenerator
+
+
+class TestReportGenerator:
+    """ReportGenerator 测试类"""
+
+    @pytest.fixture
+    def generator(self):
+        """创建 ReportGenerator 实例，使用 Mock 数据库"""
+        totals = {
+            "2025-12": [("收入", "其他", 5000.0), ("支出", "餐饮", 300.0), ("支出", "交通", 50.0)],
+            "2026-01": [("支出", "餐饮", 450.0), ("支出", "购物", 200.0)],
+        }
+        generator = ReportGenerator()
+        generator.db = Mock()
+        generator.db.fetchMonthlyTotals = Mock(side_effect=lambda month: totals.get(month, []))
+        return generator
+
+    def test_monthly_report(self, generator):
+        """测试1: 月度报告汇总收入、支出与分类"""
+        report = generator.generateMonthlyReport(date(2025, 12, 15))
+        assert report == {
+            "total_income": 5000.0,
+            "total_expense": 350.0,
+            "pie_chart_data": {"餐饮": 300.0, "交通": 50.0},
+        }
+        generator.db.fetchMonthlyTotals.assert_called_once_with("2025-12")
+
+    def test_comparison_report_across_year(self, generator):
+        """测试2: 1 月与上一年 12 月对比"""
+        comparison = generator.generateComparisonReport(date(2026, 1, 10))
+        assert comparison["餐饮"] == {"change": 150.0, "percent": 0.5}
+        assert comparison["交通"] == {"change": -50.0, "percent": -1.0}
+
+    def test_comparison_report_without_last_month(self, generator):
+        """测试3: 上月没有该分类支出时 percent 为 None"""
+        comparison = generator.generateComparisonReport(date(2026, 1, 10))
+        assert comparison["购物"] == {"change": 200.0, "percent": None}
+
+    def test_empty_month(self, generator):
+        """测试4: 无数据的月份"""
+        assert generator.generateComparisonReport(date(2024, 6, 1)) == {}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,106 @@
+"""
+LedgerSnapshot 内存列式快照测试
+
+测试策略：与 SQLite 查询结果对照
+覆盖以下场景：
+1. 懒加载与按 (日期, ID) 排序
+2. RecordManager 写操作的增量更新
+3. QueryService / ReportGenerator 基于快照的筛选与汇总
+4. 数据清理后快照失效重载
+"""
+
+import pytest
+import sys
+import os
+from datetime import date
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.database import LocalDatabase
+from data.snapshot import enable_snapshot, disable_snapshot, get_snapshot
+from logic.record_manager import RecordManager
+from logic.query_service import QueryService
+from logic.report_generator import ReportGenerator
+
+
+@pytest.fixture
+def manager(tmp_path):
+    """创建使用临时数据库的 RecordManager"""
+    manager = RecordManager()
+    manager.db = LocalDatabase(str(tmp_path / "app.db"))
+    manager.db.initialize_database()
+    manager.createRecords([
+        {"type": "支出", "amount": 12.5, "date": "2025-09-30", "category": "餐饮"},
+        {"type": "收入", "amount": 8000, "date": "2025-10-01"},
+        {"type": "支出", "amount": 30.1, "date": "2025-10-01", "category": "交通"},
+        {"type": "支出", "amount": 0.2, "date": "2025-10-15", "category": "餐饮"},
+    ])
+    yield manager
+    disable_snapshot(manager.db)
+    manager.db.close()
+
+
+class TestLedgerSnapshot:
+    """LedgerSnapshot 测试类"""
+
+    def test_lazy_load(self, manager):
+        """测试1: 开启后首次使用才加载"""
+        snapshot = enable_snapshot(manager.db)
+        assert get_snapshot(manager.db) is snapshot
+        assert not snapshot._loaded
+        assert len(snapshot) == 4
+        assert list(snapshot.cents) == [1250, 800000, 3010, 20]
+
+    def test_select_matches_sql_order(self, manager):
+        """测试2: 筛选结果与 SQL 列表顺序一致"""
+        snapshot = enable_snapshot(manager.db)
+        expected = [int(r["id"]) for r in manager.db.fetchData({"type": "支出"})]
+        assert snapshot.select_ids("支出") == expected
+        assert snapshot.select_ids(start=date(2025, 10, 1), end=date(2025, 10, 2)) == \
+            [int(r["id"]) for r in manager.db.fetchData({"date": "2025-10-01"})]
+
+    def test_incremental_patch_on_write(self, manager):
+        """测试3: 创建与删除记录后快照增量更新"""
+        snapshot = enable_snapshot(manager.db)
+        snapshot.ensure_loaded()
+        record = manager.createRecord({"type": "支出", "amount": 5, "date": "2025-10-01", "category": "餐饮"})
+        assert int(record.record_id) in snapshot.select_ids("支出", date(2025, 10, 1), date(2025, 10, 2))
+        assert manager.deleteRecord(record.record_id) is True
+        assert len(snapshot) == 4
+        assert snapshot.totals_by_category(date(2025, 10, 1), date(2025, 11, 1)) == {
+            ("收入", "其他"): 800000, ("支出", "交通"): 3010, ("支出", "餐饮"): 20,
+        }
+
+    def test_sum_by_filter_matches_sql(self, manager):
+        """测试4: QueryService 快照合计与 SQL 合计一致"""
+        service = QueryService()
+        service.manager = manager
+        args = ("支出", date(2025, 10, 1), date(2025, 11, 1))
+        expected = service.sum_by_filter(*args)
+        enable_snapshot(manager.db)
+        assert service.sum_by_filter(*args) == expected == 3030
+        assert service.sum_by_filter() == 804280
+
+    def test_report_from_snapshot_matches_rollup(self, manager):
+        """测试5: ReportGenerator 快照结果与汇总表一致"""
+        generator = ReportGenerator()
+        generator.db = manager.db
+        expected = generator.generateMonthlyReport(date(2025, 10, 20))
+        enable_snapshot(manager.db)
+        report = generator.generateMonthlyReport(date(2025, 10, 20))
+        assert report["pie_chart_data"] == pytest.approx(expected["pie_chart_data"])
+        assert report["total_expense"] == pytest.approx(expected["total_expense"])
+        assert report["total_income"] == pytest.approx(expected["total_income"])
+
+    def test_cleanup_invalidates_snapshot(self, manager):
+        """测试6: 数据清理后快照重新加载"""
+        snapshot = enable_snapshot(manager.db)
+        snapshot.ensure_loaded()
+        manager.db.run_cleanup_job("保存半年", today=date(2026, 4, 10))
+        assert snapshot.select_ids() == [int(r["id"]) for r in manager.db.fetchData({})]
+        assert len(snapshot) == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
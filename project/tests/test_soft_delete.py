@@ -0,0 +1,185 @@
+"""
+软删除 (墓碑) 与后台清理测试
+
+测试策略：使用临时 SQLite 文件
+覆盖以下场景：
+1. 删除后记录对列表、合计、月度汇总、全文检索、标签筛选与去重不可见
+2. 批量删除与撤销删除 (月度汇总、快照、变更日志同步恢复)
+3. purgeDeleted 分批物理删除墓碑记录及其标签关联、全文检索、指纹与图片
+4. 保留期内的墓碑不被清理；后台清理线程定期清理，关闭数据库时停止
+5. 按年分区存储的批量删除、撤销与清理
+"""
+
+import pytest
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.database import LocalDatabase
+from data.journal import journal_for
+from data.partitions import PartitionedDatabase
+from data.snapshot import enable_snapshot
+from logic.record_manager import RecordManager
+
+
+@pytest.fixture
+def manager(tmp_path):
+    """使用临时数据库的 RecordManager，包含三条记录"""
+    manager = RecordManager()
+    manager.db = LocalDatabase(str(tmp_path / "app.db"))
+    manager.db.initialize_database()
+    receipt = tmp_path / "receipt.jpg"
+    receipt.write_bytes(b"receipt")
+    manager.ids = manager.createRecords([
+        {"type": "支出", "amount": 10, "date": "2025-03-01", "note": "午餐", "tags": "餐饮",
+         "photos": [str(receipt)]},
+        {"type": "支出", "amount": 20, "date": "2025-03-02", "note": "晚餐", "tags": "餐饮"},
+        {"type": "收入", "amount": 300, "date": "2025-03-03", "note": "工资"},
+    ], dedupe=True)["ids"]
+    yield manager
+    manager.db.close()
+
+
+def _count(db, table):
+    return db._get_connection().execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+class TestTombstones:
+    """墓碑记录对查询不可见"""
+
+    def test_hidden_from_queries(self, manager):
+        db = manager.db
+        lunch = manager.ids[0]
+        assert manager.deleteRecord(lunch)
+        assert not manager.deleteRecord(lunch)
+
+        assert [r["note"] for r in db.fetchData({})] == ["工资", "晚餐"]
+        assert db.sumAmount({"type": "支出"}) == 2000
+        assert sorted(db.fetchMonthlyTotals("2025-03")) == [("支出", "其他", 2000), ("收入", "其他", 30000)]
+        assert db.checkMonthlyTotals() == []
+        assert db.searchText("午餐") == []
+        assert db.fetchByNote("午餐") == []
+        assert db.fetchByIds([lunch]) == []
+        assert db.tagRecordIds("餐饮") == {int(manager.ids[1])}
+        # 行仍在表中，等待物理删除
+        assert _count(db, "records") == 3
+
+    def test_tombstoned_record_rejects_tags(self, manager):
+        manager.deleteRecord(manager.ids[0])
+        assert not manager.db.addTag(manager.ids[0], "新标签")
+
+    def test_dedupe_ignores_tombstones(self, manager):
+        manager.deleteRecord(manager.ids[0])
+        again = manager.createRecord(
+            {"type": "支出", "amount": 10, "date": "2025-03-01", "note": "午餐"}, dedupe=True
+        )
+        assert again.record_id not in manager.ids
+
+
+class TestBulkDeleteAndUndo:
+    """批量删除与撤销"""
+
+    def test_bulk_delete(self, manager):
+        deleted = manager.deleteRecords(manager.ids[:2] + ["999"])
+        assert sorted(deleted, key=int) == manager.ids[:2]
+        assert manager.db.sumAmount({"type": "支出"}) == 0
+        assert manager.deleteRecords(manager.ids[:2]) == []
+
+    def test_undo_restores_everything(self, manager):
+        db = manager.db
+        before = sorted(db.fetchMonthlyTotals("2025-03"))
+        manager.deleteRecords(manager.ids)
+        assert db.fetchMonthlyTotals("2025-03") == []
+
+        restored = manager.undoDelete(manager.ids)
+        assert sorted(restored, key=int) == manager.ids
+        assert sorted(db.fetchMonthlyTotals("2025-03")) == before
+        assert [r.note for r in manager.getRecordsByTags(["餐饮"])] == ["晚餐", "午餐"]
+        assert db.checkMonthlyTotals() == []
+
+    def test_undo_after_purge(self, manager):
+        manager.deleteRecords(manager.ids[:1])
+        manager.db.purgeDeleted()
+        assert manager.undoDelete(manager.ids[:1]) == []
+
+    def test_snapshot_and_journal(self, manager):
+        snapshot = enable_snapshot(manager.db)
+        journal = journal_for(manager.db)
+        assert len(snapshot) == 3
+
+        manager.deleteRecords(manager.ids[:2])
+        assert len(snapshot) == 1
+        assert list(journal.state()) == [manager.ids[2]]
+
+        manager.undoDelete(manager.ids[:2])
+        assert len(snapshot) == 3
+        assert snapshot.total_cents("支出") == 3000
+        restored = journal.state()[manager.ids[0]]
+        assert (restored["note"], restored["tags"], restored["amount"]) == ("午餐", ["餐饮"], 1000)
+
+
+class TestPurge:
+    """物理删除"""
+
+    def test_purge_removes_related_rows(self, manager):
+        db = manager.db
+        manager.deleteRecords(manager.ids[:2])
+        sha256 = db._get_connection().execute("SELECT sha256 FROM photos").fetchone()[0]
+
+        assert db.purgeDeleted(batch_size=1) == 2
+        assert _count(db, "records") == 1
+        assert _count(db, "record_tags") == 0
+        assert _count(db, "photos") == 0
+        assert _count(db, "record_fingerprints") == 1
+        assert not db.photoStore().exists(sha256)
+        assert db._get_connection().execute(
+            "SELECT COUNT(*) FROM records_fts WHERE rowid IN (?, ?)", [int(i) for i in manager.ids[:2]]
+        ).fetchone()[0] == 0
+        # 月度汇总不重复扣除
+        assert db.checkMonthlyTotals() == []
+        assert db.purgeDeleted() == 0
+
+    def test_grace_period(self, manager):
+        manager.deleteRecord(manager.ids[0])
+        assert manager.db.purgeDeleted(before=datetime.now() - timedelta(minutes=10)) == 0
+        assert manager.db.purgeDeleted(before=datetime.now() + timedelta(seconds=1)) == 1
+
+    def test_purge_worker(self, manager):
+        worker = manager.db.startPurgeWorker(interval=0.01, grace=-1)
+        assert manager.db.startPurgeWorker() is worker
+        manager.deleteRecords(manager.ids[:2])
+        worker.wake()
+        deadline = time.time() + 5
+        while _count(manager.db, "records") > 1 and time.time() < deadline:
+            time.sleep(0.01)
+        assert _count(manager.db, "records") == 1
+        manager.db.close()
+        assert not worker._thread.is_alive()
+
+    def test_invalid_batch_size(self, manager):
+        with pytest.raises(ValueError):
+            manager.db.purgeDeleted(batch_size=0)
+
+
+class TestPartitions:
+    """按年分区存储"""
+
+    def test_bulk_delete_across_years(self, tmp_path):
+        manager = RecordManager()
+        manager.db = PartitionedDatabase(str(tmp_path / "app.db"))
+        manager.db.initialize_database()
+        ids = manager.createRecords([
+            {"type": "支出", "amount": 1, "date": "2024-12-31"},
+            {"type": "支出", "amount": 2, "date": "2025-01-01"},
+        ])["ids"]
+
+        assert sorted(manager.deleteRecords(ids), key=int) == ids
+        assert manager.db.fetchData({}) == []
+        assert sorted(manager.undoDelete(ids[:1])) == ids[:1]
+        assert [r["date"] for r in manager.db.fetchData({})] == ["2024-12-31"]
+        assert manager.db.purgeDeleted() == 1
+        manager.db.close()
@@ -0,0 +1,114 @@
+"""
+标签字典测试
+
+测试策略：使用临时 SQLite 文件
+覆盖以下场景：
+1. 标签输入整理 (逗号分隔、去重、空名称)
+2. 同名标签共享同一个 Tag 对象
+3. 标签筛选按 tag_id 执行，多标签按整数集合求交集/并集
+4. 数据清理删除标签后缓存失效
+"""
+
+import pytest
+import sys
+import os
+from datetime import date
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.database import LocalDatabase
+from data.tags import UNKNOWN_TAG_ID, split_tag_names
+from logic.query_service import QueryService
+from logic.record_manager import RecordManager
+
+
+@pytest.fixture
+def db(tmp_path):
+    """创建已初始化的临时数据库"""
+    database = LocalDatabase(str(tmp_path / "app.db"))
+    database.initialize_database()
+    yield database
+    database.close()
+
+
+@pytest.fixture
+def service(db):
+    """使用临时数据库的 QueryService，包含三条带标签的记录"""
+    service = QueryService()
+    service.manager.db = db
+    service.manager.createRecords([
+        {"type": "支出", "amount": 10, "date": "2025-03-01", "note": "午餐", "tags": "餐饮, 工作"},
+        {"type": "支出", "amount": 20, "date": "2025-03-02", "note": "晚餐", "tags": ["餐饮"]},
+        {"type": "支出", "amount": 30, "date": "2025-03-03", "note": "打车", "tags": "交通，工作"},
+    ])
+    return service
+
+
+class TestSplitTagNames:
+    """标签输入整理"""
+
+    @pytest.mark.parametrize("value, expected", [
+        ("餐饮", ["餐饮"]),
+        ("餐饮, 工作，餐饮", ["餐饮", "工作"]),
+        ("", []),
+        (" , ,", []),
+        (None, []),
+        (["a ", "", "b", "a"], ["a", "b"]),
+    ])
+    def test_split(self, value, expected):
+        assert split_tag_names(value) == expected
+
+
+class TestTagDictionary:
+    """标签字典"""
+
+    def test_same_tag_shared(self, db, service):
+        tags = db.tagDictionary()
+        first = tags.lookup("餐饮")
+        assert first is tags.lookup(" 餐饮 ")
+        assert first is tags.get(first.tag_id)
+        assert isinstance(first.tag_id, int)
+        assert [t.name for t in tags.load_all()] == sorted(["餐饮", "工作", "交通"])
+        assert tags.load_all()[0] is tags.lookup(tags.load_all()[0].name)
+
+    def test_unknown_tag(self, db, service):
+        assert db.tagDictionary().lookup("不存在") is None
+        assert db.tagDictionary().tag_id("不存在") == UNKNOWN_TAG_ID
+        assert db.fetchData({"tag": "不存在"}) == []
+
+    def test_tag_filter_compares_integers(self, db, service):
+        rows = db.fetchData({"tag": "工作"})
+        assert [r["note"] for r in rows] == ["打车", "午餐"]
+        tag_id = db.tagDictionary().lookup("工作").tag_id
+        assert db.fetchData({"tag": tag_id}) == rows
+
+    def test_cleanup_clears_cache(self, db, service):
+        old = db.tagDictionary().lookup("交通")
+        assert db.run_cleanup_job("保存一年", today=date(2026, 6, 1)) == 3
+        assert db.tagDictionary().lookup("交通") is None
+        db.saveData({"type": "支出", "amount": 1, "date": "2026-05-01", "tags": ["新标签"]})
+        # 被删除的 tag_id 可能已被复用，缓存不能再返回旧名称
+        assert db.tagDictionary().get(old.tag_id) in (None, db.tagDictionary().lookup("新标签"))
+
+
+class TestTagSetFilters:
+    """多标签筛选"""
+
+    def test_match_all(self, service):
+        records = service.search_by_tags(["餐饮", "工作"])
+        assert [r.note for r in records] == ["午餐"]
+
+    def test_match_any(self, service):
+        records = service.search_by_tags(["餐饮", "工作"], match_all=False)
+        assert [r.note for r in records] == ["打车", "晚餐", "午餐"]
+
+    def test_search_records_by_comma_separated_tags(self, service):
+        assert [r.note for r in service.search_records("工作，交通", "tag")] == ["打车"]
+        assert service.search_records("不存在", "tag") == []
+
+    def test_manager_normalizes_tag_string(self, db):
+        manager = RecordManager()
+        manager.db = db
+        manager.createRecord({"type": "支出", "amount": 1, "date": "2025-03-01", "tags": "a,b,,a"})
+        assert [t.name for t in db.tagDictionary().load_all()] == ["a", "b"]
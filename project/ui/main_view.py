@@ -1,19 +1,31 @@
+import threading
 import tkinter as tk
-from tkinter import ttk, messagebox
+from bisect import bisect_left
+from tkinter import ttk, messagebox, filedialog
+from logic.import_service import ImportReport, ImportService
 from logic.query_service import QueryService
+from logic.record_events import RECORDS_CREATED, RECORDS_DELETED, RECORDS_UPDATED, RecordEvent
+from data.money import format_cents
 from .record_view import RecordView
 from .report_view import ReportView
 from .reminder_view import ReminderView
 from .settings_view import SettingsView
-from typing import Any
+from typing import Any, Dict, List, Optional, Tuple
 class MainView(tk.Frame):
     def __init__(self, master:Any) ->None:
         super().__init__(master)
         
         self.query_service = QueryService()
+        # 最近一次删除的记录 ID，用于撤销
+        self._last_deleted: List[str] = []
+        # 列表中各行的排序键 (date, record_id)，升序保存；列表按倒序显示
+        self._row_keys: List[Tuple[str, int]] = []
+        self._key_of: Dict[str, Tuple[str, int]] = {}
 
         self.create_widgets()
         self.load_records()
+        # 记录变更后按事件增量更新列表，不再整体重新加载
+        self._unsubscribe = self.query_service.manager.subscribe(self.on_records_changed)
 
     def create_widgets(self)->None:
         # 顶部操作栏
@@ -24,6 +36,10 @@ class MainView(tk.Frame):
         add_btn = ttk.Button(top_frame, text="记一笔 (手动/OCR)", command=self.open_add_record)
         add_btn.pack(side="left", padx=5)
 
+        # 批量导入银行/支付宝/微信账单
+        self.import_btn = ttk.Button(top_frame, text="导入账单", command=self.import_statement)
+        self.import_btn.pack(side="left", padx=5)
+
         # (Req015) [cite: 64]
         report_btn = ttk.Button(top_frame, text="统计报告", command=self.open_reports)
         report_btn.pack(side="left", padx=5)
@@ -62,32 +78,160 @@ class MainView(tk.Frame):
         self.record_list.heading("note", text="备注")
         self.record_list.pack(fill="both", expand=True)
         
-        # (Req007) [cite: 35]
-        delete_btn = ttk.Button(self, text="删除选中记录", command=self.delete_selected_record)
-        delete_btn.pack(pady=5)
+        # (Req007) [cite: 35] 可多选删除，删除后可撤销
+        bottom_frame = tk.Frame(self)
+        bottom_frame.pack(fill="x", pady=5)
+        delete_btn = ttk.Button(bottom_frame, text="删除选中记录", command=self.delete_selected_record)
+        delete_btn.pack(side="left", padx=5)
+        self.undo_btn = ttk.Button(bottom_frame, text="撤销删除", command=self.undo_delete, state="disabled")
+        self.undo_btn.pack(side="left", padx=5)
+        self.status_var = tk.StringVar(value="")
+        tk.Label(bottom_frame, textvariable=self.status_var).pack(side="left", padx=5)
+        # 导入账单的进度条，导入期间显示
+        self.import_progress = ttk.Progressbar(bottom_frame, mode="determinate", maximum=1, length=120)
 
     def load_records(self) -> None:
-        """ 加载或刷新记录列表 """
+        """ 加载或刷新记录列表 (切换筛选条件时) """
         # 清空
         for i in self.record_list.get_children():
             self.record_list.delete(i)
+        self._row_keys = []
+        self._key_of = {}
             
         filter_val = self.filter_var.get()
         records = self.query_service.get_records_by_filter(filter_val)
         
         for record in records:
-            self.record_list.insert("", "end", values=(record.type, record.amount, record.date, record.note))
+            self.record_list.insert("", "end", iid=record.record_id, values=(record.type, format_cents(record.amount), record.date, record.note))
             # total = record.note+10  # 已注释：note为字符串变量，不能与整数相加
+            self._key_of[record.record_id] = (record.date.isoformat(), int(record.record_id))
+        self._row_keys = sorted(self._key_of.values())
+
+    def _matches_filter(self, row: Dict[str, Any]) -> bool:
+        filter_val = self.filter_var.get()
+        return filter_val not in ("收入", "支出") or row["type"] == filter_val
+
+    def on_records_changed(self, event: RecordEvent) -> None:
+        """ 记录变更事件的订阅者：来自后台线程 (清理、延迟写入等) 的事件切回界面线程处理 """
+        if threading.current_thread() is not threading.main_thread():
+            self.after(0, self._apply_event, event)
+            return
+        self._apply_event(event)
+
+    def _apply_event(self, event: RecordEvent) -> None:
+        """ 按变更事件增量更新列表：新增的行二分查找插入位置，删除、修改的行按 ID 直接定位 """
+        if event.kind == RECORDS_DELETED:
+            self._remove_rows(event.ids)
+            return
+        for row in event.rows:
+            if event.kind == RECORDS_UPDATED and self.record_list.exists(row["id"]):
+                self.record_list.item(row["id"], values=self._row_values(row))
+            elif event.kind == RECORDS_CREATED and self._matches_filter(row):
+                self._insert_row(row)
+
+    def _row_values(self, row: Dict[str, Any]) -> Tuple[Any, ...]:
+        return (row["type"], format_cents(row["amount"]), row["date"], row["note"])
+
+    def _insert_row(self, row: Dict[str, Any]) -> None:
+        if row["id"] in self._key_of:
+            return
+        key = (row["date"], int(row["id"]))
+        pos = bisect_left(self._row_keys, key)
+        self._row_keys.insert(pos, key)
+        self._key_of[row["id"]] = key
+        # 列表按 (date, record_id) 倒序显示
+        self.record_list.insert("", len(self._row_keys) - 1 - pos, iid=row["id"], values=self._row_values(row))
+
+    def _remove_rows(self, record_ids: List[str]) -> None:
+        for record_id in record_ids:
+            key = self._key_of.pop(record_id, None)
+            if key is None:
+                continue
+            del self._row_keys[bisect_left(self._row_keys, key)]
+            self.record_list.delete(record_id)
+
+    def destroy(self) -> None:
+        self._unsubscribe()
+        self.query_service.close()
+        super().destroy()
 
     def delete_selected_record(self)->None:
-        # TODO: (Req007) [cite: 35] 实现删除逻辑
-        messagebox.showinfo("提示", "TODO: 删除功能 (Req007)")
+        """ (Req007) [cite: 35] 删除选中的记录 (只写入墓碑，立即返回)，从列表中移除对应的行 """
+        selected = list(self.record_list.selection())
+        if not selected:
+            messagebox.showinfo("提示", "请先选择要删除的记录")
+            return
+        # 列表中的行由删除事件移除
+        deleted = self.query_service.manager.deleteRecords(selected)
+        self._last_deleted = deleted
+        self.undo_btn.configure(state="normal" if deleted else "disabled")
+        self.status_var.set(f"已删除 {len(deleted)} 条记录")
+
+    def undo_delete(self) -> None:
+        """ 撤销最近一次删除 """
+        restored = self.query_service.manager.undoDelete(self._last_deleted)
+        self._last_deleted = []
+        self.undo_btn.configure(state="disabled")
+        self.status_var.set(f"已恢复 {len(restored)} 条记录")
 
     def open_add_record(self)->None:
         """ 打开记一笔窗口 """
         # [cite: 215]
         RecordView(self)
 
+    def import_statement(self) -> None:
+        """
+        选择账单 CSV 文件导入：导入在后台线程中进行，进度与结果经 after 切回界面线程显示
+        导入的记录由新建事件加入列表
+        """
+        file_path = filedialog.askopenfilename(title="导入账单", filetypes=[("CSV 账单", "*.csv")])
+        if not file_path:
+            return
+        self.import_btn.configure(state="disabled")
+        self.import_progress.configure(maximum=1, value=0)
+        self.import_progress.pack(side="right", padx=5)
+        self.status_var.set("正在导入账单...")
+        threading.Thread(target=self._run_import, args=(file_path,), name="statement-import", daemon=True).start()
+
+    def _run_import(self, file_path: str) -> None:
+        """ 后台线程：导入账单，错误明细写入文件 """
+        def progress(done: int, read: int, total: int) -> None:
+            self.after(0, self._show_import_progress, read, total)
+
+        try:
+            report = ImportService().import_file(file_path, progress=progress)
+            error_path = None
+            if report.errors:
+                error_path = file_path + ".errors.csv"
+                report.write_errors(error_path)
+        except (OSError, ValueError) as e:
+            self.after(0, self._import_failed, str(e))
+            return
+        self.after(0, self._import_finished, report, error_path)
+
+    def _show_import_progress(self, read: int, total: int) -> None:
+        self.import_progress.configure(maximum=max(total, 1), value=read)
+        self.status_var.set(f"正在导入账单 {read * 100 // max(total, 1)}%")
+
+    def _end_import(self) -> None:
+        self.import_progress.pack_forget()
+        self.import_btn.configure(state="normal")
+
+    def _import_failed(self, message: str) -> None:
+        self._end_import()
+        self.status_var.set("导入失败")
+        messagebox.showerror("导入失败", message)
+
+    def _import_finished(self, report: ImportReport, error_path: Optional[str]) -> None:
+        self._end_import()
+        message = f"{report.format_name}账单：导入 {report.imported} 条，跳过 {report.skipped} 行"
+        if report.duplicates:
+            message += f"，{report.duplicates} 行已导入过"
+        if error_path is not None:
+            message += f"\n{len(report.errors)} 行有错误，详见 {error_path}"
+        self.status_var.set(f"已导入 {report.imported} 条记录")
+        messagebox.showinfo("导入完成", message)
+
     def open_reports(self)->None:
         """ 打开统计报告窗口 """
         # 
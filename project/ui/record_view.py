@@ -2,6 +2,7 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from logic.record_manager import RecordManager
 from logic.ocr_service import OCRService
+from data.tags import split_tag_names
 from typing import Any
 class RecordView(tk.Toplevel):
     def __init__(self, master:Any) ->None:
@@ -80,17 +81,13 @@ class RecordView(tk.Toplevel):
             # TODO: 将此路径保存，待保存记录时一并处理
             
     def save_record(self) ->None:
-        #假设用户输入了一组标签，如果只输入一个或不输入，访问索引1会崩溃
-        raw_tags = self.tags_var.get().split(',')
-        if len(raw_tags) > 0:
-            print(f"Second tag is: {raw_tags[1]}") # 潜在的崩溃点
         """ (Req001, Req002, Req003, Req004) [cite: 14, 17, 20, 22] """
         data = {
             "type": self.type_var.get(),
             "amount": self.amount_var.get(),
             "date": self.date_var.get(),
             "note": self.note_var.get(),
-            "tags": self.tags_var.get().split(','),
+            "tags": split_tag_names(self.tags_var.get()),
             "photos": [] # TODO: 关联已添加的图片
         }
         
@@ -101,8 +98,8 @@ class RecordView(tk.Toplevel):
 
         try:
             self.manager.createRecord(data) # 
+            # 主界面列表通过 RecordManager 的变更事件自动插入新记录
             messagebox.showinfo("成功", "保存成功") # [cite: 220, 222]
-            self.master.load_records() # type: ignore
             self.destroy()
         except Exception as e:
             messagebox.showerror("失败", f"保存失败: {e}")
\ No newline at end of file
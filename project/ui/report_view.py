@@ -2,6 +2,7 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import date
 from logic.report_generator import ReportGenerator
+from data.money import format_cents
 from typing import Any
 class ReportView(tk.Toplevel):
     def __init__(self, master:Any)->None:
@@ -41,17 +42,20 @@ class ReportView(tk.Toplevel):
             
             # 3. 整合渲染 (Req016, Req017) [cite: 68, 72, 228]
             display_text = f"--- {report_date.month}月 总结 ---\n"
-            display_text += f"总收入: {report['total_income']}\n"
-            display_text += f"总支出: {report['total_expense']}\n\n"
+            display_text += f"总收入: {format_cents(report['total_income'])}\n"
+            display_text += f"总支出: {format_cents(report['total_expense'])}\n\n"
             
             display_text += "--- 支出分类 (饼图) ---\n" # [cite: 68]
             for category, amount in report['pie_chart_data'].items():
-                display_text += f"{category}: {amount}\n"
+                display_text += f"{category}: {format_cents(amount)}\n"
             display_text += "TODO: 在此处渲染饼状图\n\n"
             
             display_text += "--- 与上月对比 ---\n" # [cite: 72]
             for category, change in comparison.items():
-                display_text += f"{category}: {change['change']} ({change['percent'] * 100:.1f}%)\n"
+                if change['percent'] is None:
+                    display_text += f"{category}: {format_cents(change['change'])} (上月无支出)\n"
+                else:
+                    display_text += f"{category}: {format_cents(change['change'])} ({change['percent'] * 100:.1f}%)\n"
             
             self.report_text.insert("1.0", display_text) # [cite: 228]
             
@@ -1,6 +1,16 @@
+import threading
 import tkinter as tk
 from tkinter import ttk, messagebox
 from typing import Any
+from data.database import RETENTION_PERIODS
+from logic.record_manager import RecordManager
+
+
+def _run_cleanup_job(retention_period: str) -> None:
+    """ (Req008) 按保留期限清理过期数据；删除的记录写入变更日志并发布删除事件 """
+    RecordManager().runCleanupJob(retention_period)
+
+
 class SettingsView(tk.Toplevel):
     def __init__(self, master:Any)->None:
         super().__init__(master)
@@ -30,8 +40,8 @@ class SettingsView(tk.Toplevel):
         
         # (Req008) [cite: 38]
         ttk.Label(self, text="数据保留期限:").pack(pady=5)
-        retention_cb = ttk.Combobox(self, values=["永久保存", "保存一年", "保存半年"])
-        retention_cb.pack(pady=5)
+        self.retention_cb = ttk.Combobox(self, values=list(RETENTION_PERIODS))
+        self.retention_cb.pack(pady=5)
         
         save_btn = ttk.Button(self, text="保存设置", command=self.save_settings)
         save_btn.pack(pady=20)
@@ -41,5 +51,11 @@ class SettingsView(tk.Toplevel):
         
     def save_settings(self)->None:
         # TODO: 保存所有设置
+        retention_period = self.retention_cb.get()
+        if retention_period in RETENTION_PERIODS:
+            # (Req008) 后台分批清理过期数据，不阻塞界面
+            threading.Thread(
+                target=_run_cleanup_job, args=(retention_period,), daemon=True
+            ).start()
         messagebox.showinfo("TODO", "设置已保存 (TODO)")
         self.destroy()
\ No newline at end of file
@@ -0,0 +1,23 @@
+import tkinter as tk
+from tkinter import ttk
+from typing import Any
+
+
+class UpgradeView(tk.Frame):
+    """ 启动时升级数据库结构的进度页：迁移在后台线程中进行，完成后由主视图替换 """
+
+    def __init__(self, master: Any) -> None:
+        super().__init__(master)
+        self.create_widgets()
+
+    def create_widgets(self) -> None:
+        ttk.Label(self, text="正在升级数据库，请稍候...").pack(pady=(120, 10))
+        self.progress_bar = ttk.Progressbar(self, mode="determinate", maximum=1, length=300)
+        self.progress_bar.pack(pady=5, padx=20)
+        self.step_var = tk.StringVar(value="")
+        ttk.Label(self, textvariable=self.step_var).pack(pady=5)
+
+    def show_progress(self, version: int, step: str, done: int, total: int) -> None:
+        """ 迁移进度回调 (在界面线程中调用)：显示当前步骤与完成比例 """
+        self.progress_bar.configure(maximum=max(total, 1), value=done)
+        self.step_var.set(f"v{version} {step}: {done}/{total}")